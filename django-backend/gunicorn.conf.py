@@ -0,0 +1,42 @@
+# gunicorn.conf.py
+# 실행: gunicorn -c gunicorn.conf.py   (django-backend 디렉터리에서)
+import multiprocessing
+import os
+
+# ======================================================
+# prefork 공유 모드
+#   preload_app → master가 wsgi(spotify_project/wsgi.py)를 import하면서 인덱스 로드
+#   → fork된 worker는 그래프 / 벡터 / 카탈로그를 copy-on-write / mmap으로 공유
+#   worker 수를 늘려도 인덱스 메모리는 1벌
+#
+# 새 인덱스 버전 반영 (build_index / compact_index 이후):
+#   kill -USR2 <master pid>   → 새 master가 CURRENT 버전을 로드하고 worker 시작
+#   kill -QUIT <예전 master pid> → 예전 worker는 처리 중인 요청을 끝내고 종료
+# ======================================================
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+wsgi_app = "spotify_project.wsgi:application"
+
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+
+preload_app = True
+
+os.environ.setdefault("GROOVIA_PRELOAD_INDEX", "1")
+# worker별 CURRENT poll reload는 worker마다 새 복사본을 만듦 → 공유 모드에서는 끔 (위 USR2로 교체)
+os.environ.setdefault("GROOVIA_INDEX_POLL_INTERVAL", "0")
+
+# 분석 process pool / reload signal은 worker에서 (master에서 만들면 fork 후 사용 불가)
+_prewarm_extraction = os.environ.pop("GROOVIA_PREWARM_EXTRACTION", None) == "1"
+_reload_signal = os.environ.pop("GROOVIA_INDEX_RELOAD_SIGNAL", None) == "1"
+
+
+def post_worker_init(worker):
+    if _prewarm_extraction:
+        from spotify_app.services.extraction_pool import get_extraction_pool
+        get_extraction_pool().warm()
+
+    if _reload_signal:
+        from spotify_app.engines.HNSW_Engine import install_reload_signal
+        install_reload_signal()
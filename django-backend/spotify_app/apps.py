@@ -1,5 +1,18 @@
+import os
+
 from django.apps import AppConfig
 
 class SpotifyAppConfig(AppConfig): 
     default_auto_field = 'django.db.models.BigAutoField' 
     name = 'spotify_app'
+
+    def ready(self):
+        # 서버 시작 시 분석 worker 미리 띄우기 (manage.py 커맨드에서는 띄우지 않도록 opt-in)
+        if os.getenv("GROOVIA_PREWARM_EXTRACTION") == "1":
+            from spotify_app.services.extraction_pool import get_extraction_pool
+            get_extraction_pool().warm()
+
+        # kill -USR2 <pid> → 인덱스 새 버전 reload (opt-in)
+        if os.getenv("GROOVIA_INDEX_RELOAD_SIGNAL") == "1":
+            from spotify_app.engines.HNSW_Engine import install_reload_signal
+            install_reload_signal()
@@ -1,21 +1,228 @@
+import gc
 import hnswlib
 import numpy as np
+import hashlib
 import json
 import math
 import os
-import requests
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from spotify_app.engines.catalog_store import (
+    CatalogStore,
+    CatalogWriter,
+    StackedArray,
+    write_catalog,
+    catalog_exists,
+    catalog_checksum,
+    enrich_catalog,
+    DERIVED_COLUMNS,
+    MAJOR_GENRES,
+    MAJOR_GENRE_CODES,
+    infer_major_genre_name,
+)
+from spotify_app.services.ttl_cache import TTLCache, MISSING
+from spotify_app.services.itunes_client import get_itunes_client
+from spotify_app.engines.feature_space import FeatureScaler, to_unit_range
+from spotify_app.engines.delta_log import DeltaLog
+from spotify_app.engines.index_versions import (
+    DATA_DIR,
+    current_index_dir,
+    create_version_dir,
+    publish_version,
+    pointer_mtime,
+    stage_artifacts,
+)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# ------------------------------------------------------------
+# 인덱스 artifact 파일 이름 / HNSW 파라미터
+#   서빙은 CURRENT가 가리키는 버전 디렉터리 (index_versions 참고)
+#   아래 *_PATH는 prepare_apple_dataset 출력 위치 (= build_index 입력)
+# ------------------------------------------------------------
+VECTORS_FILE = "apple_vectors.npy"
+STATS_FILE = "apple_feature_stats.json"
+CATALOG_DIRNAME = "apple_catalog"
+LEGACY_METADATA_FILE = "apple_metadata.json"
+INDEX_FILE = "apple_hnsw_index.bin"
+MANIFEST_FILE = "apple_hnsw_manifest.json"
+DELTA_LOG_FILE = os.path.join("apple_delta", "delta_log.jsonl")
+
+VECTORS_PATH = os.path.join(DATA_DIR, VECTORS_FILE)
+STATS_PATH = os.path.join(DATA_DIR, STATS_FILE)
+CATALOG_DIR = os.path.join(DATA_DIR, CATALOG_DIRNAME)
+LEGACY_METADATA_PATH = os.path.join(DATA_DIR, LEGACY_METADATA_FILE)
+
+# 새 버전 디렉터리로 복사하는 입력 artifact
+SOURCE_ARTIFACTS = [VECTORS_FILE, STATS_FILE, CATALOG_DIRNAME]
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 400
+HNSW_EF_SEARCH = 200
+
+# 표준화된 벡터 공간에서는 후보 100개로도 충분 (기존 200)
+CANDIDATE_K = 100
+
+# recommend_batch의 knn_query thread 수 (-1 = 전체 core)
+BATCH_SEARCH_THREADS = int(os.getenv("GROOVIA_BATCH_SEARCH_THREADS", -1))
+
+# CURRENT 포인터 확인 주기 (초). 바뀌면 백그라운드에서 새 버전 로드 후 교체
+# 0 이하면 확인 X (prefork 공유 모드: worker별 reload는 공유 메모리를 깨므로 서버 재시작으로 교체)
+INDEX_POLL_INTERVAL = float(os.getenv("GROOVIA_INDEX_POLL_INTERVAL", 5))
+
+# ------------------------------------------------------------
+# 증분 변경(delta) 설정
+# ------------------------------------------------------------
+DELTA_POLL_INTERVAL = float(os.getenv("GROOVIA_DELTA_POLL_INTERVAL", 10))   # delta log 확인 주기 (초)
+DELTA_RESIZE_STEP = 1024       # resize_index 여유분 (곡 1개 추가마다 재할당하지 않도록)
+COMPACT_CHUNK = 65536          # compaction 시 벡터 복사 단위 (row)
+
+# rerank에 쓰는 벡터 차원 (audio_vec 기준)
+RERANK_DIMS = {
+    "tempo": 0,
+    "spectral_centroid": 1,
+    "energy": 4,      # rms
+    "mfcc_mean": 5,   # 첫 번째 mfcc
+}
+
+# mood penalty: (차원, 배율) - query는 높고 후보는 낮은 경우
+MOOD_PENALTY_DIMS = [RERANK_DIMS["tempo"], RERANK_DIMS["energy"], RERANK_DIMS["spectral_centroid"]]
+MOOD_PENALTY_FACTORS = np.array([0.8, 0.8, 0.85])
+
+# ------------------------------------------------------------
+# Apple Lookup 보완(album_image, apple_music_url) 설정
+# ------------------------------------------------------------
+ENRICH_WORKERS = 10
+ENRICH_DEADLINE = 3.0            # 결과 전체(최대 10곡)에 대한 deadline (초)
+ENRICH_CACHE_TTL = 24 * 3600
+ENRICH_LOOKUP_BATCH = 200        # batch 추천에서 Lookup 1회에 넣는 track 수
+
+_enrich_cache = TTLCache(maxsize=20000, ttl=ENRICH_CACHE_TTL)   # track_id → (album_image, apple_music_url)
+_enrich_executor = ThreadPoolExecutor(max_workers=ENRICH_WORKERS, thread_name_prefix="apple-enrich")
+
+# post_filter: (query, item) genre mismatch가 강하면 제외
+INCOMPATIBLE_GENRES = np.zeros((len(MAJOR_GENRES), len(MAJOR_GENRES)), dtype=bool)
+for _q, _i in [("pop", "country"), ("pop", "hiphop"), ("rnb", "country"), ("rnb", "rock")]:
+    INCOMPATIBLE_GENRES[MAJOR_GENRE_CODES[_q], MAJOR_GENRE_CODES[_i]] = True
+
+
+def lookup_apple_links(track_id, timeout=ENRICH_DEADLINE, deadline=None):
+    """
+    track_id → (album_image, apple_music_url). 없는 곡이면 (None, None)
+    deadline: time.monotonic() 기준 마감 시각 (그 안에 rate limit 토큰이 없으면 바로 ITunesError)
+    """
+    # deadline이 짧으므로 재시도 X (실패하면 fallback → 다음 요청에서 다시 시도)
+    results = get_itunes_client().lookup([track_id], timeout=timeout, retries=0, deadline=deadline)
+
+    if results:
+        info = results[0]
+        return info.get("artworkUrl100"), info.get("trackViewUrl") or info.get("collectionViewUrl")
+
+    return None, None
+
+
+class ReadWriteLock:
+    """검색(read)은 동시에, 인덱스 변경(write)은 단독으로 (resize_index 중 knn_query 방지)"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._writing = True
+            while self._readers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+def manifest_version(manifest):
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def lookup_apple_links_batch(track_ids, timeout=ENRICH_DEADLINE, deadline=None):
+    """track_id list → {track_id: (album_image, apple_music_url)} (Lookup 1회, 결과 없는 곡은 (None, None))"""
+    results = get_itunes_client().lookup(track_ids, timeout=timeout, retries=0, deadline=deadline)
+
+    links = {int(tid): (None, None) for tid in track_ids}
+    for info in results:
+        if info.get("trackId") in links:
+            links[info["trackId"]] = (info.get("artworkUrl100"), info.get("trackViewUrl") or info.get("collectionViewUrl"))
+    return links
+
+
+def query_year(meta):
+    """기준곡 release_date 앞 4자리 (없으면 None)"""
+    try:
+        return int(meta["release_date"][:4])
+    except Exception:
+        return None
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """파일 sha256 (manifest에 기록해서 artifact와 원본 데이터 일치 여부 확인용)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
 
 class HNSWRecommender:
-    def __init__(self, dim=None, space="cosine"):
+    def __init__(self, dim=None, space="cosine", index_dir=None):
+        # artifact 디렉터리 (기본: CURRENT가 가리키는 버전)
+        self.index_dir = index_dir or current_index_dir()
+        self.vectors_path = os.path.join(self.index_dir, VECTORS_FILE)
+        self.stats_path = os.path.join(self.index_dir, STATS_FILE)
+        self.catalog_dir = os.path.join(self.index_dir, CATALOG_DIRNAME)
+        self.index_path = os.path.join(self.index_dir, INDEX_FILE)
+        self.manifest_path = os.path.join(self.index_dir, MANIFEST_FILE)
+
         self.index = None
         self.dim = dim
         self.space = space
         self.loaded = False
         self.vectors = None
-        self.id_map = None
+        self.catalog = None
+        self.scaler = None
+        self.manifest = None
+
+        # 증분 변경: 기본 artifact(base_version) 위에 delta log를 replay
+        self.base_version = None
+        self.deleted = set()            # mark_deleted 된 label
+        self.delta_applied = 0          # 반영한 delta 기록 수
+        self.delta_log = DeltaLog(os.path.join(self.index_dir, DELTA_LOG_FILE))
+        self._delta_offset = 0
+        self._delta_polled = 0.0
+        self._delta_lock = threading.Lock()
+        self._rw = ReadWriteLock()
 
         # 테스트용 가중치 세팅
         self.distance_weights = {
@@ -33,57 +240,439 @@ class HNSWRecommender:
         item: 추천 결과 한 개 (dict)
         필요한 정보(album_image, apple_music_url)를 Apple Lookup API에서 보완
         """
-        tid = item["track_id"]
-        url = f"https://itunes.apple.com/lookup?id={tid}"
+        return self.enrich_apple_metadata_batch([item])[0]
 
-        try:
-            res = requests.get(url, timeout=3)
-            data = res.json()
+    def enrich_apple_metadata_batch(self, items, deadline=ENRICH_DEADLINE):
+        """
+        카탈로그에 album_image / apple_music_url이 저장된 곡은 그대로 사용하고,
+        없는 곡만 Lookup API로 보완 (fallback).
+        - 여러 곡 동시 요청 (공유 connection pool, 전체 deadline 1개)
+        - track_id 기준 TTL/LRU 캐시에 있는 곡은 네트워크 호출 없음
+        - deadline 안에 응답이 없거나 실패한 곡은 None으로 채움 (캐시 X → 다음 요청에서 재시도)
+        - limiter 대기도 같은 deadline 안에서만 (토큰이 늦게 나오는 곡은 요청 없이 바로 fallback)
+        """
+        expires = time.monotonic() + deadline
+        futures = {}
+        for item in self.pending_enrichment(items):
+            futures[_enrich_executor.submit(lookup_apple_links, item["track_id"], deadline, expires)] = item
+
+        if futures:
+            done, not_done = wait(futures, timeout=deadline)
+
+            for future in not_done:
+                future.cancel()
 
-            if data.get("resultCount", 0) > 0:
-                info = data["results"][0]
+            for future, item in futures.items():
+                links = None
+                if future in done and future.exception() is None:
+                    links = future.result()
+
+                self.apply_links(item, links)
+
+        return items
+
+    def enrich_apple_metadata_many(self, items, deadline=ENRICH_DEADLINE):
+        """
+        enrich_apple_metadata_batch의 batch 추천용 버전
+        (결과 곡이 수백~수천 개 → 곡마다 Lookup 대신 ENRICH_LOOKUP_BATCH개씩 Lookup 1회)
+        """
+        pending = {}
+        for item in self.pending_enrichment(items):
+            pending.setdefault(int(item["track_id"]), []).append(item)
 
-                item["album_image"] = info.get("artworkUrl100")
-                item["apple_music_url"] = info.get("trackViewUrl") or info.get("collectionViewUrl")
+        if not pending:
+            return items
 
-        except Exception as e:
-            # 기본값 fallback
-            item["album_image"] = None
-            item["apple_music_url"] = None
+        ids = list(pending)
+        expires = time.monotonic() + deadline
+        futures = [
+            _enrich_executor.submit(lookup_apple_links_batch, ids[i:i + ENRICH_LOOKUP_BATCH], deadline, expires)
+            for i in range(0, len(ids), ENRICH_LOOKUP_BATCH)
+        ]
+        done, not_done = wait(futures, timeout=deadline)
 
+        for future in not_done:
+            future.cancel()
+
+        found = {}
+        for future in done:
+            if future.exception() is None:
+                found.update(future.result())
+
+        for tid, group in pending.items():
+            for item in group:
+                self.apply_links(item, found.get(tid))
+
+        return items
+
+    def pending_enrichment(self, items):
+        """카탈로그 / 캐시로 채울 수 있는 곡은 바로 채우고, Lookup이 필요한 곡만 반환"""
+        pending = []
+        for item in items:
+            if item.get("album_image") and item.get("apple_music_url"):
+                continue
+
+            links = _enrich_cache.get(item["track_id"])
+            if links is MISSING:
+                pending.append(item)
+            else:
+                item["album_image"], item["apple_music_url"] = links
+
+        return pending
+
+    def apply_links(self, item, links):
+        """Lookup 결과 반영. 실패(None)면 기본값 fallback + enrich_failed 표시, 캐시 X"""
+        item["enrich_failed"] = links is None
+        if links is None:
+            links = (None, None)
+        else:
+            _enrich_cache.set(item["track_id"], links)
+
+        item["album_image"], item["apple_music_url"] = links
         return item
 
+    def enrichment_failed(self, items):
+        """
+        Lookup 보완이 실패 / deadline 초과된 곡이 있으면 True
+        (Apple에 링크가 원래 없는 곡은 실패 X → 결과 캐시 여부 판단용)
+        """
+        return any(item.get("enrich_failed") for item in items)
+
     # ------------------------------------------------------------
-    # Load index + metadata
+    # Load vectors + metadata
     # ------------------------------------------------------------
-    def load_index(self):
-        vectors_path = os.path.join(BASE_DIR, "../data/apple_db/apple_vectors.npy")
-        id_map_path = os.path.join(BASE_DIR, "../data/apple_db/apple_metadata.json")
+    def load_data(self):
+        # 표준화 통계가 없으면 예전 raw 벡터 → 1회 표준화
+        if not os.path.exists(self.stats_path):
+            standardize_legacy_vectors(self.vectors_path, self.stats_path)
 
-        # Load final vectors (audio_vec + meta_vec 결합한 DB 벡터)
-        self.vectors = np.load(vectors_path)
-        num_items, vec_dim = self.vectors.shape
+        self.scaler = FeatureScaler.load(self.stats_path)
+
+        # Load final vectors (표준화된 float32 DB 벡터) - mmap, 필요할 때만 페이지 로드
+        self.vectors = np.load(self.vectors_path, mmap_mode="r")
 
         if self.dim is None:
-            self.dim = vec_dim
+            self.dim = self.vectors.shape[1]
 
-        # Load metadata dict list
-        with open(id_map_path, "r", encoding="utf-8") as f:
-            self.id_map = json.load(f)
+        # 예전 apple_metadata.json만 있는 경우 컬럼 카탈로그로 1회 변환
+        legacy_metadata_path = os.path.join(self.index_dir, LEGACY_METADATA_FILE)
+        if not catalog_exists(self.catalog_dir) and os.path.exists(legacy_metadata_path):
+            convert_legacy_metadata(legacy_metadata_path, self.catalog_dir)
+
+        # Load columnar metadata (mmap)
+        self.catalog = CatalogStore(self.catalog_dir)
+
+        # 파생 컬럼(major_genre / dedup_key) 없는 예전 카탈로그 → 1회 추가
+        if any(name not in self.catalog.columns for name in DERIVED_COLUMNS):
+            print("[Catalog] 파생 컬럼 추가 (major_genre, dedup_key)")
+            enrich_catalog(self.catalog_dir)
+            self.catalog = CatalogStore(self.catalog_dir)
+
+    # ------------------------------------------------------------
+    # Build graph (offline build_index 커맨드 / artifact 없을 때 fallback)
+    # ------------------------------------------------------------
+    def build_index(self):
+        if self.vectors is None:
+            self.load_data()
+
+        num_items = self.vectors.shape[0]
 
-        # Create index
         self.index = hnswlib.Index(self.space, dim=self.dim)
         self.index.init_index(
             max_elements=num_items,
-            ef_construction=400,
-            M=32
+            ef_construction=HNSW_EF_CONSTRUCTION,
+            M=HNSW_M
         )
 
         self.index.add_items(self.vectors, np.arange(num_items))
-        self.index.set_ef(200)
+        self.index.set_ef(HNSW_EF_SEARCH)
 
         self.loaded = True
 
+    # ------------------------------------------------------------
+    # hnswlib 바이너리 + manifest 저장
+    # ------------------------------------------------------------
+    def save_index(self):
+        if not self.loaded:
+            self.build_index()
+
+        self.index.save_index(self.index_path)
+
+        manifest = self.build_manifest()
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        self.manifest = manifest
+        return manifest
+
+    def build_manifest(self):
+        return {
+            "space": self.space,
+            "dim": int(self.dim),
+            "count": int(self.vectors.shape[0]),
+            "M": HNSW_M,
+            "ef_construction": HNSW_EF_CONSTRUCTION,
+            "ef": HNSW_EF_SEARCH,
+            "vectors_sha256": file_checksum(self.vectors_path),
+            "stats_sha256": file_checksum(self.stats_path),
+            "catalog_sha256": catalog_checksum(self.catalog_dir),
+            "files": self.file_fingerprints(),
+        }
+
+    def file_fingerprints(self):
+        """artifact 파일별 [크기, mtime_ns] (index_dir 기준 상대 경로) - load 시 빠른 확인용"""
+        names = [VECTORS_FILE, STATS_FILE]
+        names += [os.path.join(CATALOG_DIRNAME, name) for name in sorted(os.listdir(self.catalog_dir))]
+
+        fingerprints = {}
+        for name in names:
+            st = os.stat(os.path.join(self.index_dir, name))
+            fingerprints[name] = [st.st_size, st.st_mtime_ns]
+        return fingerprints
+
+    @property
+    def index_version(self):
+        """
+        현재 인덱스 버전 (manifest hash + 반영한 delta 수).
+        데이터 / 파라미터가 바뀌어 재빌드되거나 곡이 추가/삭제되면 값이 바뀜
+        """
+        if self.manifest is None:
+            return None
+        version = manifest_version(self.manifest)
+        return f"{version}+{self.delta_applied}" if self.delta_applied else version
+
+    # ------------------------------------------------------------
+    # 저장된 artifact가 현재 vectors/metadata와 일치하는지 확인
+    #   버전 디렉터리는 publish 후 바뀌지 않으므로 기본은 파일 크기 / mtime만 비교
+    #   verify=True (update_index / compact_index --verify)일 때만 sha256 전체 계산
+    # ------------------------------------------------------------
+    def read_manifest(self, verify=False):
+        if not (os.path.exists(self.index_path) and os.path.exists(self.manifest_path)):
+            return None
+
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        num_items, vec_dim = self.vectors.shape
+        if (
+            manifest.get("space") != self.space
+            or manifest.get("dim") != vec_dim
+            or manifest.get("count") != num_items
+        ):
+            return None
+
+        # 파일 정보가 없는 예전 manifest는 sha256으로 확인
+        if verify or "files" not in manifest:
+            if (
+                manifest.get("vectors_sha256") != file_checksum(self.vectors_path)
+                or manifest.get("stats_sha256") != file_checksum(self.stats_path)
+                or manifest.get("catalog_sha256") != catalog_checksum(self.catalog_dir)
+            ):
+                return None
+        elif manifest["files"] != self.file_fingerprints():
+            return None
+
+        return manifest
+
+    # ------------------------------------------------------------
+    # Load index + metadata
+    # ------------------------------------------------------------
+    def load_index(self, verify=False):
+        self.load_data()
+
+        manifest = self.read_manifest(verify=verify)
+        if manifest is None:
+            # artifact가 없거나 오래된 경우: 메모리에서 직접 생성 (느림)
+            print("[HNSW] 저장된 인덱스 없음/불일치 → 그래프 새로 생성 (manage.py build_index 권장)")
+            self.build_index()
+            self.manifest = self.build_manifest()
+        else:
+            self.index = hnswlib.Index(self.space, dim=self.dim)
+            self.index.load_index(self.index_path, max_elements=manifest["count"])
+            self.index.set_ef(manifest.get("ef", HNSW_EF_SEARCH))
+
+            self.manifest = manifest
+            self.loaded = True
+
+        # 마지막 compaction 이후의 추가/삭제 반영
+        self.base_version = manifest_version(self.manifest)
+        self.sync_delta(force=True)
+
+    # ------------------------------------------------------------
+    # 증분 변경 (add / update / delete)
+    #   - 추가: resize_index + add_items (label = 현재 곡 수 이후)
+    #   - 삭제: mark_deleted (그래프에는 남지만 검색 결과에서 제외)
+    #   - 모든 변경은 delta log에 기록 → 다른 프로세스도 같은 순서로 replay
+    #   - 주기적으로 compact_index 커맨드가 깨끗한 그래프로 다시 빌드
+    # ------------------------------------------------------------
+    def live_count(self):
+        return self.catalog.count - len(self.deleted)
+
+    def sync_delta(self, force=False):
+        """delta log에 새로 기록된 변경 반영 (DELTA_POLL_INTERVAL마다 파일 크기만 확인)"""
+        now = time.monotonic()
+        if not force and now - self._delta_polled < DELTA_POLL_INTERVAL:
+            return 0
+
+        # 다른 thread가 반영 중이면 기다리지 않음
+        if not self._delta_lock.acquire(blocking=force):
+            return 0
+
+        try:
+            self._delta_polled = now
+            size = self.delta_log.size()
+            if size < self._delta_offset:
+                print("[HNSW] delta log가 줄어듦 (수동 삭제?) → 이후 기록부터 반영")
+                self._delta_offset = size
+            if size <= self._delta_offset:
+                return 0
+
+            records, offset = self.delta_log.read(self._delta_offset)
+            with self._rw.write():
+                applied = self.apply_delta(records)
+            self._delta_offset = offset
+        finally:
+            self._delta_lock.release()
+
+        if applied:
+            print(f"[HNSW] delta {applied}건 반영 (live={self.live_count()}, deleted={len(self.deleted)})")
+        return applied
+
+    def apply_delta(self, records):
+        """
+        delta 기록을 순서대로 인덱스 / 벡터 / 카탈로그에 반영 (연속된 add는 한 번에)
+        이미 반영된 기록(같은 label / track_id의 add, 이미 삭제된 label)은 건너뜀 → 다시 replay해도 상태 / 버전 그대로
+        """
+        applied = 0
+        adds = []
+
+        def flush_adds():
+            if adds:
+                self._add_rows([r["vector"] for r in adds], [r["meta"] for r in adds])
+                adds.clear()
+
+        for record in records:
+            if record.get("base") != self.base_version:
+                # 다른 기본 artifact 위에서 기록된 변경 (compaction 이전 기록 등)
+                continue
+
+            label = record["label"]
+            if record["op"] == "add":
+                if label < self.catalog.count and int(self.catalog.columns["track_id"][label]) == record["track_id"]:
+                    continue
+                expected = self.catalog.count + len(adds)
+                if label != expected:
+                    print(f"[HNSW] delta label 불일치 (기록 {label}, 예상 {expected}) → 이후 기록 무시")
+                    break
+                adds.append(record)
+            elif record["op"] == "delete":
+                flush_adds()
+                if label in self.deleted:
+                    continue
+                self._delete_labels([label])
+            else:
+                continue
+
+            applied += 1
+
+        flush_adds()
+        self.delta_applied += applied
+        return applied
+
+    def _add_rows(self, vectors, metas):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        start = self.catalog.count
+        end = start + vectors.shape[0]
+
+        if end > self.index.get_max_elements():
+            self.index.resize_index(end + DELTA_RESIZE_STEP)
+        self.index.add_items(vectors, np.arange(start, end))
+
+        # 기본 벡터(mmap)는 그대로 두고 추가분만 메모리에
+        if isinstance(self.vectors, StackedArray):
+            self.vectors = StackedArray(self.vectors.base, np.vstack([self.vectors.tail, vectors]))
+        else:
+            self.vectors = StackedArray(self.vectors, vectors)
+
+        self.catalog.append_rows(metas)
+
+    def _delete_labels(self, labels):
+        for label in labels:
+            label = int(label)
+            if label in self.deleted or label >= self.catalog.count:
+                continue
+            self.index.mark_deleted(label)
+            self.deleted.add(label)
+
+    def labels_for_track_ids(self, track_ids):
+        """track_id → 현재 살아있는 label list"""
+        ids = np.asarray(list(track_ids), dtype=np.int64)
+        hits = np.flatnonzero(np.isin(np.asarray(self.catalog.columns["track_id"]), ids))
+        return [int(label) for label in hits if int(label) not in self.deleted]
+
+    def live_track_ids(self):
+        """(label, track_id) - 삭제되지 않은 곡 전체"""
+        track_ids = self.catalog.columns["track_id"]
+        for label in range(self.catalog.count):
+            if label not in self.deleted:
+                yield label, int(track_ids[label])
+
+    def record_delta(self, records):
+        """
+        변경을 이 프로세스에 반영하고 delta log에 기록.
+        여러 프로세스가 동시에 쓰지 않도록 index_versions.write_lock() 안에서 (생성 / load_index 포함) 호출
+        """
+        with self._delta_lock:
+            with self._rw.write():
+                self.apply_delta(records)
+            self.delta_log.append(records)
+            self._delta_offset = self.delta_log.size()
+
+    def add_tracks(self, raw_vectors, metas):
+        """
+        raw feature 벡터 + metadata → 인덱스에 추가.
+        같은 track_id가 이미 있으면 기존 label 삭제 후 새로 추가 (update)
+        반환: (추가한 곡 수, 교체한 곡 수)
+        """
+        if not self.loaded:
+            self.load_index()
+        if len(metas) == 0:
+            return 0, 0
+
+        vectors = self.scaler.transform(np.asarray(raw_vectors, dtype=np.float32))
+
+        replaced = self.labels_for_track_ids(int(meta["track_id"]) for meta in metas)
+        records = [
+            {"op": "delete", "base": self.base_version, "label": label,
+             "track_id": int(self.catalog.columns["track_id"][label])}
+            for label in replaced
+        ]
+
+        start = self.catalog.count
+        for i, (vec, meta) in enumerate(zip(vectors, metas)):
+            records.append({
+                "op": "add", "base": self.base_version, "label": start + i,
+                "track_id": int(meta["track_id"]), "vector": vec.tolist(), "meta": meta,
+            })
+
+        self.record_delta(records)
+        return len(metas), len(replaced)
+
+    def delete_tracks(self, track_ids):
+        """track_id 목록 삭제 (mark_deleted). 반환: 삭제한 곡 수"""
+        if not self.loaded:
+            self.load_index()
+
+        labels = self.labels_for_track_ids(track_ids)
+        records = [
+            {"op": "delete", "base": self.base_version, "label": label,
+             "track_id": int(self.catalog.columns["track_id"][label])}
+            for label in labels
+        ]
+
+        self.record_delta(records)
+        return len(labels)
+
     # ------------------------------------------------------------
     # Query vector = 입력된 여러 곡 벡터 평균
     # ------------------------------------------------------------
@@ -93,67 +682,64 @@ class HNSWRecommender:
         return np.mean(np.vstack(vectors), axis=0)
 
     # ------------------------------------------------------------
-    # Search (labels + metadata 둘 다 반환)
+    # Search (후보 label 배열 반환)
     # ------------------------------------------------------------
-    def search_hnsw(self, query_vector, k=200):
+    def search_hnsw(self, query_vector, k=CANDIDATE_K):
         if not self.loaded:
             self.load_index()
 
+        # mark_deleted 된 곡은 결과에 안 나오므로 살아있는 곡 수까지만
+        k = min(k, self.live_count())
+        if k == 0:
+            return np.zeros(0, dtype=np.int64)
         labels, distances = self.index.knn_query(query_vector, k=k)
-        labels = labels[0].tolist()
 
-        # metadata + label(index) 같이 반환
-        results = []
-        for idx in labels:
-            data = self.id_map[idx].copy()
-            data["idx"] = idx  # vector 접근용 label 추가
-            results.append(data)
+        return labels[0].astype(np.int64)
 
-        return results
+    def search_hnsw_batch(self, query_matrix, k=CANDIDATE_K):
+        """(B, dim) 쿼리 행렬 → (B, k) 후보 label (knn_query 1회, 멀티 thread)"""
+        if not self.loaded:
+            self.load_index()
+
+        k = min(k, self.live_count())
+        if k == 0:
+            return np.zeros((query_matrix.shape[0], 0), dtype=np.int64)
+        labels, distances = self.index.knn_query(query_matrix, k=k, num_threads=BATCH_SEARCH_THREADS)
+
+        return labels.astype(np.int64)
 
     # ------------------------------------------------------------
-    # Post-filter: 메타데이터 기반 필터
+    # Post-filter: 메타데이터 기반 필터 (후보 배열 전체에 mask 적용)
     # ------------------------------------------------------------
-    def post_filter(self, items, query_meta, max_year_gap=20):
-        filtered = []
+    def post_filter(self, labels, query_meta, max_year_gap=20):
+        labels = np.asarray(labels, dtype=np.int64)
+        q_year = query_year(query_meta)
+        q_major = MAJOR_GENRE_CODES[self.infer_major_genre(query_meta)]
 
-        for item in items:
-            # 1) 연도 차이 필터
-            try:
-                year = int(item["release_date"][:4])
-                q_year = int(query_meta["release_date"][:4])
-                if abs(year - q_year) > max_year_gap:
-                    continue
-            except:
-                pass
-
-            # 2) 장르 차이
-            query_major = self.infer_major_genre(query_meta)
-            item_major = self.infer_major_genre(item)
-
-            # genre mismatch가 강하면 제외
-            incompatible = {
-                ("pop", "country"),
-                ("pop", "hiphop"),
-                ("rnb", "country"),
-                ("rnb", "rock"),
-            }
-
-            if (query_major, item_major) in incompatible:
-                continue
+        keep = self.filter_mask(labels[None], [-1 if q_year is None else q_year], [q_major], max_year_gap)
+        return labels[keep[0]]
 
-            # 3) acousticness 필터
-            if item.get("acousticness") and item["acousticness"] > 0.7:
-                continue
+    def filter_mask(self, labels, q_years, q_majors, max_year_gap=20):
+        """
+        (B, k) 후보 label → (B, k) 통과 mask (단일 / batch 추천 공용)
+        q_years: 세트별 기준 연도 (-1 = 없음), q_majors: 세트별 major-genre code
+        """
+        q_years = np.asarray(q_years, dtype=np.int32)[:, None]
+        q_majors = np.asarray(q_majors, dtype=np.int64)[:, None]
+        flat = labels.ravel()
 
-            # 4) energy 필터
-            if item.get("energy") and item["energy"] < 0.2:
-                continue
+        # 1) 연도 차이 필터 (기준 연도 / 후보 연도 정보가 없으면 통과)
+        years = self.catalog.columns["year"][flat].reshape(labels.shape).astype(np.int32)
+        keep = (q_years < 0) | (years == 0) | (np.abs(years - q_years) <= max_year_gap)
 
-            filtered.append(item)
+        # 2) 장르 차이: genre mismatch가 강하면 제외
+        item_major = self.catalog.columns["major_genre"][flat].reshape(labels.shape)
+        keep &= ~INCOMPATIBLE_GENRES[q_majors, item_major]
+
+        # (acousticness / energy 메타 필터는 Apple 카탈로그에 해당 컬럼이 없어 제외)
+
+        return keep
 
-        return filtered
-    
     # ------------------------------------------------------------
     # Genre preprocessing: 입력곡 장르 기반 major-genre 결정
     # ------------------------------------------------------------
@@ -162,29 +748,9 @@ class HNSWRecommender:
         Apple Music의 genre_id는 불규칙하므로,
         primaryGenreName 또는 genreName 기반으로 major-genre를 추출하는 함수.
         """
-        g = (meta.get("genre_name") or meta.get("genre_id") or meta.get("primaryGenreName") or meta.get("genreName") or "").lower()
-        # Pop / Dance / Electronic 그룹
-        if any(x in g for x in ["pop", "k-pop", "dance", "electronic", "edm"]):
-            return "pop"
-
-        # R&B 그룹
-        if any(x in g for x in ["r&b", "soul"]):
-            return "rnb"
-
-        # Hip-hop / Rap 그룹
-        if "hip" in g or "rap" in g:
-            return "hiphop"
-
-        # Rock 그룹
-        if "rock" in g:
-            return "rock"
-
-        # Country 그룹
-        if any(x in g for x in ["country", "folk"]):
-            return "country"
-
-        # 그 외 기타 장르
-        return "etc"
+        return infer_major_genre_name(
+            meta.get("genre_name") or meta.get("genre_id") or meta.get("primaryGenreName") or meta.get("genreName")
+        )
 
     # ------------------------------------------------------------
     # 가중치 설정 함수
@@ -278,107 +844,209 @@ class HNSWRecommender:
         return list(set(keywords))[:4]
 
     # ------------------------------------------------------------
-    # Re-ranking 
+    # 표준화된 DB 벡터 → 키워드용 raw feature 복원
     # ------------------------------------------------------------
-    def rerank(self, items, query_vector, query_meta):
-
-        # query_vector에서 4개 feature 추출
-        query_features = {
-            "tempo": query_vector[0],
-            "spectral_centroid": query_vector[1],
-            "mfcc_mean": float(query_vector[5]),   # 첫 번째 mfcc
-            "energy": float(query_vector[4]),      # rms
+    def raw_features(self, idx):
+        raw = self.scaler.inverse_transform(self.vectors[idx])
+        return {
+            "tempo": float(raw[0]),
+            "spectral_centroid": float(raw[1]),
+            "mfcc_mean": float(raw[5]),
+            "energy": float(raw[4]),
         }
 
-        for item in items:
-            idx = item["idx"]
-            v = self.vectors[idx]
+    # ------------------------------------------------------------
+    # Re-ranking: 후보 전체를 한 번에 점수 계산 (label 순서대로 score 배열 반환)
+    # ------------------------------------------------------------
+    def rerank(self, labels, query_vector, query_meta):
+        labels = np.asarray(labels, dtype=np.int64)
+        if labels.shape[0] == 0:
+            return np.zeros(0)
 
-            # DB 벡터에서 동일 feature 추출
-            candidate_features = {
-                "tempo": v[0],
-                "spectral_centroid": v[1],
-                "mfcc_mean": float(v[5]),
-                "energy": float(v[4]),
-            }
+        q_major = MAJOR_GENRE_CODES[self.infer_major_genre(query_meta)]
+        return self.score_candidates(labels[None], np.asarray(query_vector)[None], [q_major])[0]
 
-            # 가중치 거리 계산
-            dist = self.calculate_weighted_distance(query_features, candidate_features)
+    def score_candidates(self, labels, query_matrix, q_majors):
+        """
+        (B, k) 후보 label + (B, dim) 표준화 쿼리 → (B, k) 점수 (단일 / batch 추천 공용)
+        q_majors: 세트별 기준곡 major-genre code
+        """
+        if labels.size == 0:
+            return np.zeros(labels.shape)
 
-            # 점수 변환: 거리가 작을수록 점수 높음
-            score = 1 / (1 + dist)
+        # query / 후보 벡터(표준화) → 0..1
+        q = to_unit_range(query_matrix)[:, None, :]
+        candidates = to_unit_range(self.vectors[labels.ravel()]).reshape(labels.shape + (-1,))
 
-            # 장르 mismatch penalty
-            query_major = self.infer_major_genre(query_meta)
-            item_major = self.infer_major_genre(item)
+        # 가중치 거리 계산
+        names = list(self.distance_weights)
+        dims = [RERANK_DIMS[name] for name in names]
+        weights = np.array([self.distance_weights[name] for name in names])
 
-            if item_major != query_major:
-                score *= 0.85  # soft penalty
+        diff = candidates[..., dims] - q[..., dims]
+        dist = np.sqrt(np.square(diff) @ weights)
 
-            # mood penalty (tempo/energy/centroid mismatch)
-            if query_features["tempo"] > 0.55 and candidate_features["tempo"] < 0.45:
-                score *= 0.8
+        # 점수 변환: 거리가 작을수록 점수 높음
+        scores = 1 / (1 + dist)
 
-            if query_features["energy"] > 0.55 and candidate_features["energy"] < 0.45:
-                score *= 0.8
+        # 장르 mismatch penalty
+        q_majors = np.asarray(q_majors, dtype=np.int64)[:, None]
+        item_major = self.catalog.columns["major_genre"][labels.ravel()].reshape(labels.shape)
 
-            if query_features["spectral_centroid"] > 0.55 and candidate_features["spectral_centroid"] < 0.45:
-                score *= 0.85
+        scores *= np.where(item_major != q_majors, 0.85, 1.0)  # soft penalty
 
-            if item_major in ["country", "hiphop"] and query_major in ["pop", "rnb"]:
-                score *= 0.7
+        # mood penalty (tempo/energy/centroid mismatch)
+        mismatch = (q[..., MOOD_PENALTY_DIMS] > 0.55) & (candidates[..., MOOD_PENALTY_DIMS] < 0.45)
+        scores *= np.where(mismatch, MOOD_PENALTY_FACTORS, 1.0).prod(axis=-1)
 
-            item["score"] = score
+        # pop / rnb 기준곡이면 country / hiphop 후보 추가 penalty
+        pop_rnb = (q_majors == MAJOR_GENRE_CODES["pop"]) | (q_majors == MAJOR_GENRE_CODES["rnb"])
+        far = (item_major == MAJOR_GENRE_CODES["country"]) | (item_major == MAJOR_GENRE_CODES["hiphop"])
+        scores *= np.where(pop_rnb & far, 0.7, 1.0)
 
-            # 분위기 태그 추가
-            item["mood_keywords"] = self.get_keywords_from_features(candidate_features)
+        return scores
 
-        # 점수 높은 순 정렬
-        items.sort(key=lambda x: x["score"], reverse=True)
-        return items
+    # ------------------------------------------------------------
+    # 점수 상위 k개 label (argpartition 후 k개만 정렬)
+    # ------------------------------------------------------------
+    def select_top_k(self, labels, scores, k):
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return labels[top], scores[top]
+
+    # ------------------------------------------------------------
+    # (title, artist) 중복 제거: dedup_key별 최고 점수 후보만 남긴 뒤 상위 k개
+    # ------------------------------------------------------------
+    def dedup_top_k(self, labels, scores, k):
+        if labels.shape[0] == 0:
+            return labels, scores
+
+        keys = self.catalog.columns["dedup_key"][labels]
+
+        # key 오름차순, 같은 key 안에서는 score 내림차순 (stable → 동점이면 검색 순서 유지)
+        order = np.lexsort((-scores, keys))
+        first = np.ones(order.shape[0], dtype=bool)
+        first[1:] = keys[order[1:]] != keys[order[:-1]]
+        best = np.sort(order[first])
 
+        return self.select_top_k(labels[best], scores[best], k)
 
     # ------------------------------------------------------------
     # Final recommend
     # ------------------------------------------------------------
     def recommend(self, input_vectors, input_metadata_list, top_k=10):
 
-        # 평균 벡터
-        qvec = self.build_query_vector(input_vectors)
+        rows, mood_keywords = self.rank(input_vectors, input_metadata_list, top_k)
+
+        # Json 변환
+        return self.format_results(self.enrich_apple_metadata_batch(rows)), mood_keywords
+
+    def rank(self, input_vectors, input_metadata_list, top_k=10):
+        """
+        검색 → 필터 → rerank → 중복 제거 (CPU 작업만, 네트워크 X)
+        반환: (카탈로그 row list, mood_keywords)
+        """
+        if not self.loaded:
+            self.load_index()
+
+        # 검색 중에는 delta 반영(resize_index 등)이 끼어들지 않도록
+        with self._rw.read():
+            return self._rank(input_vectors, input_metadata_list, top_k)
+
+    def _rank(self, input_vectors, input_metadata_list, top_k):
+        # 평균 벡터 → DB와 같은 통계로 표준화
+        qvec = self.scaler.transform(self.build_query_vector(input_vectors))
 
         # 비교용 메타데이터(첫 곡)
         query_meta = input_metadata_list[0]
 
-        # 1) Top-200 from HNSW
-        raw_items = self.search_hnsw(qvec, k=200)
+        # 1) Top-K 후보 from HNSW
+        labels = self.search_hnsw(qvec, k=CANDIDATE_K)
 
         # 2) Filter
-        filtered = self.post_filter(raw_items, query_meta)
+        labels = self.post_filter(labels, query_meta)
 
         # 3) Re-rank
-        reranked = self.rerank(filtered, qvec, query_meta)
+        scores = self.rerank(labels, qvec, query_meta)
 
-        final_items = reranked
+        # 4) 중복 제거 + 상위 top_k
+        ranked, ranked_scores = self.dedup_top_k(labels, scores, top_k)
 
+        return self.ranked_rows(ranked, ranked_scores)
+
+    def ranked_rows(self, ranked, ranked_scores):
+        """상위 label / 점수 → (카탈로그 row list, mood_keywords)"""
         unique = []
-        seen = set()
-        
-        # 중복 제거
-        for item in final_items:
-            key = (item["title"].strip().lower(), item["artist"].strip().lower())
-            if key in seen:
-                continue
-            seen.add(key)
-            unique.append(item)
-            if len(unique) >= top_k:
-                break
+        for idx, score in zip(ranked, ranked_scores):
+            row = self.catalog.row(idx)
+            row["score"] = float(score)
+            unique.append(row)
 
-        # Json 변환
-        results = []
+        # 분위기 태그: 최종 결과 첫 곡 기준 (키워드 기준값은 raw 단위: BPM, Hz ...)
         mood_keywords = []
-        for item in unique:
-            enriched = self.enrich_apple_metadata(item)
+        if unique:
+            mood_keywords.append(self.get_keywords_from_features(self.raw_features(unique[0].idx)))
+
+        return unique, mood_keywords
 
+    # ------------------------------------------------------------
+    # Batch recommend: 여러 입력 세트(플레이리스트)를 한 번에
+    #   쿼리 행렬 1개 → knn_query 1회 (멀티 thread) → 2D 필터 / 점수 (단일 추천과 같은 함수)
+    #   세트별로 달라지는 건 중복 제거 + 상위 k 선택만
+    # ------------------------------------------------------------
+    def recommend_batch(self, input_sets, top_k=10):
+        """
+        input_sets: [(input_vectors, input_metadata_list), ...]
+        반환: [(results, mood_keywords), ...] (입력 순서)
+        """
+        ranked = self.rank_batch(input_sets, top_k)
+
+        # 전체 결과 곡의 링크 보완을 한 번에 (같은 곡은 Lookup 1번)
+        self.enrich_apple_metadata_many([row for rows, _ in ranked for row in rows])
+
+        return [(self.format_results(rows), mood_keywords) for rows, mood_keywords in ranked]
+
+    def rank_batch(self, input_sets, top_k=10):
+        if not self.loaded:
+            self.load_index()
+
+        with self._rw.read():
+            return self._rank_batch(input_sets, top_k)
+
+    def _rank_batch(self, input_sets, top_k):
+        if not input_sets:
+            return []
+
+        # 세트별 평균 벡터 → (B, dim) 표준화 쿼리 행렬
+        queries = self.scaler.transform(np.vstack([self.build_query_vector(vectors) for vectors, _ in input_sets]))
+
+        # 비교용 메타데이터(세트별 첫 곡)
+        query_metas = [metadata_list[0] for _, metadata_list in input_sets]
+        q_years = [query_year(meta) or -1 for meta in query_metas]
+        q_majors = [MAJOR_GENRE_CODES[self.infer_major_genre(meta)] for meta in query_metas]
+
+        # 1) 후보 (B, k)
+        labels = self.search_hnsw_batch(queries, k=CANDIDATE_K)
+
+        # 2) Filter / 3) Re-rank (2D)
+        keep = self.filter_mask(labels, q_years, q_majors)
+        scores = self.score_candidates(labels, queries, q_majors)
+
+        # 4) 세트별 중복 제거 + 상위 top_k
+        ranked = []
+        for row_labels, row_scores, row_keep in zip(labels, scores, keep):
+            top, top_scores = self.dedup_top_k(row_labels[row_keep], row_scores[row_keep], top_k)
+            ranked.append(self.ranked_rows(top, top_scores))
+
+        return ranked
+
+    def format_results(self, rows):
+        results = []
+        for enriched in rows:
             results.append({
                 "track_id": enriched["track_id"],
                 "title": enriched["title"],
@@ -387,13 +1055,218 @@ class HNSWRecommender:
                 "apple_music_url": enriched.get("apple_music_url"),
             })
 
-            if not mood_keywords:
-                mood_keywords.append(enriched.get("mood_keywords", []))
+        return results
 
-        return results, mood_keywords
-    
-        '''
-        return reranked[:top_k]
-        '''
 
-    
\ No newline at end of file
+# ------------------------------------------------------------
+# apple_metadata.json (dict list) → 컬럼 카탈로그 변환
+# ------------------------------------------------------------
+def convert_legacy_metadata(metadata_path=LEGACY_METADATA_PATH, catalog_dir=CATALOG_DIR):
+    print(f"[Catalog] {metadata_path} → {catalog_dir} 변환")
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        metadata_list = json.load(f)
+    return write_catalog(catalog_dir, metadata_list)
+
+
+# ------------------------------------------------------------
+# 표준화 이전의 raw float64 apple_vectors.npy → 표준화 float32 + 통계 저장
+# ------------------------------------------------------------
+def standardize_legacy_vectors(vectors_path=VECTORS_PATH, stats_path=STATS_PATH):
+    print(f"[Scaler] {vectors_path} 표준화 → {stats_path}")
+    vectors = np.load(vectors_path)
+    scaler = FeatureScaler.fit(vectors)
+    np.save(vectors_path, scaler.transform(vectors))
+    scaler.save(stats_path)
+    return scaler
+
+
+# ------------------------------------------------------------
+# 입력 artifact(prepare_apple_dataset 출력) → 새 버전 디렉터리에 그래프 빌드
+# publish=True면 CURRENT를 새 버전으로 (서빙 중인 프로세스는 poll 후 교체)
+# ------------------------------------------------------------
+def build_index_version(source_dir=DATA_DIR, publish=True):
+    # 예전 형식 변환(표준화 / 카탈로그)은 입력 위치에서 먼저 1회
+    HNSWRecommender(index_dir=source_dir).load_data()
+
+    name, path = create_version_dir()
+    stage_artifacts(source_dir, path, SOURCE_ARTIFACTS)
+
+    recommender = HNSWRecommender(index_dir=path)
+    recommender.load_data()
+    recommender.build_index()
+    recommender.save_index()
+
+    if publish:
+        publish_version(name)
+    return name, recommender
+
+
+# ------------------------------------------------------------
+# compaction: 현재 버전 + delta → 새 버전
+#   삭제된 곡 제외, 추가된 곡 포함해서 벡터 / 카탈로그를 새 디렉터리에 쓰고 그래프를 새로 생성
+#   (표준화 통계는 그대로 → delta 벡터도 같은 공간)
+#   예전 버전 + delta log는 그대로 남음 → CURRENT만 되돌리면 rollback
+# ------------------------------------------------------------
+def compact_index(recommender, publish=True):
+    deleted = np.fromiter(recommender.deleted, dtype=np.int64, count=len(recommender.deleted))
+    live = np.setdiff1d(np.arange(recommender.catalog.count, dtype=np.int64), deleted)
+
+    name, path = create_version_dir()
+    stage_artifacts(recommender.index_dir, path, [STATS_FILE])
+
+    # 1) 벡터
+    out = np.lib.format.open_memmap(
+        os.path.join(path, VECTORS_FILE), mode="w+", dtype=np.float32, shape=(live.shape[0], recommender.dim)
+    )
+    for start in range(0, live.shape[0], COMPACT_CHUNK):
+        chunk = live[start:start + COMPACT_CHUNK]
+        out[start:start + chunk.shape[0]] = recommender.vectors[chunk]
+    out.flush()
+    del out
+
+    # 2) 카탈로그
+    writer = CatalogWriter(os.path.join(path, CATALOG_DIRNAME))
+    for label in live:
+        writer.append(recommender.catalog.row(label).to_dict())
+    writer.close()
+
+    # 3) 그래프 새로 생성 + 저장
+    compacted = HNSWRecommender(index_dir=path)
+    compacted.load_data()
+    compacted.build_index()
+    compacted.save_index()
+    compacted.base_version = manifest_version(compacted.manifest)
+
+    if publish:
+        publish_version(name)
+    return name, compacted
+
+
+# ------------------------------------------------------------
+# 프로세스 전체에서 공유하는 recommender (인덱스는 한 번만 로드)
+#   요청은 get_recommender()로 받은 객체 1개를 끝까지 사용하고,
+#   새 버전은 백그라운드에서 다 로드한 뒤 참조만 교체
+#   → 진행 중인 요청은 예전 버전으로 끝나고, 예전 객체는 참조가 없어지면 해제
+# ------------------------------------------------------------
+_shared_recommender = None
+_shared_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_pointer_polled = 0.0
+_pointer_mtime = None
+
+
+def get_recommender():
+    global _shared_recommender
+
+    if _shared_recommender is None:
+        with _shared_lock:
+            if _shared_recommender is None:
+                recommender = HNSWRecommender()
+                recommender.load_index()
+                _shared_recommender = recommender
+
+    # CURRENT가 바뀌었으면 백그라운드 reload (이번 요청은 지금 버전으로)
+    poll_index_version()
+
+    recommender = _shared_recommender
+
+    # 다른 프로세스(update_index)가 기록한 추가/삭제 반영 (주기적으로 파일 크기만 확인)
+    recommender.sync_delta()
+    return recommender
+
+
+def poll_index_version():
+    """INDEX_POLL_INTERVAL마다 CURRENT mtime 확인 → 가리키는 버전이 바뀌었으면 reload 시작"""
+    global _pointer_polled, _pointer_mtime
+
+    if INDEX_POLL_INTERVAL <= 0:
+        return False
+
+    now = time.monotonic()
+    if now - _pointer_polled < INDEX_POLL_INTERVAL:
+        return False
+    _pointer_polled = now
+
+    mtime = pointer_mtime()
+    if mtime == _pointer_mtime:
+        return False
+    _pointer_mtime = mtime
+
+    if _shared_recommender is not None and current_index_dir() != _shared_recommender.index_dir:
+        return reload_recommender()
+    return False
+
+
+def reload_recommender(wait=False):
+    """
+    CURRENT 버전을 새 recommender로 로드해서 교체 (이미 reload 중이면 False)
+    wait=False면 백그라운드 thread에서 로드하고 바로 반환
+    """
+    if not _reload_lock.acquire(blocking=False):
+        return False
+
+    thread = threading.Thread(target=_reload, name="index-reload", daemon=True)
+    thread.start()
+    if wait:
+        thread.join()
+    return True
+
+
+def _reload():
+    global _shared_recommender
+
+    try:
+        index_dir = current_index_dir()
+        old = _shared_recommender
+        if old is not None and old.index_dir == index_dir:
+            return
+
+        start = time.monotonic()
+        recommender = HNSWRecommender(index_dir=index_dir)
+        recommender.load_index()
+
+        # 참조 교체 1번 (원자적). 예전 객체는 진행 중인 요청이 끝나면 해제
+        _shared_recommender = recommender
+        print(
+            f"[HNSW] 인덱스 교체: {old.index_dir if old else None} → {index_dir} "
+            f"(version={recommender.index_version}, {time.monotonic() - start:.1f}s)"
+        )
+    except Exception as e:
+        print("[HNSW] 새 버전 로드 실패 → 기존 인덱스 유지:", repr(e))
+    finally:
+        _reload_lock.release()
+
+
+def loaded_index_status():
+    recommender = _shared_recommender
+    return {
+        "loaded_dir": recommender.index_dir if recommender else None,
+        "loaded_version": recommender.index_version if recommender else None,
+        "current_dir": current_index_dir(),
+        "reloading": _reload_lock.locked(),
+    }
+
+
+def install_reload_signal(signum=signal.SIGUSR2):
+    """kill -USR2 <pid> → reload (signal handler는 main thread에서만 설치 가능)"""
+    try:
+        signal.signal(signum, lambda *_: reload_recommender())
+    except ValueError:
+        return False
+    return True
+
+
+# ------------------------------------------------------------
+# prefork 서버(gunicorn preload_app / uwsgi) 공유 모드
+#   master에서 fork 전에 인덱스를 로드해두면 worker는 copy-on-write로 같은 메모리를 사용
+#   - HNSW 그래프: master의 heap (검색은 읽기만 → 페이지 복사 X)
+#   - 벡터 / 카탈로그: 읽기 전용 mmap (page cache 공유)
+#   - gc.freeze: fork 이후 GC가 예전 객체 header를 건드려서 페이지가 복사되는 것 방지
+# ------------------------------------------------------------
+def preload_shared_recommender():
+    recommender = get_recommender()
+
+    gc.collect()
+    gc.freeze()
+    return recommender
+
@@ -0,0 +1,327 @@
+# spotify_app/engines/benchmark.py
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import metadata
+from multiprocessing import get_context
+
+import numpy as np
+
+from spotify_app.engines.HNSW_Engine import (
+    HNSWRecommender,
+    CANDIDATE_K,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    VECTORS_FILE,
+    STATS_FILE,
+    CATALOG_DIRNAME,
+    INDEX_FILE,
+    MANIFEST_FILE,
+)
+from spotify_app.engines.catalog_store import catalog_exists
+from spotify_app.preprocess.synthetic_catalog import generate_synthetic_catalog, SYNTHETIC_SEED
+
+# ======================================================
+# 추천 엔진 벤치마크 (합성 카탈로그, 오프라인)
+#   size별로:
+#     generate : 합성 source artifact (한 번 만들면 재사용)
+#     build    : build_index + save_index
+#     serve    : load_index → 단계별 latency (search_hnsw / post_filter / rerank / rank / recommend)
+#                → thread 수별 QPS, recommend_batch QPS
+#   단계마다 새 프로세스(spawn)에서 실행 → peak RSS가 단계별로 분리됨
+#
+#   결과는 json (commit / 환경 / 파라미터 포함) → compare_results로 commit 간 비교
+# ======================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "data", "benchmark"))
+
+BENCH_SIZES = [10_000, 100_000, 1_000_000]
+BENCH_QUERIES = 1000          # 측정 query 수 (입력 세트 수)
+BENCH_WARMUP = 50             # 측정 전에 버리는 query 수
+BENCH_THREADS = [1, 2, 4, 8]  # QPS 측정 thread 수
+BENCH_BATCH = 100             # recommend_batch 1회에 넣는 세트 수
+BENCH_TOP_K = 10
+QUERY_NOISE = 0.3             # 입력곡 = 카탈로그 곡 + noise (표준화 공간)
+
+RESULT_FORMAT_VERSION = 1
+STAGES = ["search_hnsw", "post_filter", "rerank", "rank", "recommend"]
+
+# compare 시 값이 클수록 좋은 지표 (나머지는 작을수록 좋음)
+HIGHER_IS_BETTER = ("qps.", "batch_qps")
+
+
+def peak_rss_mb():
+    """
+    현재 프로세스의 최대 RSS (MB).
+    Linux: /proc/self/status VmHWM (exec 이후 새 주소 공간 기준 → spawn된 단계 프로세스만의 값)
+      ru_maxrss는 spawn한 부모(management command)의 값을 물려받으므로 사용 X
+    그 외(macOS): ru_maxrss (byte)
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def parse_size(value):
+    """'10k' / '1m' / '50000' → 곡 수"""
+    value = str(value).strip().lower()
+    for suffix, unit in (("k", 1_000), ("m", 1_000_000)):
+        if value.endswith(suffix):
+            return int(float(value[:-1]) * unit)
+    return int(value)
+
+
+def catalog_path(size, seed=SYNTHETIC_SEED, bench_dir=BENCH_DIR):
+    return os.path.join(bench_dir, f"synthetic-{size}-{seed}")
+
+
+def latency_summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    p50, p99 = np.percentile(ms, [50, 99])
+    return {"p50": round(float(p50), 4), "p99": round(float(p99), 4), "mean": round(float(ms.mean()), 4)}
+
+
+def run_isolated(fn, *args):
+    """fn(*args)를 새 프로세스에서 실행 (import / 메모리 상태를 공유하지 않음)"""
+    with get_context("spawn").Pool(1) as pool:
+        return pool.apply(fn, args)
+
+
+# ------------------------------------------------------------
+# 단계별 실행 (새 프로세스 안에서)
+# ------------------------------------------------------------
+def generate_stage(path, size, seed):
+    os.makedirs(path, exist_ok=True)
+    started = time.perf_counter()
+    dim = generate_synthetic_catalog(
+        os.path.join(path, VECTORS_FILE),
+        os.path.join(path, STATS_FILE),
+        os.path.join(path, CATALOG_DIRNAME),
+        size,
+        seed,
+    )
+    return {"seconds": round(time.perf_counter() - started, 3), "dim": dim, "peak_rss_mb": peak_rss_mb()}
+
+
+def build_stage(path):
+    rec = HNSWRecommender(index_dir=path)
+    rec.load_data()
+
+    started = time.perf_counter()
+    rec.build_index()
+    rec.save_index()
+    return {"seconds": round(time.perf_counter() - started, 3), "peak_rss_mb": peak_rss_mb()}
+
+
+def make_queries(rec, count, seed):
+    """입력 세트 count개: 카탈로그에서 1~5곡을 골라 noise를 더한 raw 벡터 + 그 곡들의 metadata"""
+    rng = np.random.default_rng([seed, 2])
+    queries = []
+    for _ in range(count):
+        rows = np.sort(rng.integers(0, rec.catalog.count, rng.integers(1, 6)))
+        noisy = np.asarray(rec.vectors[rows], dtype=np.float64) + rng.normal(0, QUERY_NOISE, (rows.shape[0], rec.dim))
+        vectors = list(rec.scaler.inverse_transform(noisy))
+        metas = [rec.catalog.row(int(r)).to_dict() for r in rows]
+        queries.append((vectors, metas))
+    return queries
+
+
+def stage_latencies(rec, queries, top_k):
+    """query마다 단계별 소요 시간 (단일 thread)"""
+    timings = {name: [] for name in STAGES}
+
+    for vectors, metas in queries:
+        qvec = rec.scaler.transform(rec.build_query_vector(vectors))
+        query_meta = metas[0]
+
+        t0 = time.perf_counter()
+        labels = rec.search_hnsw(qvec, k=CANDIDATE_K)
+        t1 = time.perf_counter()
+        labels = rec.post_filter(labels, query_meta)
+        t2 = time.perf_counter()
+        rec.rerank(labels, qvec, query_meta)
+        t3 = time.perf_counter()
+        rec.rank(vectors, metas, top_k)
+        t4 = time.perf_counter()
+        rec.recommend(vectors, metas, top_k)
+        t5 = time.perf_counter()
+
+        timings["search_hnsw"].append(t1 - t0)
+        timings["post_filter"].append(t2 - t1)
+        timings["rerank"].append(t3 - t2)
+        timings["rank"].append(t4 - t3)
+        timings["recommend"].append(t5 - t4)
+
+    return {name: latency_summary(values) for name, values in timings.items()}
+
+
+def measure_qps(rec, queries, threads, top_k):
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        started = time.perf_counter()
+        for _ in executor.map(lambda q: rec.recommend(q[0], q[1], top_k), queries):
+            pass
+        elapsed = time.perf_counter() - started
+    return round(len(queries) / elapsed, 2)
+
+
+def measure_batch_qps(rec, queries, batch, top_k):
+    started = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        rec.recommend_batch(queries[i:i + batch], top_k)
+    elapsed = time.perf_counter() - started
+    return round(len(queries) / elapsed, 2)
+
+
+def serve_stage(path, num_queries, warmup, threads, batch, top_k, seed):
+    rec = HNSWRecommender(index_dir=path)
+
+    started = time.perf_counter()
+    rec.load_index()
+    load = {"seconds": round(time.perf_counter() - started, 3), "peak_rss_mb": peak_rss_mb()}
+
+    queries = make_queries(rec, warmup + num_queries, seed)
+    for vectors, metas in queries[:warmup]:
+        rec.recommend(vectors, metas, top_k)
+    queries = queries[warmup:]
+
+    return {
+        "load": load,
+        "latency_ms": stage_latencies(rec, queries, top_k),
+        "qps": {str(n): measure_qps(rec, queries, n, top_k) for n in threads},
+        "batch_qps": measure_batch_qps(rec, queries, batch, top_k),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ------------------------------------------------------------
+# 전체 실행
+# ------------------------------------------------------------
+def git_revision():
+    """(commit, 변경사항 있음 여부). git이 없으면 (None, None)"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain"], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def environment_info():
+    commit, dirty = git_revision()
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "hnswlib": package_version("hnswlib"),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmark(sizes=BENCH_SIZES, num_queries=BENCH_QUERIES, warmup=BENCH_WARMUP, threads=BENCH_THREADS,
+                  batch=BENCH_BATCH, top_k=BENCH_TOP_K, seed=SYNTHETIC_SEED, bench_dir=BENCH_DIR,
+                  regenerate=False, reuse_index=False, log=print):
+    """
+    size별 generate / build / serve 측정 → 결과 dict (json 그대로 저장 가능)
+    regenerate: 합성 카탈로그 다시 생성, reuse_index: 저장된 그래프가 있으면 build 생략 (build = None)
+    """
+    report = {
+        "format_version": RESULT_FORMAT_VERSION,
+        "environment": environment_info(),
+        "params": {
+            "seed": seed,
+            "queries": num_queries,
+            "warmup": warmup,
+            "threads": list(threads),
+            "batch": batch,
+            "top_k": top_k,
+            "candidate_k": CANDIDATE_K,
+            "M": HNSW_M,
+            "ef_construction": HNSW_EF_CONSTRUCTION,
+            "ef": HNSW_EF_SEARCH,
+        },
+        "results": [],
+    }
+
+    for size in sizes:
+        path = catalog_path(size, seed, bench_dir)
+        result = {"size": size, "generate": None, "build": None}
+
+        if regenerate or not catalog_exists(os.path.join(path, CATALOG_DIRNAME)):
+            log(f"[Bench] {size}곡 합성 카탈로그 생성 중... ({path})")
+            result["generate"] = run_isolated(generate_stage, path, size, seed)
+
+        has_index = os.path.exists(os.path.join(path, INDEX_FILE)) and os.path.exists(os.path.join(path, MANIFEST_FILE))
+        if result["generate"] is not None or not (reuse_index and has_index):
+            log(f"[Bench] {size}곡 HNSW 빌드 중...")
+            result["build"] = run_isolated(build_stage, path)
+
+        log(f"[Bench] {size}곡 load / query 측정 중...")
+        result.update(run_isolated(serve_stage, path, num_queries, warmup, list(threads), batch, top_k, seed))
+
+        report["results"].append(result)
+
+    return report
+
+
+# ------------------------------------------------------------
+# 결과 비교 (이전 commit json ↔ 현재)
+# ------------------------------------------------------------
+def flatten_metrics(result, prefix=""):
+    """size 결과 1개 → {"load.seconds": ..., "latency_ms.recommend.p99": ..., "qps.4": ...}"""
+    flat = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key not in ("size", "dim"):
+            flat[name] = value
+    return flat
+
+
+def compare_results(old, new, threshold=0.1):
+    """
+    두 결과 json에서 같은 size / 지표끼리 비교
+    반환: [(size, 지표, 예전 값, 새 값, 변화율, 나빠짐 여부)] (threshold 이상 나빠지면 True)
+    """
+    old_by_size = {r["size"]: flatten_metrics(r) for r in old["results"]}
+    rows = []
+
+    for result in new["results"]:
+        before = old_by_size.get(result["size"])
+        if before is None:
+            continue
+
+        for name, value in flatten_metrics(result).items():
+            prev = before.get(name)
+            if not prev:
+                continue
+
+            change = (value - prev) / prev
+            worse = -change if name.startswith(HIGHER_IS_BETTER) else change
+            rows.append((result["size"], name, prev, value, change, worse >= threshold))
+
+    return rows
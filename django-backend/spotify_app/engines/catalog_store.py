@@ -0,0 +1,492 @@
+import hashlib
+import json
+import os
+from array import array
+
+import numpy as np
+
+# ------------------------------------------------------------
+# 컬럼 기반 카탈로그 저장소
+#
+#   apple_catalog/
+#     catalog.json           : count, 장르 테이블, 컬럼 목록
+#     strings_offsets.npy    : 문자열 풀 offset (int64, n_strings + 1)
+#     strings_blob.npy       : 문자열 풀 UTF-8 바이트 (uint8)
+#     col_<name>.npy         : 컬럼별 정수 배열 (mmap 로드)
+#     dedup_hashes.npy       : 정규화 (title, artist) key hash (uint64, 정렬) ┐ delta 추가 시 기존 곡과
+#     dedup_codes.npy        : hash 순서의 dedup_key code (int32)            ┘ 같은 code를 찾는 표
+#
+# 문자열 컬럼은 풀(intern 테이블)의 code(int32, 없으면 -1)만 저장하고,
+# 실제 문자열은 row에서 접근할 때만 decode 한다.
+#
+# major_genre / year / dedup_key 는 빌드 시 미리 계산해두는 파생 컬럼
+# (요청 처리 중에는 후보별 문자열 처리 없음)
+# ------------------------------------------------------------
+CATALOG_FORMAT_VERSION = 1
+CATALOG_META_FILE = "catalog.json"
+DEDUP_HASHES_FILE = "dedup_hashes.npy"
+DEDUP_CODES_FILE = "dedup_codes.npy"
+
+STRING_COLUMNS = ["title", "artist", "preview_url", "release_date", "album_image", "apple_music_url"]
+INT_COLUMNS = {
+    "track_id": np.int64,
+    "genre": np.int16,        # genres 테이블 code (-1 = 없음)
+    "year": np.int16,         # release_date 앞 4자리 (0 = 없음)
+    "major_genre": np.int8,   # MAJOR_GENRES code
+    "dedup_key": np.int32,    # 정규화된 (title, artist) 조합 code
+}
+DERIVED_COLUMNS = ["major_genre", "dedup_key"]
+
+MAJOR_GENRES = ["pop", "rnb", "hiphop", "rock", "country", "etc"]
+MAJOR_GENRE_CODES = {name: code for code, name in enumerate(MAJOR_GENRES)}
+
+
+def infer_major_genre_name(genre_name):
+    """장르 문자열 → major-genre (pop / rnb / hiphop / rock / country / etc)"""
+    g = (genre_name or "").lower()
+    # Pop / Dance / Electronic 그룹
+    if any(x in g for x in ["pop", "k-pop", "dance", "electronic", "edm"]):
+        return "pop"
+
+    # R&B 그룹
+    if any(x in g for x in ["r&b", "soul"]):
+        return "rnb"
+
+    # Hip-hop / Rap 그룹
+    if "hip" in g or "rap" in g:
+        return "hiphop"
+
+    # Rock 그룹
+    if "rock" in g:
+        return "rock"
+
+    # Country 그룹
+    if any(x in g for x in ["country", "folk"]):
+        return "country"
+
+    # 그 외 기타 장르
+    return "etc"
+
+
+def normalize_dedup_key(title, artist):
+    return ((title or "").strip().lower(), (artist or "").strip().lower())
+
+
+def dedup_key_hash(key):
+    """정규화 (title, artist) key → uint64 hash (dedup code 표 검색용)"""
+    digest = hashlib.blake2b("\x00".join(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def save_dedup_table(catalog_dir, dedup_codes):
+    """{정규화 key: code} → hash 정렬 배열 2개 (CatalogWriter / enrich_catalog 공용)"""
+    hashes = np.fromiter((dedup_key_hash(key) for key in dedup_codes), dtype=np.uint64, count=len(dedup_codes))
+    codes = np.fromiter(dedup_codes.values(), dtype=INT_COLUMNS["dedup_key"], count=len(dedup_codes))
+
+    order = np.argsort(hashes, kind="stable")
+    np.save(os.path.join(catalog_dir, DEDUP_HASHES_FILE), hashes[order])
+    np.save(os.path.join(catalog_dir, DEDUP_CODES_FILE), codes[order])
+
+
+class DedupCodeTable:
+    """
+    delta overlay용 (정규화 key → dedup code).
+    기존 곡은 저장된 hash 표에서 검색(searchsorted), 새 key는 base code 다음 번호부터
+    → 카탈로그 크기와 상관없이 추가되는 곡 수만큼만 일함
+    derive_int_values에서 dict처럼 쓰도록 __len__ / setdefault만 제공
+    """
+
+    def __init__(self, hashes, codes, next_code):
+        self.hashes = hashes
+        self.codes = codes
+        self.next_code = next_code
+        self.extra = {}
+
+    def __len__(self):
+        return self.next_code + len(self.extra)
+
+    def lookup(self, key):
+        if self.hashes is None or self.hashes.shape[0] == 0:
+            return None
+        h = np.uint64(dedup_key_hash(key))
+        pos = int(np.searchsorted(self.hashes, h))
+        if pos < self.hashes.shape[0] and self.hashes[pos] == h:
+            return int(self.codes[pos])
+        return None
+
+    def setdefault(self, key, default):
+        code = self.extra.get(key)
+        if code is None:
+            code = self.lookup(key)
+        if code is None:
+            code = self.extra[key] = default
+        return code
+
+
+def parse_year(release_date):
+    try:
+        return int(str(release_date)[:4])
+    except (TypeError, ValueError):
+        return 0
+
+
+def derive_int_values(meta, genre_codes, dedup_codes):
+    """
+    metadata dict → 정수 컬럼 값 (CatalogWriter / delta overlay 공용)
+    genre_codes, dedup_codes: 문자열 → code dict (새 값이면 여기서 code 부여)
+    """
+    genre_name = meta.get("genre_name")
+    if genre_name is None:
+        genre = -1
+    else:
+        genre = genre_codes.setdefault(genre_name, len(genre_codes))
+
+    dedup_key = normalize_dedup_key(meta.get("title"), meta.get("artist"))
+
+    return {
+        "track_id": int(meta["track_id"]),
+        "genre": genre,
+        "year": parse_year(meta.get("release_date")),
+        "major_genre": MAJOR_GENRE_CODES[infer_major_genre_name(genre_name)],
+        "dedup_key": dedup_codes.setdefault(dedup_key, len(dedup_codes)),
+    }
+
+
+class StackedArray:
+    """
+    mmap 기본 배열 + 메모리의 작은 꼬리 배열을 한 배열처럼 indexing
+    (incremental add: 기본 artifact를 복사하지 않고 뒤에 row를 덧붙임)
+    """
+
+    def __init__(self, base, tail):
+        self.base = base
+        self.tail = tail
+        self.dtype = base.dtype
+        self.shape = (base.shape[0] + tail.shape[0],) + tuple(base.shape[1:])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, idx):
+        n = self.base.shape[0]
+
+        if isinstance(idx, (int, np.integer)):
+            return self.base[idx] if idx < n else self.tail[idx - n]
+
+        idx = np.asarray(idx, dtype=np.int64)
+        out = np.empty(idx.shape + self.shape[1:], dtype=self.dtype)
+        in_base = idx < n
+        out[in_base] = self.base[idx[in_base]]
+        out[~in_base] = self.tail[idx[~in_base] - n]
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        return np.concatenate([np.asarray(self.base), self.tail]).astype(dtype or self.dtype, copy=False)
+
+
+class CatalogWriter:
+    """
+    metadata dict를 한 줄씩 받아 컬럼 파일로 저장.
+    (전체 dict list를 메모리에 들고 있지 않아도 됨)
+    """
+
+    def __init__(self, catalog_dir):
+        self.catalog_dir = catalog_dir
+        self.count = 0
+
+        self._pool = {}
+        self._blob = bytearray()
+        self._offsets = array("q", [0])
+
+        self._genres = {}
+        self._dedup_keys = {}
+        self._columns = {name: array("i") for name in STRING_COLUMNS}
+        self._columns["track_id"] = array("q")
+        self._columns["genre"] = array("h")
+        self._columns["year"] = array("h")
+        self._columns["major_genre"] = array("b")
+        self._columns["dedup_key"] = array("i")
+
+    def _intern(self, value):
+        if value is None:
+            return -1
+
+        value = str(value)
+        code = self._pool.get(value)
+        if code is None:
+            code = len(self._pool)
+            self._pool[value] = code
+            self._blob += value.encode("utf-8")
+            self._offsets.append(len(self._blob))
+
+        return code
+
+    def append(self, meta):
+        for name in STRING_COLUMNS:
+            self._columns[name].append(self._intern(meta.get(name)))
+
+        for name, value in derive_int_values(meta, self._genres, self._dedup_keys).items():
+            self._columns[name].append(value)
+
+        self.count += 1
+
+    def close(self):
+        os.makedirs(self.catalog_dir, exist_ok=True)
+
+        np.save(os.path.join(self.catalog_dir, "strings_offsets.npy"),
+                np.frombuffer(self._offsets, dtype=np.int64))
+        np.save(os.path.join(self.catalog_dir, "strings_blob.npy"),
+                np.frombuffer(bytes(self._blob), dtype=np.uint8))
+
+        for name in STRING_COLUMNS:
+            np.save(os.path.join(self.catalog_dir, f"col_{name}.npy"),
+                    np.frombuffer(self._columns[name], dtype=np.int32))
+
+        for name, dtype in INT_COLUMNS.items():
+            np.save(os.path.join(self.catalog_dir, f"col_{name}.npy"),
+                    np.asarray(self._columns[name], dtype=dtype))
+
+        save_dedup_table(self.catalog_dir, self._dedup_keys)
+
+        meta = {
+            "format_version": CATALOG_FORMAT_VERSION,
+            "count": self.count,
+            "genres": sorted(self._genres, key=self._genres.get),
+            "string_columns": STRING_COLUMNS,
+            "int_columns": list(INT_COLUMNS),
+        }
+        with open(os.path.join(self.catalog_dir, CATALOG_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+
+        return meta
+
+
+def write_catalog(catalog_dir, metadata_list):
+    writer = CatalogWriter(catalog_dir)
+    for meta in metadata_list:
+        writer.append(meta)
+    return writer.close()
+
+
+def catalog_exists(catalog_dir):
+    return os.path.exists(os.path.join(catalog_dir, CATALOG_META_FILE))
+
+
+def enrich_catalog(catalog_dir):
+    """파생 컬럼 없이 저장된 예전 카탈로그에 major_genre / dedup_key 컬럼 추가 (1회)"""
+    store = CatalogStore(catalog_dir)
+    missing = [name for name in DERIVED_COLUMNS if name not in store.columns]
+    if not missing:
+        return store.meta
+
+    genre_major = np.array(
+        [MAJOR_GENRE_CODES[infer_major_genre_name(g)] for g in store.genres] + [MAJOR_GENRE_CODES["etc"]],
+        dtype=INT_COLUMNS["major_genre"]
+    )
+    major_genre = genre_major[np.asarray(store.columns["genre"])]
+
+    keys = {}
+    dedup_key = np.empty(store.count, dtype=INT_COLUMNS["dedup_key"])
+    for idx in range(store.count):
+        key = normalize_dedup_key(store.value(idx, "title"), store.value(idx, "artist"))
+        dedup_key[idx] = keys.setdefault(key, len(keys))
+
+    np.save(os.path.join(catalog_dir, "col_major_genre.npy"), major_genre)
+    np.save(os.path.join(catalog_dir, "col_dedup_key.npy"), dedup_key)
+    save_dedup_table(catalog_dir, keys)
+
+    meta = dict(store.meta)
+    meta["int_columns"] = list(dict.fromkeys(meta["int_columns"] + missing))
+    with open(os.path.join(catalog_dir, CATALOG_META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    return meta
+
+
+def catalog_checksum(catalog_dir, chunk_size=1 << 20):
+    """카탈로그 파일 전체의 sha256 (파일명 순서대로)"""
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(catalog_dir)):
+        h.update(name.encode("utf-8"))
+        with open(os.path.join(catalog_dir, name), "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+class CatalogRow:
+    """
+    카탈로그 한 줄에 대한 가벼운 view.
+    기존 dict 기반 코드(item["title"], item.get(...))와 호환되고,
+    요청 중에 추가되는 값(score 등)만 별도 dict에 담는다.
+    """
+
+    __slots__ = ("_store", "idx", "_extra")
+
+    def __init__(self, store, idx):
+        self._store = store
+        self.idx = idx
+        self._extra = None
+
+    def __getitem__(self, key):
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        if key == "idx":
+            return self.idx
+        return self._store.value(self.idx, key)
+
+    def __setitem__(self, key, value):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __contains__(self, key):
+        return (
+            key == "idx"
+            or key in self._store.fields
+            or (self._extra is not None and key in self._extra)
+        )
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def keys(self):
+        keys = ["idx", *self._store.fields]
+        if self._extra:
+            keys += [k for k in self._extra if k not in keys]
+        return keys
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f"CatalogRow({self.to_dict()!r})"
+
+
+class CatalogStore:
+    """mmap으로 여는 읽기 전용 카탈로그"""
+
+    def __init__(self, catalog_dir):
+        self.catalog_dir = catalog_dir
+
+        with open(os.path.join(catalog_dir, CATALOG_META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.count = self.meta["count"]
+        self.genres = self.meta["genres"]
+
+        self._offsets = self._load("strings_offsets.npy")
+        self._blob = self._load("strings_blob.npy")
+
+        self.columns = {}
+        for name in self.meta["string_columns"] + self.meta["int_columns"]:
+            self.columns[name] = self._load(f"col_{name}.npy")
+
+        self.fields = list(self.columns) + ["genre_name"]
+
+        # delta overlay (append_rows로 추가된 row, label = base_count 이후)
+        self.base_count = self.count
+        self._extra_rows = []
+        self._base_columns = None
+        self._genre_codes = None
+        self._dedup_codes = None
+
+    def _load(self, filename):
+        path = os.path.join(self.catalog_dir, filename)
+        # 빈 배열은 mmap 불가
+        if os.path.getsize(path) <= 128:
+            return np.load(path)
+        return np.load(path, mmap_mode="r")
+
+    def __len__(self):
+        return self.count
+
+    def string(self, code):
+        code = int(code)
+        if code < 0:
+            return None
+        start, end = self._offsets[code], self._offsets[code + 1]
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def genre_name(self, code):
+        code = int(code)
+        return self.genres[code] if code >= 0 else None
+
+    def value(self, idx, name):
+        if idx >= self.base_count:
+            return self._extra_value(idx, name)
+
+        if name == "genre_name":
+            return self.genre_name(self.columns["genre"][idx])
+        if name not in self.columns:
+            raise KeyError(name)
+
+        raw = self.columns[name][idx]
+        if name in self.meta["string_columns"]:
+            return self.string(raw)
+        return int(raw)
+
+    def row(self, idx):
+        return CatalogRow(self, int(idx))
+
+    def rows(self, labels):
+        return [CatalogRow(self, int(idx)) for idx in labels]
+
+    # ------------------------------------------------------------
+    # delta overlay: 기본 카탈로그 파일은 그대로 두고 메모리에 row 추가
+    # 정수 컬럼은 StackedArray로 이어 붙여서 post_filter / dedup이 그대로 동작
+    # ------------------------------------------------------------
+    def append_rows(self, metas):
+        if self._base_columns is None:
+            self._base_columns = dict(self.columns)
+            self._genre_codes = {name: code for code, name in enumerate(self.genres)}
+            self.genres = list(self.genres)
+
+            self._dedup_codes = self._load_dedup_table()
+
+        rows = []
+        for meta in metas:
+            values = derive_int_values(meta, self._genre_codes, self._dedup_codes)
+            rows.append((dict(meta), values))
+
+        self.genres = sorted(self._genre_codes, key=self._genre_codes.get)
+        self._extra_rows.extend(rows)
+        self.count = self.base_count + len(self._extra_rows)
+
+        for name, dtype in INT_COLUMNS.items():
+            tail = np.array([values[name] for _, values in self._extra_rows], dtype=dtype)
+            self.columns[name] = StackedArray(self._base_columns[name], tail)
+
+    def _load_dedup_table(self):
+        """
+        같은 곡(정규화 title, artist)은 기존 row와 같은 dedup code를 쓰도록 저장된 hash 표 사용
+        (빌드 시 code는 0부터 빈틈없이 부여 → 새 key는 max + 1 이후 번호)
+        표가 없는 예전 카탈로그: base row 전체를 훑지 않고 새 key로만 취급 (기존 곡과 중복 제거 X)
+        """
+        dedup_col = self._base_columns["dedup_key"]
+        next_code = int(np.max(dedup_col)) + 1 if self.base_count else 0
+
+        hashes_path = os.path.join(self.catalog_dir, DEDUP_HASHES_FILE)
+        if not os.path.exists(hashes_path):
+            print(f"[Catalog] {DEDUP_HASHES_FILE} 없음 → delta 곡은 기존 곡과 중복 제거 X (build_index로 재생성 권장)")
+            return DedupCodeTable(None, None, next_code)
+
+        return DedupCodeTable(self._load(DEDUP_HASHES_FILE), self._load(DEDUP_CODES_FILE), next_code)
+
+    def _extra_value(self, idx, name):
+        if idx >= self.count:
+            raise IndexError(idx)
+
+        meta, values = self._extra_rows[idx - self.base_count]
+        if name == "genre_name":
+            return meta.get("genre_name")
+        if name in values:
+            return values[name]
+        if name in self.meta["string_columns"]:
+            return meta.get(name)
+        raise KeyError(name)
+
@@ -0,0 +1,56 @@
+# spotify_app/engines/delta_log.py
+import json
+import os
+
+# ======================================================
+# 인덱스 증분 변경(delta) 기록 (jsonl, 한 줄 = 변경 1건)
+#   {"op": "add", "base": ..., "label": 1234, "track_id": ..., "vector": [...표준화 float...], "meta": {...}}
+#   {"op": "delete", "base": ..., "label": 17, "track_id": ...}
+#
+# - base: 변경이 적용되는 기본 artifact 버전 → 다른 버전 위의 기록은 무시
+# - label은 쓰는 쪽(update_index 커맨드)이 정해서 기록 → 모든 프로세스가 같은 순서로 replay
+#   (쓰는 커맨드끼리는 index_versions.write_lock으로 직렬화)
+# - 버전 디렉터리마다 log 1개 (versions/<버전>/apple_delta/delta_log.jsonl)
+#   compact_index는 delta를 합친 새 버전 디렉터리를 만들고 CURRENT만 바꿈
+#   → 새 버전은 빈 log로 시작, 예전 버전의 log는 그대로 남음 (CURRENT를 되돌리면 rollback)
+# ======================================================
+
+
+class DeltaLog:
+    def __init__(self, path):
+        self.path = path
+
+    def read(self, offset=0):
+        """offset(byte) 이후의 완전한 줄만 → (record list, 다음 offset)"""
+        if not os.path.exists(self.path):
+            return [], 0
+
+        records = []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                # 쓰는 중인 마지막 줄(개행 없음)은 다음에 다시 읽음
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if line.strip():
+                    records.append(json.loads(line))
+
+        return records, offset
+
+    def append(self, records):
+        if not records:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+
+# ------------------------------------------------------------
+# 차원별 표준화 (z-score)
+#
+# BPM / Hz 단위 spectral centroid / ms 단위 track_time 등
+# 스케일이 제각각인 raw 벡터를 같은 스케일로 맞춰서 저장한다.
+# DB 벡터(빌드 시)와 query 벡터(recommend 시) 모두 같은 통계로 변환.
+# ------------------------------------------------------------
+STATS_FORMAT_VERSION = 1
+
+
+class FeatureScaler:
+    def __init__(self, mean, std):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+
+    @property
+    def dim(self):
+        return self.mean.shape[0]
+
+    # ------------------------------------------------------------
+    # 통계 계산 (chunk 단위로 누적 → mmap 배열도 그대로 사용 가능)
+    # ------------------------------------------------------------
+    @classmethod
+    def fit(cls, vectors, chunk_size=65536):
+        vectors = np.asarray(vectors) if not isinstance(vectors, np.ndarray) else vectors
+        return cls.fit_chunks(vectors[start:start + chunk_size] for start in range(0, vectors.shape[0], chunk_size))
+
+    @classmethod
+    def fit_chunks(cls, chunks):
+        """(n_i, dim) 배열 iterator로 통계 계산 (shard 파일을 하나씩 읽으면서 사용)"""
+        n = 0
+        total = None
+        total_sq = None
+
+        for chunk in chunks:
+            chunk = np.asarray(chunk, dtype=np.float64)
+            if chunk.shape[0] == 0:
+                continue
+            if total is None:
+                total = np.zeros(chunk.shape[1], dtype=np.float64)
+                total_sq = np.zeros(chunk.shape[1], dtype=np.float64)
+
+            total += chunk.sum(axis=0)
+            total_sq += np.square(chunk).sum(axis=0)
+            n += chunk.shape[0]
+
+        if n == 0:
+            raise ValueError("vectors is empty")
+
+        mean = total / n
+        var = np.maximum(total_sq / n - np.square(mean), 0.0)
+        std = np.sqrt(var)
+
+        # 상수 차원(분산 0)은 나누지 않음
+        std[std < 1e-12] = 1.0
+
+        return cls(mean, std)
+
+    def transform(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float64)
+        return ((vectors - self.mean) / self.std).astype(np.float32)
+
+    def inverse_transform(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float64)
+        return vectors * self.std + self.mean
+
+    # ------------------------------------------------------------
+    # 저장 / 로드 (apple_feature_stats.json)
+    # ------------------------------------------------------------
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format_version": STATS_FORMAT_VERSION,
+                "dim": int(self.dim),
+                "mean": self.mean.tolist(),
+                "std": self.std.tolist(),
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            stats = json.load(f)
+        return cls(stats["mean"], stats["std"])
+
+
+def to_unit_range(z):
+    """
+    z-score → 0..1 (정규분포 CDF의 logistic 근사).
+    rerank의 0.55 / 0.45 기준값을 '상위/하위 비율'로 해석할 수 있게 해줌.
+    """
+    return 1.0 / (1.0 + np.exp(-1.702 * np.asarray(z, dtype=np.float64)))
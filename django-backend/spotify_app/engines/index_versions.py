@@ -0,0 +1,134 @@
+# spotify_app/engines/index_versions.py
+import fcntl
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+# ======================================================
+# 버전별 인덱스 디렉터리 + 원자적 CURRENT 포인터
+#
+#   apple_db/
+#     (prepare_apple_dataset 출력 = build_index 입력)
+#     versions/<버전>/apple_vectors.npy, apple_catalog/, apple_hnsw_index.bin ...
+#     CURRENT          : 서빙할 버전 이름 1줄 (os.replace로 교체)
+#     index.lock       : 인덱스를 바꾸는 커맨드(update_index / compact_index)끼리의 lock
+#
+# - 새 버전은 항상 새 디렉터리에 다 만든 뒤 CURRENT만 바꿈
+#   → 서빙 중인 파일(mmap)은 절대 덮어쓰지 않음
+# - CURRENT가 없으면 예전처럼 apple_db/ 바로 아래 artifact 사용
+# ======================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "data", "apple_db"))
+
+VERSIONS_DIRNAME = "versions"
+CURRENT_FILE = "CURRENT"
+WRITE_LOCK_FILE = "index.lock"
+KEEP_VERSIONS = 3        # prune 시 남길 버전 수 (CURRENT 포함)
+
+
+def versions_dir(data_dir=DATA_DIR):
+    return os.path.join(data_dir, VERSIONS_DIRNAME)
+
+
+def version_dir(name, data_dir=DATA_DIR):
+    return os.path.join(versions_dir(data_dir), name)
+
+
+def current_version(data_dir=DATA_DIR):
+    try:
+        with open(os.path.join(data_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def current_index_dir(data_dir=DATA_DIR):
+    """서빙할 artifact 디렉터리 (CURRENT 없으면 data_dir 자체)"""
+    name = current_version(data_dir)
+    return version_dir(name, data_dir) if name else data_dir
+
+
+def pointer_mtime(data_dir=DATA_DIR):
+    """CURRENT 파일 mtime (ns). 없으면 0 → 주기적으로 비교해서 바뀐 경우만 읽음"""
+    try:
+        return os.stat(os.path.join(data_dir, CURRENT_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+@contextmanager
+def write_lock(data_dir=DATA_DIR):
+    """
+    update_index / compact_index 직렬화 (버전과 상관없는 파일 1개).
+    CURRENT는 lock을 잡은 뒤에 읽어야 함: 기다리는 동안 compact_index가 새 버전을 publish하면
+    예전 버전의 delta log에 기록해서 변경이 사라짐
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, WRITE_LOCK_FILE), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def list_versions(data_dir=DATA_DIR):
+    root = versions_dir(data_dir)
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+
+
+def create_version_dir(data_dir=DATA_DIR):
+    """새 버전 디렉터리 → (이름, 경로). 이름은 생성 시각 (정렬 = 생성 순서)"""
+    base = time.strftime("%Y%m%d-%H%M%S")
+    name, n = base, 1
+    while os.path.exists(version_dir(name, data_dir)):
+        name = f"{base}-{n}"
+        n += 1
+
+    path = version_dir(name, data_dir)
+    os.makedirs(path)
+    return name, path
+
+
+def publish_version(name, data_dir=DATA_DIR):
+    """CURRENT → name (임시 파일에 쓰고 os.replace: 읽는 쪽은 항상 예전 값 또는 새 값만 봄)"""
+    if not os.path.isdir(version_dir(name, data_dir)):
+        raise FileNotFoundError(version_dir(name, data_dir))
+
+    path = os.path.join(data_dir, CURRENT_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def prune_versions(keep=KEEP_VERSIONS, data_dir=DATA_DIR):
+    """
+    오래된 버전 디렉터리 삭제 (CURRENT는 항상 남김).
+    아직 예전 버전을 mmap 중인 프로세스가 있어도 파일 내용은 close할 때까지 유지됨 (Linux)
+    """
+    current = current_version(data_dir)
+    old = [name for name in list_versions(data_dir) if name != current]
+    removed = old[:max(len(old) - (keep - 1), 0)]
+
+    for name in removed:
+        shutil.rmtree(version_dir(name, data_dir), ignore_errors=True)
+    return removed
+
+
+def stage_artifacts(src_dir, dst_dir, names):
+    """
+    src_dir의 artifact(파일 / 디렉터리)를 새 버전 디렉터리로 복사.
+    (hardlink X: CatalogWriter / np.save는 같은 경로를 덮어쓰므로 다음 빌드가 서빙 중인 버전을 바꿔버림)
+    """
+    for name in names:
+        src, dst = os.path.join(src_dir, name), os.path.join(dst_dir, name)
+        if os.path.isdir(src):
+            shutil.copytree(src, dst)
+        else:
+            shutil.copy2(src, dst)
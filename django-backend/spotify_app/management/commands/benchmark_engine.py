@@ -0,0 +1,110 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from spotify_app.engines.benchmark import (
+    run_benchmark,
+    compare_results,
+    parse_size,
+    BENCH_DIR,
+    BENCH_SIZES,
+    BENCH_QUERIES,
+    BENCH_WARMUP,
+    BENCH_THREADS,
+    BENCH_BATCH,
+    BENCH_TOP_K,
+)
+from spotify_app.preprocess.synthetic_catalog import SYNTHETIC_SEED
+
+
+# -----------------------------------------
+# Management Command: 추천 엔진 벤치마크 (합성 카탈로그, 네트워크 X)
+#   python manage.py benchmark_engine --sizes 10k 100k 1m
+#   python manage.py benchmark_engine --sizes 10k --compare data/benchmark/results/<이전>.json
+# 결과 json: data/benchmark/results/benchmark-<commit>-<시각>.json (--output으로 변경)
+# -----------------------------------------
+class Command(BaseCommand):
+    help = "Benchmark index build / load / query latency / QPS / peak RSS on synthetic catalogs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", default=[str(s) for s in BENCH_SIZES],
+                            help="카탈로그 크기 (예: 10k 100k 1m)")
+        parser.add_argument("--queries", type=int, default=BENCH_QUERIES, help="측정 query 수")
+        parser.add_argument("--warmup", type=int, default=BENCH_WARMUP)
+        parser.add_argument("--threads", nargs="+", type=int, default=BENCH_THREADS, help="QPS 측정 thread 수")
+        parser.add_argument("--batch", type=int, default=BENCH_BATCH, help="recommend_batch 1회 세트 수")
+        parser.add_argument("--top-k", type=int, default=BENCH_TOP_K)
+        parser.add_argument("--seed", type=int, default=SYNTHETIC_SEED)
+        parser.add_argument("--bench-dir", default=BENCH_DIR, help="합성 카탈로그 / 결과 저장 위치")
+        parser.add_argument("--regenerate", action="store_true", help="합성 카탈로그 다시 생성")
+        parser.add_argument("--reuse-index", action="store_true", help="저장된 그래프가 있으면 build 생략")
+        parser.add_argument("--output", help="결과 json 경로")
+        parser.add_argument("--compare", metavar="JSON", help="이전 결과 json과 비교")
+        parser.add_argument("--threshold", type=float, default=10.0, help="나빠짐 표시 기준 (%%)")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [parse_size(s) for s in options["sizes"]]
+        except ValueError:
+            raise CommandError(f"--sizes 형식 오류: {options['sizes']}")
+
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"], "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+
+        report = run_benchmark(
+            sizes=sizes,
+            num_queries=options["queries"],
+            warmup=options["warmup"],
+            threads=options["threads"],
+            batch=options["batch"],
+            top_k=options["top_k"],
+            seed=options["seed"],
+            bench_dir=options["bench_dir"],
+            regenerate=options["regenerate"],
+            reuse_index=options["reuse_index"],
+            log=self.stdout.write,
+        )
+
+        output = options["output"] or self.default_output(options["bench_dir"], report)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        for result in report["results"]:
+            self.print_result(result)
+
+        if baseline is not None:
+            self.print_compare(baseline, report, options["threshold"] / 100)
+
+        self.stdout.write(self.style.SUCCESS(f"\n결과 저장: {output}"))
+
+    def default_output(self, bench_dir, report):
+        commit = (report["environment"]["commit"] or "nogit")[:10]
+        return os.path.join(bench_dir, "results", f"benchmark-{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+
+    def print_result(self, result):
+        self.stdout.write(f"\n=== {result['size']}곡 ===")
+        if result["generate"]:
+            self.stdout.write(f"generate : {result['generate']['seconds']}s (peak {result['generate']['peak_rss_mb']}MB)")
+        if result["build"]:
+            self.stdout.write(f"build    : {result['build']['seconds']}s (peak {result['build']['peak_rss_mb']}MB)")
+        self.stdout.write(f"load     : {result['load']['seconds']}s (peak {result['load']['peak_rss_mb']}MB)")
+
+        for stage, latency in result["latency_ms"].items():
+            self.stdout.write(f"{stage:<12} p50 {latency['p50']:.3f}ms  p99 {latency['p99']:.3f}ms")
+
+        qps = "  ".join(f"{threads}T {value}" for threads, value in result["qps"].items())
+        self.stdout.write(f"QPS      : {qps}  | batch {result['batch_qps']}")
+        self.stdout.write(f"peak RSS : {result['peak_rss_mb']}MB (serve)")
+
+    def print_compare(self, baseline, report, threshold):
+        commit = (baseline["environment"].get("commit") or "?")[:10]
+        self.stdout.write(f"\n=== 비교: {commit} → 현재 ===")
+
+        for size, name, prev, value, change, worse in compare_results(baseline, report, threshold):
+            line = f"{size:>8} {name:<32} {prev:>10} → {value:<10} ({change:+.1%})"
+            self.stdout.write(self.style.ERROR(line) if worse else line)
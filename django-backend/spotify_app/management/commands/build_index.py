@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from spotify_app.engines.HNSW_Engine import build_index_version, DATA_DIR
+from spotify_app.engines.index_versions import prune_versions, KEEP_VERSIONS
+
+
+# -----------------------------------------
+# Management Command: HNSW 그래프 오프라인 빌드
+#   prepare_apple_dataset 출력 → versions/<버전>/ 에 빌드 → CURRENT 교체
+#   실행 중인 서버는 CURRENT 변경을 감지해서 재시작 없이 새 버전으로 교체
+# -----------------------------------------
+class Command(BaseCommand):
+    help = "Build the HNSW graph into a new index version directory and publish it"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=DATA_DIR, help="입력 artifact 디렉터리 (기본: apple_db)")
+        parser.add_argument("--no-publish", action="store_true", help="빌드만 하고 CURRENT는 그대로")
+        parser.add_argument("--keep", type=int, default=KEEP_VERSIONS, help="남길 버전 수 (오래된 버전 삭제)")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"벡터/메타데이터 로드 + HNSW 그래프 생성 중... ({options['source']})")
+        name, rec = build_index_version(options["source"], publish=not options["no_publish"])
+        manifest = rec.manifest
+
+        self.stdout.write(f" -> version: {name} ({rec.index_dir})")
+        self.stdout.write(f" -> index: {rec.index_path}")
+        self.stdout.write(f" -> manifest: {rec.manifest_path}")
+
+        if options["no_publish"]:
+            self.stdout.write("CURRENT 변경 X (--no-publish)")
+        else:
+            removed = prune_versions(keep=options["keep"])
+            if removed:
+                self.stdout.write(f" -> 오래된 버전 삭제: {', '.join(removed)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n인덱스 생성 완료 (count={manifest['count']}, dim={manifest['dim']}, "
+            f"M={manifest['M']}, ef_construction={manifest['ef_construction']})"
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from spotify_app.engines.HNSW_Engine import HNSWRecommender, compact_index
+from spotify_app.engines.index_versions import write_lock
+
+
+# -----------------------------------------
+# Management Command: delta(추가/삭제)를 합친 새 버전 생성 + 그래프 새로 생성
+#   mark_deleted 된 곡이 쌓이면 검색 품질 / 메모리가 나빠지므로 주기적으로 실행
+#   새 버전은 CURRENT로 publish → 실행 중인 서버가 감지해서 교체
+# -----------------------------------------
+class Command(BaseCommand):
+    help = "Fold the delta log into a new index version and rebuild a clean HNSW graph"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--no-publish", action="store_true", help="새 버전만 만들고 CURRENT는 그대로")
+        parser.add_argument("--verify", action="store_true",
+                            help="로드 시 artifact sha256을 manifest와 전부 비교 (기본: 크기 / mtime만)")
+
+    def handle(self, *args, **options):
+        with write_lock():
+            rec = HNSWRecommender()
+            rec.load_index(verify=options["verify"])
+
+            if rec.delta_applied == 0:
+                self.stdout.write("반영할 delta 없음")
+                return
+
+            self.stdout.write(
+                f"compaction 중... (delta {rec.delta_applied}건, live={rec.live_count()}, deleted={len(rec.deleted)})"
+            )
+            name, compacted = compact_index(rec, publish=not options["no_publish"])
+
+        manifest = compacted.manifest
+        self.stdout.write(f" -> version: {name} ({compacted.index_dir})")
+        self.stdout.write(self.style.SUCCESS(
+            f"\ncompaction 완료 (count={manifest['count']}, version={compacted.index_version})"
+        ))
@@ -1,14 +1,11 @@
-import os
 import csv
 import json
-import tempfile
 from django.core.management.base import BaseCommand
 
 from spotify_app.services.apple_client import (
     get_track_id_by_name,
-    fetch_apple_track_metadata,
-    download_preview,
-    extract_features_from_audio,
+    fetch_apple_tracks_metadata,
+    analyze_preview,
     build_metadata_vector,
     combine_feature_vectors,
 )
@@ -62,19 +59,16 @@ def run_experiment(track_ids, weights):
     final_vectors = []
     metadatas = []
 
+    fetched = fetch_apple_tracks_metadata(track_ids)   # Lookup 1회
+
     for tid in track_ids:
-        meta = fetch_apple_track_metadata(tid)
+        meta = fetched.get(int(tid))
         if not meta or "preview_url" not in meta:
             continue
         metadatas.append(meta)
 
-        # 30초 다운로드
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".m4a") as tmp:
-            path = download_preview(meta["preview_url"], tmp.name)
-
-        # feature
-        audio_vec = extract_features_from_audio(path)
-        os.remove(path)
+        # 30초 preview 디코딩 + feature
+        audio_vec = analyze_preview(meta["preview_url"])
 
         if audio_vec is None:
             continue
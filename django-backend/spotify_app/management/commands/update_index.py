@@ -0,0 +1,110 @@
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand, CommandError
+
+from spotify_app.engines.HNSW_Engine import HNSWRecommender
+from spotify_app.engines.index_versions import write_lock
+from spotify_app.services.itunes_client import get_itunes_client, ITunesError
+from spotify_app.services.apple_client import LOOKUP_BATCH_SIZE
+from spotify_app.preprocess.prepare_apple_dataset import process_track
+
+
+# -----------------------------------------
+# Management Command: 인덱스 증분 변경 (전체 재빌드 X)
+#   --add       : trackId 조회 → feature 추출 → 추가 (이미 있는 곡이면 교체)
+#   --delete    : trackId 삭제 (mark_deleted)
+#   --verify-previews : 카탈로그 전체를 Lookup해서 preview가 사라진 곡 삭제
+# 변경은 delta log에 기록되고, 실행 중인 서버는 주기적으로 읽어서 반영
+# -----------------------------------------
+class Command(BaseCommand):
+    help = "Add, update or delete tracks in the HNSW index without a full rebuild"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--add", nargs="+", type=int, default=[], metavar="TRACK_ID")
+        parser.add_argument("--delete", nargs="+", type=int, default=[], metavar="TRACK_ID")
+        parser.add_argument("--verify-previews", action="store_true",
+                            help="preview가 없어진 곡을 찾아서 삭제")
+        parser.add_argument("--workers", type=int, default=4, help="feature 추출 프로세스 수")
+        parser.add_argument("--verify", action="store_true",
+                            help="로드 시 artifact sha256을 manifest와 전부 비교 (기본: 크기 / mtime만)")
+
+    def handle(self, *args, **options):
+        if not (options["add"] or options["delete"] or options["verify_previews"]):
+            raise CommandError("--add / --delete / --verify-previews 중 하나 이상 필요")
+
+        # 다른 update_index / compact_index와 label이 겹치지 않도록 로드부터 기록까지 lock
+        # (CURRENT는 lock을 잡은 뒤에 읽음 → 기다리는 동안 publish된 새 버전에 기록)
+        with write_lock():
+            rec = HNSWRecommender()
+            rec.load_index(verify=options["verify"])
+            self.stdout.write(f"인덱스 로드 완료 (live={rec.live_count()}, version={rec.index_version})")
+
+            if options["delete"]:
+                deleted = rec.delete_tracks(options["delete"])
+                self.stdout.write(f" -> 삭제: {deleted}곡")
+
+            if options["add"]:
+                self.add_tracks(rec, options["add"], options["workers"])
+
+            if options["verify_previews"]:
+                self.verify_previews(rec)
+
+        self.stdout.write(f" -> delta log: {rec.delta_log.path}")
+        self.stdout.write(self.style.SUCCESS(
+            f"\n완료 (live={rec.live_count()}, deleted={len(rec.deleted)}, version={rec.index_version})"
+        ))
+
+    def lookup(self, track_ids):
+        """trackId → Lookup 결과 item (batch 단위, 실패한 batch는 None)"""
+        client = get_itunes_client()
+        ids = list(dict.fromkeys(track_ids))
+
+        for i in range(0, len(ids), LOOKUP_BATCH_SIZE):
+            batch = ids[i:i + LOOKUP_BATCH_SIZE]
+            try:
+                results = client.lookup(batch, entity="song")
+            except ITunesError as e:
+                self.stderr.write(f"[Lookup Error] {e}")
+                yield batch, None
+                continue
+
+            yield batch, {item["trackId"]: item for item in results
+                          if item.get("wrapperType") == "track" and item.get("trackId")}
+
+    def add_tracks(self, rec, track_ids, workers):
+        items = []
+        for batch, found in self.lookup(track_ids):
+            if found is None:
+                continue
+            for tid in batch:
+                item = found.get(tid)
+                if item is None or not item.get("previewUrl"):
+                    self.stderr.write(f"[Skip] {tid}: Lookup 결과 / previewUrl 없음")
+                    continue
+                items.append(item)
+
+        vectors, metas = [], []
+        with Pool(processes=max(min(workers, len(items)), 1)) as pool:
+            for item, result in zip(items, pool.imap(process_track, items)):
+                if result is None:
+                    self.stderr.write(f"[Skip] {item['trackId']}: feature 추출 실패")
+                    continue
+                vectors.append(result.pop("vector"))
+                metas.append(result)
+
+        added, replaced = rec.add_tracks(vectors, metas)
+        self.stdout.write(f" -> 추가: {added}곡 (그중 교체 {replaced}곡)")
+
+    def verify_previews(self, rec):
+        """Lookup 결과가 없거나 previewUrl이 빠진 곡 삭제 (조회 실패한 batch는 건드리지 않음)"""
+        track_ids = [tid for _, tid in rec.live_track_ids()]
+        self.stdout.write(f"preview 확인 중... ({len(track_ids)}곡)")
+
+        gone = []
+        for batch, found in self.lookup(track_ids):
+            if found is None:
+                continue
+            gone += [tid for tid in batch if not (found.get(tid) or {}).get("previewUrl")]
+
+        deleted = rec.delete_tracks(gone)
+        self.stdout.write(f" -> preview 없어진 곡 삭제: {deleted}곡")
@@ -0,0 +1,145 @@
+# spotify_app/preprocess/catalog_dedup.py
+import hnswlib
+import numpy as np
+
+# ======================================================
+# 빌드 시 카탈로그 중복 제거
+#   1) exact : 정규화 (title, artist) key가 같은 곡
+#   2) near  : audio 벡터 self-kNN (batch) 결과 중
+#              - 거의 같은 벡터 (같은 preview 음원: storefront 복사본 등)
+#              - 가까운 벡터 + 같은 artist (싱글 / 앨범 / 리마스터 버전 등)
+# 겹치는 쌍을 union-find로 묶고, 묶음마다 metadata가 가장 완전한 row 1개만 남김
+# ======================================================
+NEAR_DUP_K = 10                # row마다 확인할 이웃 수
+NEAR_DUP_DISTANCE = 0.01       # 같은 artist일 때 near-duplicate로 보는 cosine 거리
+IDENTICAL_DISTANCE = 1e-4      # artist와 상관없이 같은 음원으로 보는 cosine 거리
+DEDUP_QUERY_BATCH = 10000      # knn_query 1회에 넣는 row 수
+
+# 남길 row 선택 기준 (값이 있는 필드가 많을수록 우선)
+COMPLETENESS_FIELDS = ["album_image", "apple_music_url", "preview_url", "release_date", "genre_name"]
+
+
+def completeness(meta):
+    return sum(1 for name in COMPLETENESS_FIELDS if meta.get(name))
+
+
+class UnionFind:
+    """root = 묶음에서 가장 앞 row (빌드 순서 유지). parent는 int64 배열 (카탈로그 크기만큼 Python int X)"""
+
+    def __init__(self, n):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = int(parent[x])
+        return x
+
+    def union(self, a, b):
+        """서로 다른 묶음이었으면 True"""
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        if ra > rb:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        return True
+
+    def roots(self):
+        # pointer jumping: 모든 row가 root를 가리킬 때까지 parent[parent] (배열 연산)
+        roots = self.parent
+        while True:
+            jumped = roots[roots]
+            if np.array_equal(jumped, roots):
+                return jumped
+            roots = jumped
+
+
+def exact_duplicate_pairs(keys):
+    """같은 key code인 row → (row, 그 key가 처음 나온 row)"""
+    keys = np.asarray(keys)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    rows = np.arange(keys.shape[0])
+    anchors = first[inverse]
+    dup = rows != anchors
+    return rows[dup], anchors[dup]
+
+
+def near_duplicate_pairs(chunks, count, dim, artists,
+                         k=NEAR_DUP_K, max_distance=NEAR_DUP_DISTANCE, identical_distance=IDENTICAL_DISTANCE):
+    """
+    chunks(): 표준화 audio 벡터를 row 순서대로 batch로 내주는 generator 함수 (2번 호출)
+    임시 HNSW 그래프에 전부 넣고, 같은 batch 단위로 자기 자신에게 kNN 검색
+    """
+    if count < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    index = hnswlib.Index("cosine", dim=dim)
+    index.init_index(max_elements=count, ef_construction=100, M=16)
+
+    pos = 0
+    for chunk in chunks():
+        index.add_items(chunk, np.arange(pos, pos + chunk.shape[0]))
+        pos += chunk.shape[0]
+
+    k = min(k + 1, count)   # 자기 자신 포함
+    index.set_ef(max(2 * k, 50))
+
+    artists = np.asarray(artists)
+    left, right = [], []
+
+    pos = 0
+    for chunk in chunks():
+        labels, distances = index.knn_query(chunk, k=k)
+        labels = labels.astype(np.int64)
+        rows = np.arange(pos, pos + chunk.shape[0])[:, None]
+
+        same_artist = artists[labels] == artists[rows]
+        hit = (labels != rows) & (
+            (distances <= identical_distance) | ((distances <= max_distance) & same_artist)
+        )
+
+        left.append(np.broadcast_to(rows, labels.shape)[hit])
+        right.append(labels[hit])
+        pos += chunk.shape[0]
+
+    return np.concatenate(left), np.concatenate(right)
+
+
+def find_duplicates(track_ids, keys, artists, scores, chunks, dim):
+    """
+    → (남길 row mask, {남긴 track_id: [합쳐진 track_id ...]}, 통계 dict)
+    keys / artists: row별 정규화 key / artist code, scores: completeness
+    """
+    track_ids = np.asarray(track_ids)
+    count = track_ids.shape[0]
+    uf = UnionFind(count)
+    stats = {"rows": count, "exact_merged": 0, "near_merged": 0}
+
+    for a, b in zip(*exact_duplicate_pairs(keys)):
+        stats["exact_merged"] += uf.union(int(a), int(b))
+
+    for a, b in zip(*near_duplicate_pairs(chunks, count, dim, artists)):
+        stats["near_merged"] += uf.union(int(a), int(b))
+
+    # 묶음 안에서 completeness 높은 순, 같으면 먼저 나온 row
+    roots = uf.roots()
+    scores = np.asarray(scores)
+    order = np.lexsort((np.arange(count), -scores, roots))
+    first = np.ones(count, dtype=bool)
+    first[1:] = roots[order[1:]] != roots[order[:-1]]
+
+    keep = np.zeros(count, dtype=bool)
+    keep[order[first]] = True
+
+    canonical = np.empty(count, dtype=np.int64)
+    canonical[roots[order[first]]] = order[first]
+
+    merged = {}
+    for row in np.flatnonzero(~keep):
+        merged.setdefault(int(track_ids[canonical[roots[row]]]), []).append(int(track_ids[row]))
+
+    stats["kept"] = int(keep.sum())
+    return keep, merged, stats
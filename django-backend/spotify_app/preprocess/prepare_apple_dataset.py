@@ -1,14 +1,15 @@
 import os
 import json
-import requests
+import shutil
+import argparse
 import numpy as np
-import tempfile
-import time
-import subprocess
 from tqdm import tqdm
 from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
 
-from spotify_app.services.apple_client import extract_features_from_audio
+from spotify_app.services.apple_client import analyze_preview, FEATURE_EXTRACTOR
+from spotify_app.services.itunes_client import get_itunes_client, ITunesError
+from spotify_app.preprocess.vector_shards import ShardWriter, load_shard_progress, consolidate_shards, SHARD_SIZE
 
 
 # ======================================================
@@ -20,14 +21,28 @@ OUTPUT_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "data", "apple_db"))
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 VECTORS_OUT = os.path.join(OUTPUT_DIR, "apple_vectors.npy")
-META_OUT = os.path.join(OUTPUT_DIR, "apple_metadata.json")
-
-SEARCH_URL = "https://itunes.apple.com/search"
-LOOKUP_URL = "https://itunes.apple.com/lookup"
+STATS_OUT = os.path.join(OUTPUT_DIR, "apple_feature_stats.json")
+CATALOG_OUT = os.path.join(OUTPUT_DIR, "apple_catalog")
+DEDUP_MAP_OUT = os.path.join(OUTPUT_DIR, "apple_dedup_map.json")   # 남긴 trackId → 합쳐진 trackId
 
 AUDIO_DIM = 37
 LIMIT_PER_TERM = 200
 
+# ------------------------------------------------------
+# 단계별 checkpoint (중단 후 다시 실행하면 끝난 작업은 건너뜀)
+#   search.jsonl  : 끝난 (term, country) → trackId 목록 (1줄 = 1 term)
+#   lookup.jsonl  : 끝난 lookup batch → 요청 id + previewUrl 있는 결과 (1줄 = 1 batch)
+#   extract/      : feature 추출 shard (vector_shards.py: float32 벡터 npy + metadata / 실패 id json)
+# 실패한 search / lookup은 기록하지 않으므로 재실행 시 다시 시도
+# ------------------------------------------------------
+CHECKPOINT_DIR = os.path.join(OUTPUT_DIR, "build_checkpoints")
+SEARCH_CHECKPOINT = os.path.join(CHECKPOINT_DIR, "search.jsonl")
+LOOKUP_CHECKPOINT = os.path.join(CHECKPOINT_DIR, "lookup.jsonl")
+EXTRACT_CHECKPOINT_DIR = os.path.join(CHECKPOINT_DIR, "extract")
+
+LOOKUP_BATCH_SIZE = 200
+EXTRACT_SHARD_SIZE = SHARD_SIZE
+
 
 # ======================================================
 # 검색 term 목록
@@ -140,81 +155,64 @@ COUNTRY_TERMS = {
 # ======================================================
 # 기본 유틸 함수
 # ======================================================
-def safe_json(r):
-    try:
-        return r.json()
-    except:
-        return None
-
-
-def convert_to_wav(input_path, output_path):
-    cmd = [
-        "ffmpeg", "-y",
-        "-loglevel", "quiet",
-        "-i", input_path,
-        "-ar", "22050",
-        "-ac", "1",
-        output_path
-    ]
-
-    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-        return output_path
-    return None
-
 def search_task(args):
         term, country = args
-        return search_track_ids(term, country)
+        return term, country, search_track_ids(term, country)
+
+
+# ======================================================
+# Checkpoint 유틸
+# ======================================================
+def read_jsonl(path):
+    """끝까지 기록된 줄만 읽음 (중단 시 잘린 마지막 줄은 무시)"""
+    if not os.path.exists(path):
+        return []
+
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass
+    return records
+
+
+def append_jsonl(f, record):
+    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
 
 # ======================================================
 # Search API
 # ======================================================
 def search_track_ids(term, country="US"):
-    params = {
-        "term": term,
-        "media": "music",
-        "entity": "song",
-        "limit": LIMIT_PER_TERM,
-        "country": country
-    }
-
-    for attempt in range(2):
-        try:
-            r = requests.get(SEARCH_URL, params=params, timeout=5)
-            data = safe_json(r)
-            if data:
-                time.sleep(0.75)
-                return [item.get("trackId") for item in data.get("results", []) if item.get("trackId")]
-        except:
-            pass
-
-        time.sleep(0.75)
+    # 요청 간격 / 재시도는 공용 iTunes client (token bucket + backoff)가 담당
+    try:
+        results = get_itunes_client().search(
+            term,
+            media="music",
+            entity="song",
+            limit=LIMIT_PER_TERM,
+            country=country
+        )
+    except ITunesError as e:
+        print(f"[Search Error] term='{term}' 실패: {e}")
+        return None
 
-    print(f"[Search Error] term='{term}' 실패")
-    return []
+    return [item.get("trackId") for item in results if item.get("trackId")]
 
 
 # ======================================================
 # Lookup API
 # ======================================================
 def lookup_tracks_batch(track_ids):
-    joined = ",".join(str(tid) for tid in track_ids)
-    params = {"id": joined, "entity": "song"}
-
-    for attempt in range(2):
-        try:
-            r = requests.get(LOOKUP_URL, params=params, timeout=5)
-            data = safe_json(r)
-            if data:
-                return data.get("results", [])
-        except:
-            pass
-
-        time.sleep(0.5)
-
-    print("[Lookup Error] batch 조회 실패")
-    return []
+    """실패 시 None (빈 결과 [] 와 구분 → checkpoint에 기록하지 않고 재시도)"""
+    try:
+        return get_itunes_client().lookup(track_ids, entity="song")
+    except ITunesError as e:
+        print(f"[Lookup Error] batch 조회 실패: {e}")
+        return None
 
 
 # ======================================================
@@ -244,37 +242,18 @@ def build_metadata_vector(item):
 # ======================================================
 def process_track(item):
     """
-    previewUrl 다운로드 → m4a → wav 변환 → feature 추출
+    previewUrl 스트리밍 → ffmpeg pipe 디코딩 → feature 추출 (임시 파일 X)
     실패 시 None 반환
     """
     preview = item["previewUrl"]
     track_id = item["trackId"]
 
-    # 1) m4a 다운로드
+    # 1~3) 다운로드 + 디코딩 + Feature extract
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".m4a") as tmp:
-            r = requests.get(preview, timeout=10)
-            tmp.write(r.content)
-            m4a_path = tmp.name
-    except:
-        return None
-
-    # 2) m4a → wav
-    wav_path = m4a_path.replace(".m4a", ".wav")
-    wav_path = convert_to_wav(m4a_path, wav_path)
-    os.remove(m4a_path)
-
-    if not wav_path:
-        return None
-
-    # 3) Feature extract
-    try:
-        audio_vec = extract_features_from_audio(wav_path)
-    except:
+        audio_vec = analyze_preview(preview, extractor=FEATURE_EXTRACTOR)
+    except Exception:
         audio_vec = None
 
-    os.remove(wav_path)
-
     if audio_vec is None or len(audio_vec) != AUDIO_DIM:
         return None
 
@@ -290,15 +269,104 @@ def process_track(item):
         "preview_url": preview,
         "genre_name": item.get("primaryGenreName"),
         "release_date": item.get("releaseDate"),
-        "vector": final_vec.tolist()
+        "album_image": item.get("artworkUrl100"),
+        "apple_music_url": item.get("trackViewUrl") or item.get("collectionViewUrl"),
+        "vector": final_vec.astype(np.float32)
     }
 
 
 # ======================================================
 # 메인 로직
 # ======================================================
-def build_apple_dataset():
+def run_search_stage(tasks):
+    done = {(r["term"], r["country"]): r["ids"] for r in read_jsonl(SEARCH_CHECKPOINT)}
+    pending = [task for task in tasks if task not in done]
+    print(f"\nParallel Searching terms... (완료 {len(done)} / 남은 {len(pending)})")
+
+    failed = 0
+    # 네트워크 대기만 하므로 thread pool (rate limiter를 모든 요청이 공유)
+    with open(SEARCH_CHECKPOINT, "a", encoding="utf-8") as f, \
+            ThreadPool(processes=max(cpu_count() // 2, 2)) as pool:
+        for term, country, ids in tqdm(pool.imap_unordered(search_task, pending), total=len(pending)):
+            if ids is None:
+                failed += 1
+                continue
+            append_jsonl(f, {"term": term, "country": country, "ids": ids})
+            done[(term, country)] = ids
+
+    if failed:
+        print(f"[Search] 실패 {failed}개 term → 다음 실행 때 재시도")
+
+    return sorted({tid for ids in done.values() for tid in ids})
+
+
+def run_lookup_stage(unique_ids, max_rounds=2):
+    records = read_jsonl(LOOKUP_CHECKPOINT)
+    looked_up = {tid for r in records for tid in r["ids"]}
+    metadata_full = [item for r in records for item in r["items"]]
+
+    pending = [tid for tid in unique_ids if tid not in looked_up]
+    print(f"\nRunning Lookup batches... (완료 {len(looked_up)} / 남은 {len(pending)})")
+
+    with open(LOOKUP_CHECKPOINT, "a", encoding="utf-8") as f:
+        # 실패한 batch는 같은 실행 안에서 한 번 더 시도, 그래도 실패하면 다음 실행 때
+        for round_no in range(max_rounds):
+            failed = []
+            batches = [pending[i:i + LOOKUP_BATCH_SIZE] for i in range(0, len(pending), LOOKUP_BATCH_SIZE)]
+
+            for batch in tqdm(batches):
+                results = lookup_tracks_batch(batch)
+                if results is None:
+                    failed.extend(batch)
+                    continue
+
+                items = [item for item in results if item.get("previewUrl") and item.get("trackId")]
+                append_jsonl(f, {"ids": batch, "items": items})
+                metadata_full.extend(items)
+
+            if not failed:
+                break
+            if round_no + 1 < max_rounds:
+                print(f"[Lookup] 실패 {len(failed)}개 id 재시도")
+                pending = failed
+        else:
+            print(f"[Lookup] {len(failed)}개 id 조회 실패 → 다음 실행 때 재시도")
+
+    # 여러 batch / 국가에서 같은 곡이 나온 경우 1번만
+    unique_items = {}
+    for item in metadata_full:
+        unique_items.setdefault(item["trackId"], item)
+    return list(unique_items.values())
+
+
+def run_extract_stage(metadata_full, retry_failed=False):
+    _, processed, failed = load_shard_progress(EXTRACT_CHECKPOINT_DIR)
+
+    skip = processed if retry_failed else processed | failed
+    pending = [item for item in metadata_full if item["trackId"] not in skip]
+
+    print("\nExtracting audio features (Parallel)...")
+    num_workers = max(cpu_count() - 1, 2)
+    print(f"병렬 프로세스: {num_workers} core(s)")
+    print(f"feature 추출기: {FEATURE_EXTRACTOR} (GROOVIA_FEATURE_EXTRACTOR 로 변경)")
+    print(f"완료 {len(processed)} / 실패 {len(failed)} / 남은 {len(pending)}")
+
+    # 결과는 shard 크기만큼만 메모리에 두고 바로 디스크로
+    writer = ShardWriter(EXTRACT_CHECKPOINT_DIR, shard_size=EXTRACT_SHARD_SIZE)
+    with Pool(processes=num_workers) as pool:
+        for item, result in tqdm(zip(pending, pool.imap(process_track, pending, chunksize=4)), total=len(pending)):
+            if result is None:
+                writer.add_failed(item["trackId"])
+                continue
+
+            writer.append(result.pop("vector"), result)
+
+    writer.close()
+
+
+def build_apple_dataset(retry_failed=False):
     print("\nApple Music dataset 수집 시작...")
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
 
     # ----------------------------------------------
     # 1) Search (병렬 처리)
@@ -312,75 +380,46 @@ def build_apple_dataset():
         for term in terms:
             tasks.append((term, country))
 
-    print("\nParallel Searching terms...")
-
-    all_ids = []
-    with Pool(processes=max(cpu_count() // 2, 2)) as pool:
-        results = list(tqdm(pool.imap(search_task, tasks), total=len(tasks)))
-
-    for ids in results:
-        all_ids.extend(ids)
-
-    unique_ids = list(set(all_ids))
+    unique_ids = run_search_stage(tasks)
     print(f"\ntrackId 후보: {len(unique_ids)} 개")
 
     # ----------------------------------------------
-    # 2) Lookup
+    # 2) Lookup (정렬된 id를 batch로)
     # ----------------------------------------------
-    metadata_full = []
-    batch_size = 200
-
-    print("\nRunning Lookup batches...")
-
-    for i in tqdm(range(0, len(unique_ids), batch_size)):
-        batch = unique_ids[i:i + batch_size]
-        results = lookup_tracks_batch(batch)
-
-        for item in results:
-            if item.get("previewUrl") and item.get("trackId"):
-                metadata_full.append(item)
-
+    metadata_full = run_lookup_stage(unique_ids)
     print(f"\npreviewUrl 존재하는 곡: {len(metadata_full)} 개")
 
     # ----------------------------------------------
-    # 3) 병렬 Feature Extraction
+    # 3) 병렬 Feature Extraction (shard 단위 저장)
     # ----------------------------------------------
-    print("\nExtracting audio features (Parallel)...")
-
-    num_workers = max(cpu_count() - 1, 2)
-    print(f"병렬 프로세스: {num_workers} core(s)")
-
-    final_vectors = []
-    metadata_list = []
-
-    with Pool(processes=num_workers) as pool:
-        for result in tqdm(pool.imap(process_track, metadata_full), total=len(metadata_full)):
-            if result:
-                metadata_list.append({
-                    "track_id": result["track_id"],
-                    "title": result["title"],
-                    "artist": result["artist"],
-                    "preview_url": result["preview_url"],
-                    "genre_name": result["genre_name"],
-                    "release_date": result["release_date"]
-                })
-                final_vectors.append(result["vector"])
+    run_extract_stage(metadata_full, retry_failed=retry_failed)
 
     # ----------------------------------------------
-    # 4) Save
+    # 4) Save (shard → 중복 제거 → 표준화 벡터 npy / 통계 / 카탈로그)
+    #    싱글 / 앨범 버전, US·JP·KR storefront 복사본 등 같은 곡은 1개만
     # ----------------------------------------------
-    np.save(VECTORS_OUT, np.array(final_vectors))
-
-    with open(META_OUT, "w", encoding="utf-8") as f:
-        json.dump(metadata_list, f, indent=2, ensure_ascii=False)
+    count = consolidate_shards(
+        EXTRACT_CHECKPOINT_DIR, VECTORS_OUT, STATS_OUT, CATALOG_OUT,
+        dedup_map_out=DEDUP_MAP_OUT, audio_dim=AUDIO_DIM
+    )
 
     print("\n=======================================")
     print("Apple DB 생성 완료!")
-    print(f"벡터 개수: {len(final_vectors)} tracks")
+    print(f"벡터 개수: {count} tracks")
     print(f"저장 위치: {VECTORS_OUT}")
+    print(f"중복 제거 기록: {DEDUP_MAP_OUT}")
+    print(f"checkpoint: {CHECKPOINT_DIR} (다음 빌드를 처음부터 하려면 --fresh)")
     print("=======================================")
 
 
 # ======================================================
 if __name__ == "__main__":
-    build_apple_dataset()
+    parser = argparse.ArgumentParser(description="Apple Music DB 생성 (중단 후 재실행하면 이어서 진행)")
+    parser.add_argument("--fresh", action="store_true", help="checkpoint를 지우고 처음부터")
+    parser.add_argument("--retry-failed", action="store_true", help="feature 추출에 실패했던 곡도 다시 시도")
+    args = parser.parse_args()
+
+    if args.fresh and os.path.isdir(CHECKPOINT_DIR):
+        shutil.rmtree(CHECKPOINT_DIR)
+
+    build_apple_dataset(retry_failed=args.retry_failed)
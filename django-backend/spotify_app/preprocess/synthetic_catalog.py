@@ -0,0 +1,180 @@
+# spotify_app/preprocess/synthetic_catalog.py
+import numpy as np
+
+from spotify_app.engines.catalog_store import CatalogWriter
+from spotify_app.engines.feature_space import FeatureScaler
+
+# ======================================================
+# 벤치마크용 합성 카탈로그 (네트워크 / 오디오 분석 X)
+#   prepare_apple_dataset 출력과 같은 형식:
+#     apple_vectors.npy (표준화 float32), apple_feature_stats.json, apple_catalog/
+#
+# 벡터 (44차원 = audio 37 + metadata 7, build_metadata_vector와 같은 순서)
+#   - 장르별 중심 → artist별 중심 → 곡별 noise (실제 카탈로그처럼 군집이 있음)
+#   - artist 인기도는 Zipf 분포 (곡 수가 소수 artist에 몰림)
+# metadata
+#   - 실제 Apple 장르 이름 / 비율, artist별 활동 연도, 같은 artist의 같은 제목(재발매 등)
+#   - album_image / apple_music_url 전부 채움 → 추천 시 Lookup 보완(네트워크) 없음
+#
+# chunk마다 (seed, chunk 번호)로 난수를 새로 만들기 때문에
+# 통계 계산 / 기록 2번 생성해도 같은 값 (전체를 메모리에 들고 있지 않음)
+# ======================================================
+SYNTHETIC_SEED = 20240601
+SYNTHETIC_CHUNK = 65536
+TRACKS_PER_ARTIST = 20        # 평균 곡 수 (artist 수 = count // TRACKS_PER_ARTIST)
+ARTIST_ZIPF = 0.8             # artist 인기도 분포 지수
+TRACK_ID_BASE = 1_000_000_000
+
+# (Apple 장르 이름, 비율, tempo, spectral_centroid, rms)
+GENRES = [
+    ("Pop",               0.20, 118, 2400, 0.22),
+    ("K-Pop",             0.06, 122, 2600, 0.25),
+    ("J-Pop",             0.02, 128, 2500, 0.23),
+    ("Hip-Hop/Rap",       0.16,  92, 2000, 0.26),
+    ("R&B/Soul",          0.08,  96, 1900, 0.18),
+    ("Rock",              0.09, 128, 2700, 0.28),
+    ("Alternative",       0.07, 120, 2500, 0.22),
+    ("Country",           0.07, 112, 2200, 0.20),
+    ("Dance",             0.05, 124, 2800, 0.30),
+    ("Electronic",        0.05, 126, 2900, 0.27),
+    ("Latin",             0.05, 104, 2300, 0.24),
+    ("Singer/Songwriter", 0.03, 100, 1800, 0.14),
+    ("Jazz",              0.03, 110, 1700, 0.10),
+    ("Soundtrack",        0.02,  95, 1600, 0.12),
+    ("Classical",         0.02,  85, 1400, 0.07),
+]
+GENRE_WEIGHTS = np.array([g[1] for g in GENRES]) / sum(g[1] for g in GENRES)
+
+WORDS = [
+    "love", "night", "summer", "dream", "fire", "heart", "light", "rain", "blue", "gold",
+    "city", "baby", "midnight", "dance", "forever", "wild", "sweet", "broken", "young", "stars",
+    "ocean", "river", "shadow", "electric", "golden", "paradise", "memory", "highway", "moon", "sunset",
+    "cherry", "velvet", "neon", "silver", "angel", "thunder", "echo", "honey", "diamond", "ghost",
+]
+ARTIST_WORDS = [
+    "Aurora", "Velvet", "Nova", "Crimson", "Lunar", "Echo", "Atlas", "Ivory", "Saint", "Indigo",
+    "Parker", "Rivers", "Hayes", "Monroe", "Kim", "Park", "Lee", "Santos", "Cole", "Blake",
+]
+
+
+class SyntheticArtists:
+    """artist별 장르 / 중심 벡터 / 활동 시작 연도 (seed 하나로 고정)"""
+
+    def __init__(self, count, seed=SYNTHETIC_SEED):
+        rng = np.random.default_rng([seed, 0])
+        n = max(count // TRACKS_PER_ARTIST, 10)
+
+        self.count = n
+        self.genre = rng.choice(len(GENRES), size=n, p=GENRE_WEIGHTS)
+        self.start_year = np.clip(np.round(rng.normal(2008, 12, n)), 1960, 2024).astype(np.int64)
+
+        weights = 1.0 / np.arange(1, n + 1) ** ARTIST_ZIPF
+        self.weights = weights / weights.sum()
+
+        # 장르 중심 + artist 차이
+        tempo = np.array([g[2] for g in GENRES], dtype=np.float64)[self.genre]
+        centroid = np.array([g[3] for g in GENRES], dtype=np.float64)[self.genre]
+        rms = np.array([g[4] for g in GENRES], dtype=np.float64)[self.genre]
+
+        self.tempo = tempo + rng.normal(0, 8, n)
+        self.centroid = centroid + rng.normal(0, 250, n)
+        self.rms = np.clip(rms + rng.normal(0, 0.04, n), 0.02, None)
+        self.mfcc = rng.normal(0, 1, (n, 13)) * np.linspace(40, 4, 13) + np.linspace(-180, 0, 13)
+        self.contrast = rng.normal(20, 2.5, (n, 7))
+        self.chroma = rng.uniform(0.25, 0.65, (n, 12))
+
+        self.names = [
+            f"{ARTIST_WORDS[i % len(ARTIST_WORDS)]} {ARTIST_WORDS[(i // len(ARTIST_WORDS)) % len(ARTIST_WORDS)]} {i}"
+            for i in range(n)
+        ]
+
+
+def synthetic_chunk(artists, start, stop, seed=SYNTHETIC_SEED, with_metadata=True):
+    """row [start, stop) → (raw 벡터 (n, 44) float64, metadata dict list 또는 None)"""
+    chunk_no = start // SYNTHETIC_CHUNK
+    rng = np.random.default_rng([seed, 1, chunk_no])
+    n = stop - start
+
+    artist = rng.choice(artists.count, size=n, p=artists.weights)
+
+    # ---- audio 37차원 (extract_features 순서) ----
+    tempo = np.clip(artists.tempo[artist] + rng.normal(0, 10, n), 50, 200)
+    centroid = np.clip(artists.centroid[artist] + rng.normal(0, 300, n), 500, 6000)
+    rolloff = centroid * rng.normal(2.1, 0.15, n)
+    zcr = np.clip(centroid / 25000 + rng.normal(0, 0.015, n), 0.01, 0.3)
+    rms = np.clip(artists.rms[artist] + rng.normal(0, 0.05, n), 0.01, 0.6)
+    mfcc = artists.mfcc[artist] + rng.normal(0, 1, (n, 13)) * np.linspace(25, 3, 13)
+    contrast = artists.contrast[artist] + rng.normal(0, 2, (n, 7))
+    chroma = np.clip(artists.chroma[artist] + rng.normal(0, 0.08, (n, 12)), 0, 1)
+
+    # ---- metadata 7차원 (build_metadata_vector 순서) ----
+    year = np.minimum(artists.start_year[artist] + rng.geometric(0.15, n) - 1, 2025)
+    track_time_ms = np.clip(rng.normal(205000, 40000, n), 60000, 600000).round()
+    explicitness = rng.choice(3, size=n, p=[0.72, 0.03, 0.25])
+    disc_count = rng.choice([1, 2], size=n, p=[0.93, 0.07])
+    disc_number = np.where(disc_count == 2, rng.integers(1, 3, n), 1)
+
+    vectors = np.column_stack([
+        tempo, centroid, rolloff, zcr, rms, mfcc, contrast, chroma,
+        np.zeros(n), track_time_ms, explicitness, np.ones(n), disc_number, disc_count, year,
+    ])
+
+    if not with_metadata:
+        return vectors, None
+
+    # 같은 artist의 제목은 작은 조합에서 고름 → 재발매 / 버전 중복이 자연스럽게 생김
+    title_a = rng.integers(0, len(WORDS), n)
+    title_b = rng.integers(0, len(WORDS), n)
+    month = rng.integers(1, 13, n)
+    day = rng.integers(1, 29, n)
+
+    metas = []
+    for i in range(n):
+        track_id = TRACK_ID_BASE + start + i
+        album_id = TRACK_ID_BASE // 2 + (start + i) // 12
+        metas.append({
+            "track_id": track_id,
+            "title": f"{WORDS[title_a[i]].title()} {WORDS[title_b[i]].title()}",
+            "artist": artists.names[artist[i]],
+            "genre_name": GENRES[artists.genre[artist[i]]][0],
+            "release_date": f"{year[i]}-{month[i]:02d}-{day[i]:02d}T07:00:00Z",
+            "preview_url": f"https://audio-ssl.itunes.apple.com/itunes-assets/synthetic/{track_id}.m4a",
+            "album_image": f"https://is1-ssl.mzstatic.com/image/thumb/synthetic/{album_id}/100x100bb.jpg",
+            "apple_music_url": f"https://music.apple.com/us/album/{album_id}?i={track_id}",
+        })
+
+    return vectors, metas
+
+
+def synthetic_chunks(artists, count, seed=SYNTHETIC_SEED, with_metadata=True):
+    for start in range(0, count, SYNTHETIC_CHUNK):
+        yield synthetic_chunk(artists, start, min(start + SYNTHETIC_CHUNK, count), seed, with_metadata)
+
+
+def generate_synthetic_catalog(vectors_out, stats_out, catalog_dir, count, seed=SYNTHETIC_SEED):
+    """
+    count곡짜리 합성 source artifact 생성 (consolidate_shards 출력과 같은 형식)
+    반환: 벡터 차원
+    """
+    artists = SyntheticArtists(count, seed)
+
+    # 1) 통계
+    scaler = FeatureScaler.fit_chunks(vectors for vectors, _ in synthetic_chunks(artists, count, seed, with_metadata=False))
+    scaler.save(stats_out)
+
+    # 2) 표준화 벡터 / 카탈로그 기록
+    out = np.lib.format.open_memmap(vectors_out, mode="w+", dtype=np.float32, shape=(count, scaler.dim))
+    writer = CatalogWriter(catalog_dir)
+
+    pos = 0
+    for vectors, metas in synthetic_chunks(artists, count, seed):
+        out[pos:pos + vectors.shape[0]] = scaler.transform(vectors)
+        pos += vectors.shape[0]
+        for meta in metas:
+            writer.append(meta)
+
+    out.flush()
+    del out
+    writer.close()
+
+    return scaler.dim
@@ -0,0 +1,253 @@
+# spotify_app/preprocess/vector_shards.py
+import glob
+import json
+import os
+
+import numpy as np
+
+from spotify_app.engines.catalog_store import CatalogWriter, normalize_dedup_key, dedup_key_hash
+from spotify_app.engines.feature_space import FeatureScaler
+from spotify_app.preprocess.catalog_dedup import find_duplicates, completeness, DEDUP_QUERY_BATCH
+
+# ======================================================
+# feature 추출 결과를 고정 크기 shard로 바로 디스크에 기록
+#   shard_NNNNN.npy  : (n, dim) float32 raw 벡터
+#   shard_NNNNN.json : 같은 순서의 metadata + 추출 실패 id (마지막에 원자적으로 기록 = 완료 표시)
+#
+# 빌드 중에는 shard 1개 크기의 float32 버퍼만 메모리에 있고,
+# consolidate_shards가 shard를 하나씩 읽어서 서빙용 artifact를 만든다.
+# ======================================================
+SHARD_SIZE = 1000
+SHARD_GLOB = "shard_*.json"
+
+
+def _write_json_atomic(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def list_shards(shard_dir):
+    """완료된 shard의 json 경로 (번호 순)"""
+    return sorted(glob.glob(os.path.join(shard_dir, SHARD_GLOB)))
+
+
+def read_shard(json_path):
+    """→ (raw 벡터 mmap, metadata list, 실패 id list)"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        info = json.load(f)
+
+    vectors = np.load(json_path[:-len(".json")] + ".npy", mmap_mode="r")
+    return vectors, info["metadata"], info["failed"]
+
+
+def load_shard_progress(shard_dir):
+    """→ (완료 shard 수, 추출 성공 id set, 실패 id set)"""
+    shards = list_shards(shard_dir)
+    processed, failed = set(), set()
+
+    for path in shards:
+        with open(path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        processed.update(m["track_id"] for m in info["metadata"])
+        failed.update(info["failed"])
+
+    return len(shards), processed, failed
+
+
+class ShardWriter:
+    """
+    append(vec, meta)로 한 곡씩 받아 shard_size개가 차면 shard 파일 1개로 기록.
+    버퍼는 첫 벡터의 차원으로 1번만 할당 (float32)
+    """
+
+    def __init__(self, shard_dir, shard_size=SHARD_SIZE):
+        os.makedirs(shard_dir, exist_ok=True)
+        self.shard_dir = shard_dir
+        self.shard_size = shard_size
+
+        # 중단된 빌드에서 json 없이 남은 npy는 같은 번호로 덮어씀
+        self.shard_no = len(list_shards(shard_dir))
+        self.written = 0
+
+        self._buf = None
+        self._n = 0
+        self._metadata = []
+        self._failed = []
+
+    def append(self, vec, meta):
+        vec = np.asarray(vec, dtype=np.float32)
+        if self._buf is None:
+            self._buf = np.empty((self.shard_size, vec.shape[0]), dtype=np.float32)
+
+        self._buf[self._n] = vec
+        self._metadata.append(meta)
+        self._n += 1
+
+        if self._n == self.shard_size:
+            self.flush()
+
+    def add_failed(self, track_id):
+        self._failed.append(track_id)
+
+    def flush(self):
+        if self._n == 0 and not self._failed:
+            return
+
+        # 벡터 먼저, json(완료 표시)은 마지막에
+        base = os.path.join(self.shard_dir, f"shard_{self.shard_no:05d}")
+        vectors = self._buf[:self._n] if self._buf is not None else np.empty((0, 0), dtype=np.float32)
+        np.save(base + ".npy", vectors)
+        _write_json_atomic(base + ".json", {"metadata": self._metadata, "failed": self._failed})
+
+        self.written += self._n
+        self.shard_no += 1
+        self._n = 0
+        self._metadata = []
+        self._failed = []
+
+    def close(self):
+        self.flush()
+        return self.written
+
+
+def consolidate_shards(shard_dir, vectors_out, stats_out, catalog_dir, dedup_map_out=None, audio_dim=None):
+    """
+    shard → 서빙 artifact (표준화 float32 벡터 npy, 통계 json, 컬럼 카탈로그)
+    전체를 Python 객체로 들고 있지 않도록 shard를 하나씩 읽으며:
+      0) 같은 track_id는 처음 나온 row만
+      1) dedup_map_out이 있으면 같은 곡(exact / near-duplicate) 묶음마다 1개만 남기고 합친 id 기록
+      2) 남은 row로 표준화 통계 계산
+      3) 출력 npy(open_memmap)와 CatalogWriter에 순서대로 기록
+    반환: 최종 곡 수
+    """
+    shards = list_shards(shard_dir)
+
+    # 0) 중복 제거 mask (--retry-failed로 같은 곡이 다른 shard에 또 있을 수 있음)
+    ids = []
+    for path in shards:
+        _, metadata, _ = read_shard(path)
+        ids.append(np.fromiter((m["track_id"] for m in metadata), dtype=np.int64, count=len(metadata)))
+
+    all_ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+    keep = np.zeros(all_ids.shape[0], dtype=bool)
+    keep[np.unique(all_ids, return_index=True)[1]] = True
+
+    offsets = np.cumsum([0] + [len(x) for x in ids])
+
+    def shard_masks():
+        return [keep[offsets[i]:offsets[i + 1]] for i in range(len(shards))]
+
+    def kept_chunks():
+        for path, mask in zip(shards, shard_masks()):
+            if mask.any():
+                yield read_shard(path)[0][mask]
+
+    # 1) 같은 곡 합치기
+    if dedup_map_out is not None:
+        keep[keep] = dedup_catalog_rows(shards, shard_masks(), kept_chunks, dedup_map_out, audio_dim)
+
+    masks = shard_masks()
+    count = int(keep.sum())
+
+    # 2) 통계
+    scaler = FeatureScaler.fit_chunks(kept_chunks())
+    scaler.save(stats_out)
+
+    # 3) 벡터 / 카탈로그 기록 (임시 파일에 쓰고 마지막에 교체)
+    tmp_out = vectors_out[:-len(".npy")] + ".tmp.npy"
+    out = np.lib.format.open_memmap(tmp_out, mode="w+", dtype=np.float32, shape=(count, scaler.dim))
+    writer = CatalogWriter(catalog_dir)
+
+    pos = 0
+    for path, mask in zip(shards, masks):
+        if not mask.any():
+            continue
+
+        vectors, metadata, _ = read_shard(path)
+        rows = vectors[mask]
+        out[pos:pos + rows.shape[0]] = scaler.transform(rows)
+        pos += rows.shape[0]
+
+        for meta, kept in zip(metadata, mask):
+            if kept:
+                writer.append(meta)
+
+    out.flush()
+    del out
+    os.replace(tmp_out, vectors_out)
+    writer.close()
+
+    return count
+
+
+def shard_dedup_columns(metadata, mask):
+    """
+    shard 1개의 남은 row → 컬럼 배열 (track_id, 정규화 key hash, artist hash, completeness, key가 빈 row)
+    문자열 / dict는 shard 단위로만 다루고 카탈로그 전체는 배열로만 유지
+    """
+    n = int(np.count_nonzero(mask))
+    track_ids = np.empty(n, dtype=np.int64)
+    key_hashes = np.empty(n, dtype=np.uint64)
+    artist_hashes = np.empty(n, dtype=np.uint64)
+    scores = np.empty(n, dtype=np.int8)
+    empty = np.empty(n, dtype=bool)
+
+    i = 0
+    for meta, kept in zip(metadata, mask):
+        if not kept:
+            continue
+        key = normalize_dedup_key(meta.get("title"), meta.get("artist"))
+        track_ids[i] = meta["track_id"]
+        key_hashes[i] = dedup_key_hash(key)
+        artist_hashes[i] = dedup_key_hash(key[1:])
+        scores[i] = completeness(meta)
+        empty[i] = not (key[0] and key[1])
+        i += 1
+
+    return track_ids, key_hashes, artist_hashes, scores, empty
+
+
+def dedup_catalog_rows(shards, masks, kept_chunks, dedup_map_out, audio_dim=None):
+    """
+    남아있는 row(masks) 중 같은 곡 묶음마다 1개만 남기는 mask (남아있는 row 순서 기준)
+    dedup_map_out: {남긴 track_id: [합쳐진 track_id ...]} + 통계 json
+    """
+    columns = [shard_dedup_columns(read_shard(path)[1], mask) for path, mask in zip(shards, masks)]
+    if columns:
+        track_ids, key_hashes, artist_hashes, scores, empty = (np.concatenate(parts) for parts in zip(*columns))
+    else:
+        track_ids, key_hashes, artist_hashes, scores, empty = (
+            np.empty(0, dtype=dtype) for dtype in (np.int64, np.uint64, np.uint64, np.int8, bool)
+        )
+
+    # hash → 0부터 이어지는 code (DedupCodeTable과 같은 blake2b 64bit hash)
+    key_codes = np.unique(key_hashes, return_inverse=True)[1].astype(np.int64)
+    artist_codes = np.unique(artist_hashes, return_inverse=True)[1].astype(np.int64)
+
+    # title / artist가 비어있는 row는 묶지 않음 (row마다 다른 음수 code)
+    rows = np.flatnonzero(empty)
+    key_codes[rows] = -rows - 1
+    artist_codes[rows] = -rows - 1
+
+    # near-duplicate 비교용 audio 벡터 (표준화 → cosine 거리)
+    scaler = FeatureScaler.fit_chunks(kept_chunks())
+    dim = audio_dim or scaler.dim
+
+    def audio_chunks():
+        for chunk in kept_chunks():
+            chunk = scaler.transform(chunk)[:, :dim]
+            for start in range(0, chunk.shape[0], DEDUP_QUERY_BATCH):
+                yield chunk[start:start + DEDUP_QUERY_BATCH]
+
+    keep, merged, stats = find_duplicates(track_ids, key_codes, artist_codes, scores, audio_chunks, dim)
+
+    _write_json_atomic(dedup_map_out, {"stats": stats, "merged": merged})
+    print(
+        f"[Dedup] {stats['rows']} → {stats['kept']} tracks "
+        f"(exact {stats['exact_merged']}, near-duplicate {stats['near_merged']})"
+    )
+    return keep
@@ -0,0 +1,249 @@
+# spotify_app/services/apple_async_client.py
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from .apple_client import parse_lookup_results, LOOKUP_BATCH_SIZE
+from .term_cache import get_term_cache
+from .ttl_cache import MISSING
+from .audio_decoder import MAX_PREVIEW_BYTES, DECODE_TIMEOUT, CHUNK_SIZE
+from .itunes_client import (
+    get_itunes_client,
+    backoff_delay,
+    ITunesError,
+    ITUNES_SEARCH_URL,
+    ITUNES_LOOKUP_URL,
+    RETRY_STATUSES,
+)
+
+# ======================================
+# 비동기(ASGI) 경로용 Apple / iTunes client
+# - event loop마다 httpx.AsyncClient 1개를 공유 (keep-alive connection pool)
+# - 요청 하나가 worker thread를 점유하지 않으므로
+#   한 프로세스가 수백 개 요청을 동시에 기다릴 수 있음
+# - rate limit(token bucket) / endpoint 통계 / 재시도 규칙은 동기 ITunesClient와 공유
+# ======================================
+ASYNC_HTTP_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+ASYNC_HTTP_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=50)
+
+# uvicorn 등 ASGI 서버는 프로세스당 loop 1개 → client 1개.
+# WSGI(runserver / gunicorn)에서 async view는 요청마다 loop가 새로 생기고 끝나면 닫힘
+#   → async_client_scope(shared=False)로 loop가 닫히기 전에 client를 aclose
+_clients = {}
+
+
+def _discard_client(client):
+    """loop가 이미 닫힌 client 정리 (best-effort: 새 loop에서 aclose, transport 오류는 무시)"""
+    try:
+        asyncio.run(client.aclose())
+    except Exception as e:
+        print("[AsyncClient] 닫힌 loop의 client 정리 실패:", repr(e))
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+
+    for old_loop in [l for l in _clients if l.is_closed()]:
+        old = _clients.pop(old_loop)
+        # 실행 중인 loop 안에서는 asyncio.run 불가 → 별도 thread에서
+        threading.Thread(target=_discard_client, args=(old,), daemon=True).start()
+
+    client = _clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(timeout=ASYNC_HTTP_TIMEOUT, limits=ASYNC_HTTP_LIMITS)
+        _clients[loop] = client
+
+    return client
+
+
+async def close_async_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+@asynccontextmanager
+async def async_client_scope(shared=True):
+    """
+    async view 1회 처리 범위.
+    shared=False (loop가 요청마다 새로 생기는 WSGI 실행): 끝날 때 이 loop의 client를 aclose
+    """
+    try:
+        yield
+    finally:
+        if not shared:
+            await close_async_client()
+
+
+async def get_json_async(endpoint, url, params, timeout=None, retries=None, deadline=None):
+    """
+    ITunesClient.request의 비동기 버전 (같은 limiter / stats). 최종 실패 시 ITunesError
+    deadline: time.monotonic() 기준 마감 시각. 그 안에 토큰을 못 받으면 토큰을 쓰지 않고 바로 ITunesError
+    """
+    itunes = get_itunes_client()
+    retries = itunes.max_retries if retries is None else retries
+    timeout = itunes.timeout if timeout is None else timeout
+
+    for attempt in range(retries + 1):
+        attempt_timeout = timeout
+        if deadline is None:
+            wait = itunes.limiter.reserve()
+        else:
+            wait = itunes.limiter.reserve(max_wait=deadline - time.monotonic())
+            if wait is None:
+                raise ITunesError(f"{endpoint} deadline 안에 rate limit 토큰 없음")
+        if wait > 0:
+            await asyncio.sleep(wait)
+        if deadline is not None:
+            attempt_timeout = min(timeout, max(deadline - time.monotonic(), 0.01))
+
+        start = time.monotonic()
+        retry_after = None
+        try:
+            r = await get_async_client().get(url, params=params, timeout=attempt_timeout)
+        except httpx.TransportError as e:
+            error = ITunesError(f"{endpoint} 요청 실패: {e!r}")
+        else:
+            if r.is_success:
+                itunes.stats.record(endpoint, time.monotonic() - start, retry=attempt > 0)
+                try:
+                    return r.json()
+                except ValueError:
+                    raise ITunesError(f"{endpoint} 응답 JSON 파싱 실패")
+
+            error = ITunesError(f"{endpoint} HTTP {r.status_code}")
+            if r.status_code not in RETRY_STATUSES:
+                itunes.stats.record(endpoint, time.monotonic() - start, error=True, retry=attempt > 0)
+                raise error
+            retry_after = r.headers.get("Retry-After")
+
+        itunes.stats.record(endpoint, time.monotonic() - start, error=True, retry=attempt > 0)
+        if attempt < retries:
+            delay = backoff_delay(attempt, retry_after)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                break
+            await asyncio.sleep(delay)
+
+    raise error
+
+
+# --------------------------------------
+# 검색 / Lookup
+# --------------------------------------
+async def get_track_id_by_name_async(term: str, country=None):
+    term_cache = get_term_cache()
+    cached = await asyncio.to_thread(term_cache.get, term, country)   # SQLite 조회 → thread
+    if cached is not MISSING:
+        return cached
+
+    params = {
+        "term": term,
+        "limit": 1,       # 가장 유사한 1곡만
+        "media": "music"  # 음악만 검색
+    }
+    if country:
+        params["country"] = country
+
+    data = await get_json_async("search", ITUNES_SEARCH_URL, params)
+    results = data.get("results", [])
+
+    track_id = results[0].get("trackId") if results else None
+    await asyncio.to_thread(term_cache.set, term, track_id, country)
+    return track_id
+
+
+async def fetch_apple_tracks_metadata_async(track_ids, batch_size=LOOKUP_BATCH_SIZE):
+    """fetch_apple_tracks_metadata의 비동기 버전 → {track_id: metadata}"""
+    ids = list(dict.fromkeys(int(tid) for tid in track_ids))
+    batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+    responses = await asyncio.gather(
+        *(get_json_async("lookup", ITUNES_LOOKUP_URL, {"id": ",".join(map(str, batch))}, timeout=5) for batch in batches),
+        return_exceptions=True
+    )
+
+    metas = {}
+    for data in responses:
+        if isinstance(data, Exception):
+            print("metadata lookup 실패:", repr(data))
+            continue
+        metas.update(parse_lookup_results(data.get("results", [])))
+
+    return metas
+
+
+async def lookup_apple_links_async(track_id, deadline=None):
+    """
+    track_id → (album_image, apple_music_url). 없는 곡이면 (None, None)
+    deadline: time.monotonic() 기준 마감 시각 (그 안에 rate limit 토큰이 없으면 바로 ITunesError)
+    """
+    # deadline이 짧으므로 재시도 X
+    data = await get_json_async("lookup", ITUNES_LOOKUP_URL, {"id": track_id}, retries=0, deadline=deadline)
+
+    if data.get("results"):
+        info = data["results"][0]
+        return info.get("artworkUrl100"), info.get("trackViewUrl") or info.get("collectionViewUrl")
+
+    return None, None
+
+
+# --------------------------------------
+# preview 다운로드 (메모리, 크기 제한)
+# --------------------------------------
+async def fetch_preview_bytes(url, max_bytes=MAX_PREVIEW_BYTES, timeout=DECODE_TIMEOUT):
+    """preview URL → bytes. 실패 / 크기 초과 시 None"""
+    try:
+        async with asyncio.timeout(timeout):
+            async with get_async_client().stream("GET", url) as r:
+                r.raise_for_status()
+
+                length = r.headers.get("Content-Length")
+                if length and int(length) > max_bytes:
+                    print(f"preview too large ({length} bytes)")
+                    return None
+
+                body = bytearray()
+                async for chunk in r.aiter_bytes(CHUNK_SIZE):
+                    body += chunk
+                    if len(body) > max_bytes:
+                        print("preview too large")
+                        return None
+
+                return bytes(body)
+
+    except (httpx.HTTPError, TimeoutError) as e:
+        print("preview 다운로드 실패:", repr(e))
+        return None
+
+
+# --------------------------------------
+# 추천 결과 album_image / apple_music_url 보완 (비동기 버전)
+# --------------------------------------
+async def enrich_apple_metadata_async(recommender, items, deadline):
+    """
+    HNSWRecommender.enrich_apple_metadata_batch의 비동기 버전
+    (같은 TTL 캐시 / fallback 규칙 사용)
+    """
+    pending = recommender.pending_enrichment(items)
+    if not pending:
+        return items
+
+    # limiter 대기도 같은 deadline 안에서만 (늦게 나올 토큰은 예약하지 않음 → 뒤 요청을 밀어내지 않음)
+    expires = time.monotonic() + deadline
+    tasks = {asyncio.ensure_future(lookup_apple_links_async(item["track_id"], expires)): item for item in pending}
+    done, not_done = await asyncio.wait(tasks, timeout=deadline)
+
+    for task in not_done:
+        task.cancel()
+
+    for task, item in tasks.items():
+        links = None
+        if task in done and task.exception() is None:
+            links = task.result()
+
+        recommender.apply_links(item, links)
+
+    return items
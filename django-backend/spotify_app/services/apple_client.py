@@ -1,30 +1,72 @@
 # spotify_app/services/apple_client.py
-import requests
+import os
 import librosa
 import numpy as np
 
-ITUNES_LOOKUP_URL = "https://itunes.apple.com/lookup"
+from .audio_decoder import decode_preview, decode_audio_bytes, AudioDecodeError
+from .itunes_client import get_itunes_client, ITunesError, ITUNES_LOOKUP_URL
+from .term_cache import get_term_cache
+from .ttl_cache import MISSING
+
+LOOKUP_BATCH_SIZE = 200   # Lookup API 한 번에 조회할 id 수
+
+# feature 추출기 선택
+#   "librosa"     : feature마다 librosa 함수 개별 호출 (각자 STFT/mel 재계산)
+#   "single_stft" : STFT / mel / onset envelope 1회 계산 후 모든 feature 공유 (기본값)
+FEATURE_EXTRACTORS = ("librosa", "single_stft")
+FEATURE_EXTRACTOR = os.getenv("GROOVIA_FEATURE_EXTRACTOR", "single_stft")
+
+# single_stft가 librosa 방식과 같다고 보는 오차 (feature별, np.allclose 기준 - tests.py에서 확인)
+SINGLE_STFT_RTOL = 1e-4
+SINGLE_STFT_ATOL = 1e-6
+
+# feature 추출 방식이 바뀌면 올려서 예전 캐시 벡터를 쓰지 않도록 함
+FEATURE_EXTRACTOR_VERSION = f"{FEATURE_EXTRACTOR}-ffmpeg-v2"
+
+SAMPLE_RATE = 22050
+N_FFT = 2048
+HOP_LENGTH = 512
 
 
 # ===============================
 # 음악의 기본 metadata 가져오는 함수
 # ===============================
 def fetch_apple_track_metadata(track_id: int):
+    return fetch_apple_tracks_metadata([track_id]).get(int(track_id))
+
+
+def fetch_apple_tracks_metadata(track_ids, batch_size=LOOKUP_BATCH_SIZE):
+    """
+    여러 trackId를 Lookup 1회(id=1,2,3...)로 조회 → {track_id: metadata}
+    조회되지 않은 id는 결과 dict에 없음
+    """
+    ids = list(dict.fromkeys(int(tid) for tid in track_ids))   # 중복 제거, 순서 유지
+    metas = {}
+
+    for i in range(0, len(ids), batch_size):
+        try:
+            results = get_itunes_client().lookup(ids[i:i + batch_size], timeout=5)
+        except ITunesError as e:
+            print("metadata lookup 실패:", e)
+            continue
+
+        metas.update(parse_lookup_results(results))
+
+    return metas
+
+
+def parse_lookup_results(results):
+    """Lookup 결과 list → {track_id: metadata} (곡이 아닌 항목은 제외)"""
+    return {
+        item["trackId"]: parse_track_metadata(item)
+        for item in results
+        if item.get("trackId") and item.get("wrapperType", "track") == "track"
+    }
+
+
+def parse_track_metadata(item):
+    """Lookup 결과 1개 → 추천에 쓰는 metadata dict (동기 / 비동기 client 공용)"""
 
-    url = f"{ITUNES_LOOKUP_URL}?id={track_id}"
-    
-    try:
-        r = requests.get(url, timeout=5)
-        data = r.json()
-    except:
-        return None
-    
-    results = data.get("results", [])
-    if not results:
-        return None
-    
-    item = results[0]   # trackId로 조회했으므로 정확히 1개
-    
     # 필요한 필드 변환
     meta = {
         "genre_name": item.get("primaryGenreName", 0),
@@ -48,18 +90,43 @@ def fetch_apple_track_metadata(track_id: int):
 # ======================================
 # 30초 url에서 metadata 추출 함수(librosa)
 # ======================================
-def extract_features_from_audio(file_path):
+def extract_features_from_audio(file_path, extractor=None):
 
     try:
-        y, sr = librosa.load(file_path, sr=22050, mono=True)
+        y, sr = librosa.load(file_path, sr=SAMPLE_RATE, mono=True)
     except Exception as e:
         print("librosa.load 실패:", e)
         return None
 
+    return extract_features_from_signal(y, sr, extractor)
+
+
+def extract_features_from_signal(y, sr, extractor=None):
+    extractor = extractor or FEATURE_EXTRACTOR
+
+    if extractor == "single_stft":
+        feature_vector = extract_features_single_stft(y, sr)
+    elif extractor == "librosa":
+        feature_vector = extract_features_librosa(y, sr)
+    else:
+        raise ValueError(f"unknown feature extractor: {extractor}")
+
+    if feature_vector.shape[0] != 37:
+        print("vector length mismatch:", feature_vector.shape)
+        return None
+
+    return feature_vector
+
+
+# --------------------------------------
+# 기존 방식: feature별 librosa 함수 개별 호출
+# --------------------------------------
+def extract_features_librosa(y, sr):
+
     # Tempo
     try:
         tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-        tempo = float(tempo)
+        tempo = float(np.atleast_1d(tempo)[0])
     except:
         tempo = 0.0
 
@@ -122,7 +189,7 @@ def extract_features_from_audio(file_path):
         chroma_mean = np.zeros(12)
 
     # Final vector
-    feature_vector = np.array([
+    return np.array([
         tempo,
         spec_centroid,
         spec_bandwidth,
@@ -133,39 +200,129 @@ def extract_features_from_audio(file_path):
         *chroma_mean
     ], dtype=float)
 
-    if feature_vector.shape[0] != 37:
-        print("vector length mismatch:", feature_vector.shape)
+
+# --------------------------------------
+# STFT 1회 방식: magnitude spectrogram / mel / onset envelope를 한 번만 계산하고
+# 모든 spectral feature를 여기서 파생 (librosa 기본 파라미터와 동일 → 같은 값)
+# ZCR / RMS는 STFT 없이 시간축 frame에서 바로 계산
+# --------------------------------------
+def extract_features_single_stft(y, sr):
+
+    # 공통 spectrogram
+    S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    S_power = S ** 2
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S_power, sr=sr))
+
+    # Tempo (beat_track 기본값과 같은 onset envelope: mel dB + median)
+    try:
+        onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr, hop_length=HOP_LENGTH, aggregate=np.median)
+        tempo, _ = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH)
+        tempo = float(np.atleast_1d(tempo)[0])
+    except Exception:
+        tempo = 0.0
+
+    # MFCC (13)
+    try:
+        mfcc_mean = np.mean(librosa.feature.mfcc(S=mel_db, n_mfcc=13), axis=1)
+    except Exception as e:
+        print("MFCC 실패:", e)
+        mfcc_mean = np.zeros(13)
+
+    # Centroid
+    try:
+        spec_centroid = float(np.mean(librosa.feature.spectral_centroid(S=S, sr=sr)))
+    except Exception:
+        spec_centroid = 0.0
+
+    # Bandwidth
+    try:
+        spec_bandwidth = float(np.mean(librosa.feature.spectral_bandwidth(S=S, sr=sr)))
+    except Exception:
+        spec_bandwidth = 0.0
+
+    # ZCR
+    try:
+        zcr = float(np.mean(librosa.feature.zero_crossing_rate(y)))
+    except Exception:
+        zcr = 0.0
+
+    # RMS
+    try:
+        rms = float(np.mean(librosa.feature.rms(y=y)))
+    except Exception:
+        rms = 0.0
+
+    # Spectral Contrast
+    try:
+        contrast_mean = np.mean(librosa.feature.spectral_contrast(S=S, sr=sr), axis=1)
+    except Exception:
+        contrast_mean = np.zeros(7)
+
+    # Chroma
+    try:
+        chroma_mean = np.mean(librosa.feature.chroma_stft(S=S_power, sr=sr), axis=1)
+    except Exception:
+        chroma_mean = np.zeros(12)
+
+    # Final vector
+    return np.array([
+        tempo,
+        spec_centroid,
+        spec_bandwidth,
+        zcr,
+        rms,
+        *mfcc_mean,
+        *contrast_mean,
+        *chroma_mean
+    ], dtype=float)
+
+
+# ======================================
+# preview URL → 메모리에서 디코딩 → feature vector (임시 파일 X)
+# ======================================
+def analyze_preview(preview_url, extractor=None):
+    y = decode_preview(preview_url, sr=SAMPLE_RATE)
+    if y is None or y.shape[0] == 0:
         return None
 
-    return feature_vector
+    return extract_features_from_signal(y, SAMPLE_RATE, extractor)
+
+
+def analyze_preview_bytes(data, extractor=None):
+    """이미 받아둔 preview bytes → feature vector (비동기 경로: 다운로드는 event loop에서)"""
+    try:
+        y = decode_audio_bytes(data, sr=SAMPLE_RATE)
+    except AudioDecodeError as e:
+        print("preview decode 실패:", e)
+        return None
 
+    if y.shape[0] == 0:
+        return None
 
-def download_preview(url, save_path):
-    r = requests.get(url)
-    with open(save_path, "wb") as f:
-        f.write(r.content)
-    return save_path
+    return extract_features_from_signal(y, SAMPLE_RATE, extractor)
 
 
 """
 '곡명 + 아티스트명' 문구를 넣으면 가장 정확한 trackId 반환
+(국가 + 정규화한 term 기준 캐시. 검색 결과 없음도 짧게 캐시, 요청 실패는 캐시 X)
 """
-def get_track_id_by_name(term: str):
-    
-    url = "https://itunes.apple.com/search"
-    params = {
-        "term": term,
-        "limit": 1,       # 가장 유사한 1곡만
-        "media": "music"  # 음악만 검색
-    }
-
-    r = requests.get(url, params=params)
-    results = r.json().get("results", [])
+def get_track_id_by_name(term: str, country=None):
 
-    if not results:
-        return None
+    term_cache = get_term_cache()
+    cached = term_cache.get(term, country)
+    if cached is not MISSING:
+        return cached
     
-    return results[0].get("trackId")
+    results = get_itunes_client().search(
+        term,
+        limit=1,         # 가장 유사한 1곡만
+        media="music",   # 음악만 검색
+        country=country
+    )
+
+    track_id = results[0].get("trackId") if results else None
+    term_cache.set(term, track_id, country)
+    return track_id
 
 
 def explicit_to_numeric(value: str):
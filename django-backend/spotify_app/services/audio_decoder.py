@@ -0,0 +1,215 @@
+# spotify_app/services/audio_decoder.py
+import os
+import subprocess
+import threading
+import time
+
+import numpy as np
+import requests
+
+from .itunes_client import get_itunes_client, ITunesError
+
+# ======================================
+# preview 음원 → PCM (디스크 사용 X)
+#
+# HTTP body를 chunk 단위로 ffmpeg stdin에 바로 흘려보내고,
+# stdout으로 나오는 float32 mono PCM을 메모리에서 numpy 배열로 받는다.
+#
+# moov atom이 파일 끝에 있는 m4a는 pipe(seek 불가)로 디코딩이 안 되므로,
+# 그 경우에만 받아둔 body를 memfd(메모리 파일, seek 가능)로 넘겨 한 번 더 디코딩.
+# ======================================
+FFMPEG_BIN = os.getenv("GROOVIA_FFMPEG", "ffmpeg")
+
+SAMPLE_RATE = 22050
+MAX_PREVIEW_BYTES = 8 * 1024 * 1024     # 30초 preview는 보통 1MB 안팎
+MAX_AUDIO_SECONDS = 60                  # 디코딩 결과 상한
+DECODE_TIMEOUT = 20.0                   # 다운로드 + 디코딩 전체 제한 (초)
+CHUNK_SIZE = 64 * 1024
+PREVIEW_RETRIES = 1                     # 다운로드 재시도 (DECODE_TIMEOUT 안에 끝나도록 1번만)
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+class AudioLimitError(AudioDecodeError):
+    """크기 / 시간 제한 초과 (재시도하지 않음)"""
+    pass
+
+
+def _remaining(deadline):
+    return None if deadline is None else max(deadline - time.monotonic(), 0.1)
+
+
+def _spawn_ffmpeg(input_arg, sr, pass_fds=()):
+    cmd = [
+        FFMPEG_BIN,
+        "-loglevel", "error",
+        "-i", input_arg,
+        "-f", "f32le",
+        "-acodec", "pcm_f32le",
+        "-ac", "1",
+        "-rematrix_maxval", "1.0",   # stereo → mono를 채널 평균으로 (librosa.load와 같은 스케일)
+        "-ar", str(sr),
+        "pipe:1",
+    ]
+
+    try:
+        return subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if input_arg == "pipe:0" else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            pass_fds=pass_fds
+        )
+    except OSError as e:
+        raise AudioDecodeError(f"ffmpeg 실행 실패: {e}")
+
+
+def _read_stdout(proc, max_bytes, out):
+    total = 0
+    while True:
+        chunk = proc.stdout.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            out["error"] = "decoded audio too long"
+            proc.kill()
+            break
+        out["chunks"].append(chunk)
+
+
+def _finish(proc, reader, out, deadline):
+    try:
+        proc.wait(timeout=_remaining(deadline))
+    except subprocess.TimeoutExpired:
+        raise AudioLimitError("decode timeout")
+
+    reader.join(timeout=1.0)
+
+    if out["error"]:
+        raise AudioLimitError(out["error"])
+    if proc.returncode != 0:
+        raise AudioDecodeError(f"ffmpeg exit code {proc.returncode}")
+
+    pcm = b"".join(out["chunks"])
+    if not pcm:
+        raise AudioDecodeError("empty audio")
+
+    return np.frombuffer(pcm[: len(pcm) // 4 * 4], dtype=np.float32)
+
+
+def _start_reader(proc, sr):
+    out = {"chunks": [], "error": None}
+    reader = threading.Thread(
+        target=_read_stdout,
+        args=(proc, sr * 4 * MAX_AUDIO_SECONDS, out),
+        daemon=True
+    )
+    reader.start()
+    return reader, out
+
+
+def decode_audio_stream(chunks, sr=SAMPLE_RATE, deadline=None, max_bytes=MAX_PREVIEW_BYTES):
+    """
+    chunks: bytes iterator (HTTP body 등) → float32 PCM (mono, sr)
+    실패 시 AudioDecodeError
+    """
+    proc = _spawn_ffmpeg("pipe:0", sr)
+    reader, out = _start_reader(proc, sr)
+
+    try:
+        received = 0
+        try:
+            for chunk in chunks:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise AudioLimitError("decode timeout")
+
+                received += len(chunk)
+                if received > max_bytes:
+                    raise AudioLimitError("preview too large")
+
+                proc.stdin.write(chunk)
+        except BrokenPipeError:
+            # ffmpeg가 먼저 종료 (잘못된 입력 등) → returncode로 판단
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+        return _finish(proc, reader, out, deadline)
+
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def decode_audio_bytes(data, sr=SAMPLE_RATE, deadline=None):
+    """
+    메모리에 있는 음원 bytes → PCM. memfd(익명 메모리 파일)로 넘겨서 ffmpeg가 seek 가능
+    """
+    if not hasattr(os, "memfd_create"):
+        raise AudioDecodeError("memfd_create 미지원 플랫폼")
+
+    fd = os.memfd_create("groovia-preview")
+    try:
+        os.write(fd, data)
+        os.lseek(fd, 0, os.SEEK_SET)
+
+        proc = _spawn_ffmpeg(f"/dev/fd/{fd}", sr, pass_fds=(fd,))
+        reader, out = _start_reader(proc, sr)
+        try:
+            return _finish(proc, reader, out, deadline)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+    finally:
+        os.close(fd)
+
+
+def decode_preview(url, sr=SAMPLE_RATE, timeout=DECODE_TIMEOUT, max_bytes=MAX_PREVIEW_BYTES):
+    """
+    preview URL → float32 PCM 배열 (mono, sr). 실패 시 None
+    다운로드는 공유 ITunesClient (connection pool / 재시도 / endpoint 통계)
+    """
+    deadline = time.monotonic() + timeout
+
+    try:
+        with get_itunes_client().stream(url, timeout=min(timeout, 10), retries=PREVIEW_RETRIES) as r:
+            length = r.headers.get("Content-Length")
+            if length and int(length) > max_bytes:
+                raise AudioLimitError(f"preview too large ({length} bytes)")
+
+            body = []
+            body_iter = r.iter_content(chunk_size=CHUNK_SIZE)
+
+            def tee():
+                for chunk in body_iter:
+                    body.append(chunk)
+                    yield chunk
+
+            try:
+                return decode_audio_stream(tee(), sr=sr, deadline=deadline, max_bytes=max_bytes)
+            except AudioLimitError:
+                raise
+            except AudioDecodeError:
+                # 스트리밍 디코딩 실패 (moov atom이 뒤에 있는 m4a 등) → 나머지 body 받고 memfd로 재시도
+                received = sum(len(chunk) for chunk in body)
+                for chunk in body_iter:
+                    received += len(chunk)
+                    if received > max_bytes:
+                        raise AudioLimitError("preview too large")
+                    if time.monotonic() > deadline:
+                        raise AudioLimitError("decode timeout")
+                    body.append(chunk)
+
+                return decode_audio_bytes(b"".join(body), sr=sr, deadline=deadline)
+
+    except (requests.RequestException, ITunesError, AudioDecodeError) as e:
+        print("preview decode 실패:", e)
+        return None
@@ -0,0 +1,136 @@
+# spotify_app/services/extraction_pool.py
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+
+# ======================================
+# 입력곡 분석(preview 디코딩 + librosa feature 추출)용 상주 프로세스 풀
+# - worker 시작 시 librosa import + numba JIT를 미리 끝내둠 (첫 요청 지연 제거)
+# - 대기 작업 수 제한 (초과 시 ExtractionPoolBusy)
+# - 작업별 timeout (초과한 곡은 None)
+# ======================================
+EXTRACTION_WORKERS = int(os.getenv("GROOVIA_EXTRACTION_WORKERS", min(4, os.cpu_count() or 1)))
+EXTRACTION_MAX_PENDING = int(os.getenv("GROOVIA_EXTRACTION_MAX_PENDING", EXTRACTION_WORKERS * 4))
+EXTRACTION_TIMEOUT = float(os.getenv("GROOVIA_EXTRACTION_TIMEOUT", 30))
+
+
+class ExtractionPoolBusy(Exception):
+    pass
+
+
+# --------------------------------------
+# worker 프로세스에서 실행되는 함수들
+# --------------------------------------
+def _warmup_worker():
+    from spotify_app.services.apple_client import extract_features_from_signal, SAMPLE_RATE
+
+    # 1초짜리 noise로 한 번 돌려서 numba JIT 컴파일을 미리 끝냄
+    y = np.random.default_rng(0).normal(scale=0.1, size=SAMPLE_RATE).astype(np.float32)
+    extract_features_from_signal(y, SAMPLE_RATE)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _analyze_task(preview_url, extractor):
+    from spotify_app.services.apple_client import analyze_preview
+    return analyze_preview(preview_url, extractor)
+
+
+def _analyze_bytes_task(data, extractor):
+    from spotify_app.services.apple_client import analyze_preview_bytes
+    return analyze_preview_bytes(data, extractor)
+
+
+class ExtractionPool:
+    def __init__(self, workers=EXTRACTION_WORKERS, max_pending=EXTRACTION_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+
+        # fork 대신 spawn: Django 프로세스의 thread / lock 상태를 물려받지 않도록
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warmup_worker
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def warm(self):
+        """worker를 전부 미리 띄움 (initializer에서 librosa warm-up)"""
+        futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+        wait(futures)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise ExtractionPoolBusy(f"분석 대기열이 가득 찼습니다 (max_pending={self.max_pending})")
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def submit(self, preview_url, extractor=None):
+        return self._submit(_analyze_task, preview_url, extractor)
+
+    def submit_bytes(self, data, extractor=None):
+        """다운로드가 끝난 preview bytes를 제출 (비동기 view: 다운로드는 event loop에서)"""
+        return self._submit(_analyze_bytes_task, data, extractor)
+
+    def check_capacity(self, n):
+        if n > self.max_pending:
+            raise ExtractionPoolBusy(f"한 번에 분석할 수 있는 곡 수 초과 ({n} > {self.max_pending})")
+
+    def analyze_many(self, preview_urls, extractor=None, timeout=EXTRACTION_TIMEOUT):
+        """
+        여러 곡을 한 번에 제출하고 결과를 입력 순서대로 반환.
+        timeout 안에 끝나지 않았거나 실패한 곡은 None
+        """
+        self.check_capacity(len(preview_urls))
+
+        futures = []
+        try:
+            for url in preview_urls:
+                futures.append(self.submit(url, extractor))
+        except ExtractionPoolBusy:
+            for future in futures:
+                future.cancel()
+            raise
+
+        deadline = time.monotonic() + timeout
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(deadline - time.monotonic(), 0)))
+            except Exception as e:
+                print("preview 분석 실패:", repr(e))
+                future.cancel()
+                results.append(None)
+
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_extraction_pool():
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ExtractionPool()
+
+    return _pool
@@ -0,0 +1,77 @@
+# spotify_app/services/feature_cache.py
+import os
+import threading
+
+import numpy as np
+
+from .ttl_cache import TTLCache, MISSING
+from .sqlite_store import SQLiteStore
+
+# ======================================
+# 입력곡 audio feature 캐시
+#   1단계: 프로세스 내 LRU
+#   2단계: SQLite 파일 (재시작 / 다른 worker와 공유)
+# key = (feature extractor 버전, track_id)
+# ======================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FEATURE_CACHE_PATH = os.getenv(
+    "GROOVIA_FEATURE_CACHE_PATH",
+    os.path.abspath(os.path.join(BASE_DIR, "..", "data", "cache", "feature_cache.sqlite3"))
+)
+FEATURE_CACHE_MEMORY_SIZE = 4096
+
+
+class FeatureCache:
+    def __init__(self, path=FEATURE_CACHE_PATH, maxsize=FEATURE_CACHE_MEMORY_SIZE):
+        self.memory = TTLCache(maxsize=maxsize)
+        self.disk = SQLiteStore(path, table="audio_features")
+
+    @staticmethod
+    def make_key(track_id, version):
+        return f"{version}:{track_id}"
+
+    def get(self, track_id, version):
+        key = self.make_key(track_id, version)
+
+        vec = self.memory.get(key)
+        if vec is not MISSING:
+            return vec
+
+        try:
+            blob = self.disk.get(key)
+        except Exception as e:
+            print("feature cache 조회 실패:", e)
+            return None
+
+        if blob is None:
+            return None
+
+        vec = np.frombuffer(blob, dtype=np.float64)
+        self.memory.set(key, vec)
+        return vec
+
+    def set(self, track_id, version, vec):
+        key = self.make_key(track_id, version)
+        vec = np.array(vec, dtype=np.float64)
+        vec.flags.writeable = False  # 캐시 공유 배열은 읽기 전용
+
+        self.memory.set(key, vec)
+        try:
+            self.disk.set(key, vec.tobytes())
+        except Exception as e:
+            print("feature cache 저장 실패:", e)
+
+
+_feature_cache = None
+_feature_cache_lock = threading.Lock()
+
+
+def get_feature_cache():
+    global _feature_cache
+
+    if _feature_cache is None:
+        with _feature_cache_lock:
+            if _feature_cache is None:
+                _feature_cache = FeatureCache()
+
+    return _feature_cache
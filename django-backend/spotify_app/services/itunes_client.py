@@ -0,0 +1,223 @@
+# spotify_app/services/itunes_client.py
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ======================================
+# iTunes Search / Lookup 공용 HTTP client
+# - keep-alive session (connection pool) 1개를 프로세스 전체가 공유
+# - token bucket으로 초당 요청 수 제한 (iTunes API는 과도한 요청 시 403/429)
+# - 403 / 429 / 5xx / 연결 오류는 jitter를 준 지수 backoff로 재시도
+# - endpoint(search / lookup / preview)별 요청 수, 오류 수, latency 기록
+# ======================================
+ITUNES_SEARCH_URL = "https://itunes.apple.com/search"
+ITUNES_LOOKUP_URL = "https://itunes.apple.com/lookup"
+
+ITUNES_RATE = float(os.getenv("GROOVIA_ITUNES_RATE", 5))           # 초당 요청 수 (0 이하면 제한 없음)
+ITUNES_BURST = int(os.getenv("GROOVIA_ITUNES_BURST", 10))          # 순간 최대 요청 수
+ITUNES_MAX_RETRIES = int(os.getenv("GROOVIA_ITUNES_MAX_RETRIES", 3))
+ITUNES_TIMEOUT = float(os.getenv("GROOVIA_ITUNES_TIMEOUT", 10))
+ITUNES_POOL_SIZE = int(os.getenv("GROOVIA_ITUNES_POOL_SIZE", 20))
+
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+
+
+class ITunesError(Exception):
+    pass
+
+
+def backoff_delay(attempt, retry_after=None):
+    """attempt(0부터)번째 재시도 전 대기 시간. Retry-After 헤더가 있으면 우선"""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+
+    # full jitter: 여러 worker가 같은 순간에 다시 몰리지 않도록
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+class TokenBucket:
+    """
+    thread-safe token bucket
+    reserve()는 토큰을 미리 예약하고 기다려야 할 시간(초)을 반환
+    → 동기 코드는 time.sleep, 비동기 코드는 asyncio.sleep으로 같은 bucket 공유
+    max_wait: 기다려야 할 시간이 이보다 길면 예약하지 않음 (reserve → None, acquire → False)
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1, max_wait=None):
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            # 음수까지 허용 (= 뒤에 온 요청일수록 더 오래 기다림)
+            wait = max(0.0, (tokens - self._tokens) / self.rate)
+            if max_wait is not None and wait > max(max_wait, 0.0):
+                return None
+            self._tokens -= tokens
+            return wait
+
+    def acquire(self, tokens=1, max_wait=None):
+        wait = self.reserve(tokens, max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+class EndpointStats:
+    """endpoint별 요청 수 / 오류 수 / 재시도 수 / latency"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, endpoint, elapsed, error=False, retry=False):
+        with self._lock:
+            s = self._stats.setdefault(endpoint, {"count": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0})
+            ms = elapsed * 1000
+            s["count"] += 1
+            s["errors"] += int(error)
+            s["retries"] += int(retry)
+            s["total_ms"] += ms
+            s["max_ms"] = max(s["max_ms"], ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    "count": s["count"],
+                    "errors": s["errors"],
+                    "retries": s["retries"],
+                    "avg_ms": round(s["total_ms"] / s["count"], 1) if s["count"] else 0.0,
+                    "max_ms": round(s["max_ms"], 1),
+                }
+                for endpoint, s in self._stats.items()
+            }
+
+
+class ITunesClient:
+    def __init__(self, rate=ITUNES_RATE, burst=ITUNES_BURST, max_retries=ITUNES_MAX_RETRIES,
+                 timeout=ITUNES_TIMEOUT, pool_size=ITUNES_POOL_SIZE):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = TokenBucket(rate, burst)
+        self.stats = EndpointStats()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, endpoint, url, params=None, timeout=None, retries=None, rate_limited=True, stream=False,
+                deadline=None):
+        """
+        GET + 재시도. 성공(2xx) Response 반환, 최종 실패 시 ITunesError
+        retries: 이번 요청만 재시도 횟수 변경 (deadline이 짧은 호출은 0)
+        stream: body를 읽지 않은 Response 반환 (호출한 쪽에서 close)
+        deadline: time.monotonic() 기준 마감 시각. 그 안에 토큰을 못 받으면 요청 없이 바로 ITunesError
+                  (호출한 쪽이 이미 포기한 뒤에 요청이 나가거나 worker가 limiter에서 잠들지 않도록)
+        """
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.max_retries if retries is None else retries
+
+        for attempt in range(retries + 1):
+            attempt_timeout = timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if rate_limited and not self.limiter.acquire(max_wait=remaining):
+                    raise ITunesError(f"{endpoint} deadline 안에 rate limit 토큰 없음")
+                attempt_timeout = min(timeout, max(deadline - time.monotonic(), 0.01))
+            elif rate_limited:
+                self.limiter.acquire()
+
+            start = time.monotonic()
+            retry_after = None
+            try:
+                r = self.session.get(url, params=params, timeout=attempt_timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = ITunesError(f"{endpoint} 요청 실패: {e}")
+            else:
+                if r.ok:
+                    self.stats.record(endpoint, time.monotonic() - start, retry=attempt > 0)
+                    return r
+
+                error = ITunesError(f"{endpoint} HTTP {r.status_code}")
+                r.close()
+                if r.status_code not in RETRY_STATUSES:
+                    self.stats.record(endpoint, time.monotonic() - start, error=True, retry=attempt > 0)
+                    raise error
+                retry_after = r.headers.get("Retry-After")
+
+            self.stats.record(endpoint, time.monotonic() - start, error=True, retry=attempt > 0)
+            if attempt < retries:
+                delay = backoff_delay(attempt, retry_after)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    break
+                time.sleep(delay)
+
+        raise error
+
+    def get_json(self, endpoint, url, params=None, timeout=None, retries=None, deadline=None):
+        r = self.request(endpoint, url, params=params, timeout=timeout, retries=retries, deadline=deadline)
+        try:
+            return r.json()
+        except ValueError:
+            raise ITunesError(f"{endpoint} 응답 JSON 파싱 실패")
+
+    # --------------------------------------
+    # API
+    # --------------------------------------
+    def search(self, term, limit=1, media="music", entity=None, country=None, timeout=None, retries=None):
+        params = {"term": term, "limit": limit, "media": media}
+        if entity:
+            params["entity"] = entity
+        if country:
+            params["country"] = country
+
+        return self.get_json("search", ITUNES_SEARCH_URL, params, timeout, retries).get("results", [])
+
+    def lookup(self, track_ids, entity=None, timeout=None, retries=None, deadline=None):
+        params = {"id": ",".join(str(tid) for tid in track_ids)}
+        if entity:
+            params["entity"] = entity
+
+        return self.get_json("lookup", ITUNES_LOOKUP_URL, params, timeout, retries, deadline).get("results", [])
+
+    def stream(self, url, timeout=None, retries=None):
+        """preview 음원(CDN이라 rate limit 대상 X)을 body 읽기 전 Response로 (디코더에 chunk 단위로 전달, with 문으로 close)"""
+        return self.request("preview", url, timeout=timeout, retries=retries, rate_limited=False, stream=True)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_itunes_client():
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ITunesClient()
+
+    return _client
@@ -0,0 +1,199 @@
+# spotify_app/services/job_queue.py
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+# ======================================
+# 추천 백그라운드 작업 (외부 broker 없이)
+# - 작업 상태 / 결과는 SQLite 파일에 저장 → 어느 worker 프로세스로 GET이 와도 조회 가능
+# - 실제 처리는 작업을 받은 프로세스의 worker thread가 담당
+# - 대기열 길이 제한 (초과 시 JobQueueFull → 503)
+# - 대기열이 프로세스 메모리에 있으므로 worker가 재시작 / 종료되면 그 작업은 DB에 queued / running으로 남음
+#   → JOB_STALE_TIMEOUT 동안 상태가 바뀌지 않은 작업은 주기적으로 failed 처리 (클라이언트 polling 종료)
+# ======================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOB_DB_PATH = os.getenv(
+    "GROOVIA_JOB_DB_PATH",
+    os.path.abspath(os.path.join(BASE_DIR, "..", "data", "cache", "jobs.sqlite3"))
+)
+JOB_WORKERS = int(os.getenv("GROOVIA_JOB_WORKERS", 2))
+JOB_MAX_QUEUE = int(os.getenv("GROOVIA_JOB_MAX_QUEUE", 32))
+JOB_RESULT_TTL = int(os.getenv("GROOVIA_JOB_RESULT_TTL", 3600))   # 끝난 작업 보관 시간 (초)
+JOB_STALE_TIMEOUT = int(os.getenv("GROOVIA_JOB_STALE_TIMEOUT", 900))   # queued / running 최대 유지 시간 (초)
+JOB_SWEEP_INTERVAL = 60          # 정리(sweep) 최소 간격 (초)
+STALE_ERROR = "작업을 처리하던 worker가 종료되어 중단되었습니다. 다시 요청해 주세요."
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobStore:
+    """jobs 테이블 (id, status, payload, result, error, 시각)"""
+
+    def __init__(self, path=JOB_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT, payload TEXT, result TEXT, error TEXT, "
+                "created_at REAL, updated_at REAL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        """변경된 row 수 반환"""
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(sql, params)
+            conn.commit()
+            return cursor.rowcount
+
+    def create(self, payload):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(payload, ensure_ascii=False), now, now)
+        )
+        return job_id
+
+    def update(self, job_id, status, result=None, error=None):
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, None if result is None else json.dumps(result, ensure_ascii=False), error, time.time(), job_id)
+        )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT id, status, result, error, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        job_id, status, result, error, created_at, updated_at = row
+        return {
+            "job_id": job_id,
+            "status": status,
+            "result": None if result is None else json.loads(result),
+            "error": error,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def delete_finished(self, older_than):
+        return self._execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at <= ?",
+            (DONE, FAILED, time.time() - older_than)
+        )
+
+    def fail_stale(self, older_than, error=STALE_ERROR):
+        """older_than초 동안 상태가 안 바뀐 queued / running 작업 → failed (처리할 worker가 없어진 작업)"""
+        now = time.time()
+        return self._execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?) AND updated_at <= ?",
+            (FAILED, error, now, QUEUED, RUNNING, now - older_than)
+        )
+
+
+class JobQueue:
+    """
+    handler(payload) → result dict 를 worker thread에서 실행
+    handler가 예외를 던지면 작업은 failed (error = 예외 메시지)
+    """
+
+    def __init__(self, handler, store=None, workers=JOB_WORKERS, max_queue=JOB_MAX_QUEUE,
+                 stale_timeout=JOB_STALE_TIMEOUT):
+        self.handler = handler
+        self.store = store or JobStore()
+        self.workers = workers
+        self.stale_timeout = stale_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._swept = None
+
+    def _start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            # 시작 시 1회: 이전 프로세스가 남긴 작업 정리
+            self.sweep(force=True)
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"recommend-job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, payload):
+        self._start()
+
+        # 대기열이 찼으면 DB에 기록하기 전에 거절
+        if self._queue.full():
+            raise JobQueueFull(f"작업 대기열이 가득 찼습니다 (max_queue={self._queue.maxsize})")
+
+        job_id = self.store.create(payload)
+        try:
+            self._queue.put_nowait((job_id, payload))
+        except queue.Full:
+            self.store.update(job_id, FAILED, error="queue full")
+            raise JobQueueFull(f"작업 대기열이 가득 찼습니다 (max_queue={self._queue.maxsize})")
+
+        return job_id
+
+    def get(self, job_id):
+        # 작업을 받은 적 없는 프로세스에서도 polling 중에 정리되도록
+        self.sweep()
+        return self.store.get(job_id)
+
+    def sweep(self, force=False):
+        """멈춘 작업 failed 처리 + 오래된 끝난 작업 삭제 (JOB_SWEEP_INTERVAL마다 최대 1회)"""
+        now = time.monotonic()
+        if not force and self._swept is not None and now - self._swept < JOB_SWEEP_INTERVAL:
+            return
+        self._swept = now
+
+        try:
+            stale = self.store.fail_stale(self.stale_timeout)
+            if stale:
+                print(f"[Job] 멈춘 작업 {stale}개 failed 처리")
+            self.store.delete_finished(JOB_RESULT_TTL)
+        except Exception as e:
+            print("job 정리 실패:", e)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _worker(self):
+        while True:
+            job_id, payload = self._queue.get()
+            try:
+                self.store.update(job_id, RUNNING)
+                result = self.handler(payload)
+                self.store.update(job_id, DONE, result=result)
+            except Exception as e:
+                print(f"[Job {job_id}] 실패:", repr(e))
+                self.store.update(job_id, FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
+
+            self.sweep()
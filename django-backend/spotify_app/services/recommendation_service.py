@@ -1,37 +1,173 @@
 # spotify_app/services/recommendation_service.py
+import asyncio
 import os
-import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
-from .apple_client import fetch_apple_track_metadata, download_preview, extract_features_from_audio, build_metadata_vector, combine_feature_vectors
-from spotify_app.engines.HNSW_Engine import HNSWRecommender
-from csv_tools.csv_manager import save_features_to_csv
+from .apple_client import get_track_id_by_name, parse_artist_title_list, fetch_apple_tracks_metadata, build_metadata_vector, combine_feature_vectors, FEATURE_EXTRACTOR_VERSION
+from .apple_async_client import (
+    get_track_id_by_name_async,
+    fetch_apple_tracks_metadata_async,
+    fetch_preview_bytes,
+    enrich_apple_metadata_async,
+)
+from .feature_cache import get_feature_cache
+from .term_cache import get_term_cache
+from .ttl_cache import MISSING
+from .result_cache import get_result_cache
+from .job_queue import JobQueue
+from .extraction_pool import get_extraction_pool, ExtractionPoolBusy, EXTRACTION_TIMEOUT
+from spotify_app.engines.HNSW_Engine import get_recommender, ENRICH_DEADLINE
+from csv_tools.csv_manager import save_features_to_csv, save_song_to_csv
 
+BATCH_MAX_PLAYLISTS = int(os.getenv("GROOVIA_BATCH_MAX_PLAYLISTS", 500))   # batch 요청 1번에 받는 플레이리스트 수
+BATCH_MAX_TOP_K = 50
+# batch 요청 1번에 새로 검색하는 term 수 (iTunes 5 req/s → 요청 시간이 gunicorn timeout을 넘지 않도록)
+# 초과분은 검색하지 않고 해당 플레이리스트만 error (검색된 term은 캐시 → 같은 요청을 다시 보내면 이어서 진행)
+BATCH_MAX_SEARCH_TERMS = int(os.getenv("GROOVIA_BATCH_MAX_SEARCH_TERMS", 50))
+BATCH_SEARCH_WORKERS = 8
 
-def run_recommendation(track_ids):
 
-    final_vectors = []
-    metadatas = []
+def resolve_track_ids(terms):
+    """검색 term list → trackId list (실패/없는 곡 제외, 입력 순서 유지)"""
+    return [tid for tid in search_track_ids(terms) if tid]
 
-    for tid in track_ids:
-        
-        # 1) 기본 메타데이터 추출
-        meta = fetch_apple_track_metadata(tid)
-        if not meta or "preview_url" not in meta:
-            print("fail to get meta or preview_url")
-            continue
 
-        # 메타데이터 저장
-        metadatas.append(meta)
+def search_track_ids(terms):
+    """검색 term list → 같은 길이의 trackId list (실패/없는 곡은 None)"""
+    return [search_track_id(term) for term in terms]
+
+
+def search_track_id(term):
+    print(f"  > 검색 term = '{term}'")
+
+    try:
+        tid = get_track_id_by_name(term)
+        print("검색 결과 tid =", tid)
+    except Exception as e:
+        print("get_track_id_by_name 실패:", e)
+        tid = None
+
+    return tid
+
+
+def search_track_ids_bounded(terms, limit=BATCH_MAX_SEARCH_TERMS):
+    """
+    중복 없는 검색 term list → ({term: trackId 또는 None}, 검색하지 않은 term set)
+    캐시된 term은 바로 사용, 나머지는 앞에서부터 limit개만 동시에 검색 (rate limiter는 client 공유)
+    """
+    term_cache = get_term_cache()
+
+    resolved, uncached = {}, []
+    for term in terms:
+        cached = term_cache.get(term)
+        if cached is MISSING:
+            uncached.append(term)
+        else:
+            resolved[term] = cached
+
+    searching = uncached[:limit]
+    if searching:
+        with ThreadPoolExecutor(max_workers=min(len(searching), BATCH_SEARCH_WORKERS)) as executor:
+            resolved.update(zip(searching, executor.map(search_track_id, searching)))
+
+    return resolved, set(uncached[limit:])
+
+
+def parse_track_id_list(values):
+    """요청으로 받은 track_ids → 양의 정수 list (형식이 틀리면 ValueError)"""
+    if not isinstance(values, list):
+        raise ValueError("track_ids는 list여야 합니다.")
+
+    track_ids = []
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(f"잘못된 trackId: {value!r}")
+        tid = int(value)
+        if tid <= 0:
+            raise ValueError(f"잘못된 trackId: {value!r}")
+        track_ids.append(tid)
+
+    return track_ids
+
+
+def save_recommended_songs(results):
+    """추천 결과를 songs.csv에 저장"""
+    for song in results:
+        try:
+            save_song_to_csv({
+                "title": song.get("title", ""),
+                "artist": song.get("artist", ""),
+                "genre": "Recommended",
+                "bpm": 0,
+                "mood": "Recommended"
+            })
+        except Exception as e:
+            print("songs.csv 저장 실패:", e)
+
+
+def analyze_input_tracks(track_ids):
+    """
+    입력곡들의 (결합 벡터 list, metadata list) 반환
+    캐시에 없는 곡들은 extraction pool에 한 번에 제출 → 가장 느린 곡 시간만큼만 걸림
+    """
+    return analyze_input_track_sets([track_ids])[0]
+
+
+def analyze_input_track_sets(track_id_sets):
+    """
+    여러 입력 세트(플레이리스트)를 한 번에 분석 → 세트별 (결합 벡터 list, metadata list)
+    세트끼리 겹치는 곡은 Lookup / 분석 1번만
+    """
+    feature_cache = get_feature_cache()
+
+    # 1) 기본 메타데이터 추출 (전체 곡을 batch Lookup으로)
+    fetched = fetch_apple_tracks_metadata([tid for track_ids in track_id_sets for tid in track_ids])
+
+    track_sets = []
+    for track_ids in track_id_sets:
+        tracks = []
+        for tid in track_ids:
+            meta = fetched.get(int(tid))
+            if not meta or "preview_url" not in meta:
+                print("fail to get meta or preview_url")
+                continue
+            tracks.append((tid, meta))
+        track_sets.append(tracks)
+
+    # 2~3) 이미 분석한 곡이면 캐시된 vector 사용
+    unique = {}
+    for tracks in track_sets:
+        for tid, meta in tracks:
+            unique.setdefault(tid, meta)
+    audio_vecs = {tid: feature_cache.get(tid, FEATURE_EXTRACTOR_VERSION) for tid in unique}
 
-        # 2) 30초 preview 다운로드
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".m4a") as tmp:
-            audio_m4a = download_preview(meta["preview_url"], tmp.name)
+    # 2~3) 나머지는 30초 preview 디코딩 + vector 추출 (warm worker pool에서 병렬, 대기열 크기 단위)
+    pending = [(tid, meta) for tid, meta in unique.items() if audio_vecs[tid] is None]
+    if pending:
+        pool = get_extraction_pool()
+        for start in range(0, len(pending), pool.max_pending):
+            chunk = pending[start:start + pool.max_pending]
+            analyzed = pool.analyze_many([meta["preview_url"] for _, meta in chunk])
 
-        # 3) 30초 preview의 vector 추출
-        audio_vec = extract_features_from_audio(audio_m4a)
-        os.remove(audio_m4a)
+            for (tid, _), audio_vec in zip(chunk, analyzed):
+                if audio_vec is not None:
+                    feature_cache.set(tid, FEATURE_EXTRACTOR_VERSION, audio_vec)
+                audio_vecs[tid] = audio_vec
 
+    return [
+        (combine_input_vectors(tracks, audio_vecs), [meta for _, meta in tracks])
+        for tracks in track_sets
+    ]
+
+
+def combine_input_vectors(tracks, audio_vecs):
+    """(track_id, meta) list + track_id → audio vector → 결합 벡터 list (동기 / 비동기 공용)"""
+    final_vectors = []
+    for tid, meta in tracks:
+        audio_vec = audio_vecs[tid]
         if audio_vec is None: # 오디오 분석 실패한 트랙은 스킵
             print("fail to analyze")
             continue
@@ -44,7 +180,7 @@ def run_recommendation(track_ids):
             final_vec = combine_feature_vectors(audio_vec, meta_vec)
         except Exception:
             continue
-        
+
         # (features.csv에 저장)
         save_features_to_csv(
             title=meta["title"],
@@ -54,17 +190,330 @@ def run_recommendation(track_ids):
 
         final_vectors.append(final_vec)
 
+    return final_vectors
+
+
+def result_cache_key(recommender, track_ids, top_k):
+    return get_result_cache().make_key(
+        track_ids,
+        top_k,
+        recommender.distance_weights,
+        recommender.index_version,
+        FEATURE_EXTRACTOR_VERSION
+    )
+
+
+def store_result(cache_key, track_ids, final_vectors, results, mood_keywords, enrich_failed=False):
+    """
+    입력곡이 전부 분석되고 결과 링크 보완도 실패 / 시간 초과 없이 끝난 경우만 캐시
+    (일시적인 다운로드 / Lookup 실패가 섞인 결과를 TTL 동안 재사용하지 않도록.
+     링크가 원래 없는 곡은 실패가 아니므로 캐시함)
+    """
+    if len(final_vectors) < len(track_ids):
+        return
+    if enrich_failed:
+        return
+
+    get_result_cache().set(cache_key, {"results": results, "mood_keywords": mood_keywords})
+
+
+def run_recommendation(track_ids, top_k=10):
+
+    # 0) 같은 입력 + 같은 인덱스 버전이면 캐시된 결과 반환
+    recommender = get_recommender()
+    cache_key = result_cache_key(recommender, track_ids, top_k)
+    cached = get_result_cache().get(cache_key)
+    if cached is not None:
+        return cached["results"], cached["mood_keywords"]
+
+    final_vectors, metadatas = analyze_input_tracks(track_ids)
+
     # 6) 유효한 track 없는 경우
     if len(final_vectors) == 0:
         raise ValueError("유효한 track 분석 실패: 모든 preview audio 벡터 추출 실패.")
 
-    # 7) HNSW recommender 사용
-    recommender = HNSWRecommender(dim=len(final_vectors[0]))
-    results, mood_keywords = recommender.recommend(
+    # 7) HNSW recommender 사용 (프로세스 공유 인스턴스)
+    #    recommender.recommend와 같은 순서, 링크 보완 실패 여부를 캐시 판단에 쓰기 위해 단계별로 호출
+    rows, mood_keywords = recommender.rank(
         input_vectors=final_vectors,          # 여러 곡의 결합 벡터 리스트
         input_metadata_list=metadatas,       # 각 곡의 metadata 리스트
-        top_k=10
+        top_k=top_k
     )
+    rows = recommender.enrich_apple_metadata_batch(rows)
+    results = recommender.format_results(rows)
 
+    store_result(cache_key, track_ids, final_vectors, results, mood_keywords,
+                 enrich_failed=recommender.enrichment_failed(rows))
     return results, mood_keywords
 
+
+# ======================================
+# batch 경로: 여러 플레이리스트를 요청 1번으로
+# - 입력곡 Lookup / 분석은 전체에서 중복 없이 1번씩
+# - 추천은 recommend_batch (knn_query 1회 + 2D 점수 계산)
+# ======================================
+def run_recommendation_batch(track_id_sets, top_k=10):
+    """
+    track_id list의 list → 세트별 (results, mood_keywords), 유효한 입력곡이 없는 세트는 None
+    """
+    recommender = get_recommender()
+    result_cache = get_result_cache()
+
+    outputs = [None] * len(track_id_sets)
+    cache_keys = [result_cache_key(recommender, track_ids, top_k) for track_ids in track_id_sets]
+
+    # 0) 캐시된 세트는 바로
+    misses = []
+    for i, cache_key in enumerate(cache_keys):
+        cached = result_cache.get(cache_key)
+        if cached is None:
+            misses.append(i)
+        else:
+            outputs[i] = (cached["results"], cached["mood_keywords"])
+
+    if not misses:
+        return outputs
+
+    analyzed = analyze_input_track_sets([track_id_sets[i] for i in misses])
+
+    # 6) 유효한 track 없는 세트는 제외
+    valid = [(i, vectors, metadatas) for i, (vectors, metadatas) in zip(misses, analyzed) if vectors]
+
+    # 7) 한 번에 추천 (recommender.recommend_batch와 같은 순서, 세트별 링크 보완 실패 여부가 필요해서 단계별로)
+    ranked = recommender.rank_batch(
+        [(vectors, metadatas) for _, vectors, metadatas in valid],
+        top_k=top_k
+    )
+    recommender.enrich_apple_metadata_many([row for rows, _ in ranked for row in rows])
+
+    for (i, vectors, _), (rows, mood_keywords) in zip(valid, ranked):
+        results = recommender.format_results(rows)
+        store_result(cache_keys[i], track_id_sets[i], vectors, results, mood_keywords,
+                     enrich_failed=recommender.enrichment_failed(rows))
+        outputs[i] = (results, mood_keywords)
+
+    return outputs
+
+
+def recommend_playlists(playlists, top_k=10):
+    """
+    [{"id": ..., "urls": [...]} 또는 {"id": ..., "track_ids": [...]}, ...] → 플레이리스트별 응답 dict list
+    urls는 AppleUrlProcessView와 같은 "아티스트, 제목" 형식. 실패한 플레이리스트는 error만
+    (형식 오류 / 검색 실패 / 검색 한도 초과 / 분석 실패 모두 플레이리스트 단위)
+    """
+    responses = []
+    playlist_terms = []
+
+    for playlist in playlists:
+        if not isinstance(playlist, dict):
+            playlist = {"id": None, "invalid": True}
+
+        response = {"id": playlist.get("id"), "input_ids": []}
+        terms = None
+
+        if playlist.get("invalid"):
+            response["error"] = "playlist 항목은 {\"urls\": [...]} 또는 {\"track_ids\": [...]} 형식이어야 합니다."
+        elif "track_ids" in playlist:
+            try:
+                response["input_ids"] = parse_track_id_list(playlist["track_ids"])
+            except (TypeError, ValueError) as e:
+                response["error"] = f"track_ids 형식 오류: {str(e)}"
+            else:
+                if not response["input_ids"]:
+                    response["error"] = "track_ids가 비어있습니다."
+        else:
+            urls = playlist.get("urls", [])
+            try:
+                if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+                    raise ValueError("urls는 문자열 list여야 합니다.")
+                terms = [f"{artist} {title}" for artist, title in parse_artist_title_list(urls)]
+            except Exception as e:
+                response["error"] = f"artist-title parsing 오류: {str(e)}"
+
+        responses.append(response)
+        playlist_terms.append(terms)
+
+    # 검색 term은 전체에서 중복 없이 1번씩, 새로 검색하는 건 BATCH_MAX_SEARCH_TERMS개까지
+    unique_terms = list(dict.fromkeys(term for terms in playlist_terms if terms for term in terms))
+    resolved, deferred = search_track_ids_bounded(unique_terms)
+
+    for response, terms in zip(responses, playlist_terms):
+        if terms is None or "error" in response:
+            pass
+        elif any(term in deferred for term in terms):
+            response["error"] = (
+                f"검색할 곡이 너무 많습니다 (요청당 {BATCH_MAX_SEARCH_TERMS}개). "
+                "잠시 후 같은 요청을 다시 보내거나 track_ids로 요청해주세요."
+            )
+            continue
+        else:
+            response["input_ids"] = [resolved[term] for term in terms if resolved[term]]
+
+        if "error" not in response and not response["input_ids"]:
+            response["error"] = "trackId 검색 실패"
+
+    pending = [response for response in responses if "error" not in response]
+    outputs = run_recommendation_batch([response["input_ids"] for response in pending], top_k=top_k)
+
+    for response, output in zip(pending, outputs):
+        if output is None:
+            response["error"] = "유효한 track 분석 실패: 모든 preview audio 벡터 추출 실패."
+            continue
+
+        results, mood_keywords = output
+        save_recommended_songs(results)
+        response["mood_keywords"] = mood_keywords
+        response["recommended"] = results
+
+    return responses
+
+
+# ======================================
+# 백그라운드 작업 경로: POST는 job_id만 바로 반환, 처리는 worker thread
+# ======================================
+def recommend_from_urls(payload):
+    """
+    {"urls": [...]} → AppleUrlProcessView와 같은 응답 dict
+    입력 문제는 ValueError (작업 failed의 error 메시지가 됨)
+    """
+    parsed_track_info = parse_artist_title_list(payload.get("urls", []))
+
+    track_ids = resolve_track_ids([f"{artist} {title}" for artist, title in parsed_track_info])
+    if not track_ids:
+        raise ValueError("기본 테스트 곡들의 trackId 검색 실패")
+
+    results, mood_keywords = run_recommendation(track_ids)
+    save_recommended_songs(results)
+
+    return {
+        "message": "Apple 테스트 추천 실행 완료",
+        "input_ids": track_ids,
+        "mood_keywords": mood_keywords,
+        "recommended": results
+    }
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_recommend_job_queue():
+    global _job_queue
+
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue(recommend_from_urls)
+
+    return _job_queue
+
+
+# ======================================
+# 비동기(ASGI) 경로
+# - 네트워크 I/O (검색, Lookup, preview 다운로드, 결과 보완)는 전부 동시에 await
+# - CPU 작업 (디코딩 + feature 추출, HNSW 검색/rerank)은 executor로 넘김
+# ======================================
+async def resolve_track_ids_async(terms):
+    """검색 term list → trackId list (동시 검색, 실패/없는 곡 제외, 입력 순서 유지)"""
+    results = await asyncio.gather(
+        *(get_track_id_by_name_async(term) for term in terms),
+        return_exceptions=True
+    )
+
+    track_ids = []
+    for term, tid in zip(terms, results):
+        if isinstance(tid, Exception):
+            print("get_track_id_by_name 실패:", term, repr(tid))
+            continue
+        if tid:
+            track_ids.append(tid)
+
+    return track_ids
+
+
+async def _analyze_preview_async(pool, preview_url):
+    data = await fetch_preview_bytes(preview_url)
+    if data is None:
+        return None
+
+    return await asyncio.wrap_future(pool.submit_bytes(data))
+
+
+async def analyze_input_tracks_async(track_ids):
+    feature_cache = get_feature_cache()
+
+    # 1) 기본 메타데이터 (Lookup 1회)
+    fetched = await fetch_apple_tracks_metadata_async(track_ids)
+
+    metadatas = []
+    tracks = []
+    for tid in track_ids:
+        meta = fetched.get(int(tid))
+        if not meta or "preview_url" not in meta:
+            print("fail to get meta or preview_url")
+            continue
+
+        metadatas.append(meta)
+        tracks.append((tid, meta))
+
+    # 2~3) 캐시 조회 (SQLite → thread)
+    audio_vecs = await asyncio.to_thread(
+        lambda: {tid: feature_cache.get(tid, FEATURE_EXTRACTOR_VERSION) for tid, _ in tracks}
+    )
+
+    # 2~3) 나머지는 다운로드(event loop) → 디코딩 + 추출(process pool)을 곡마다 이어서 진행
+    pending = [(tid, meta) for tid, meta in tracks if audio_vecs[tid] is None]
+    if pending:
+        pool = get_extraction_pool()
+        pool.check_capacity(len(pending))
+
+        tasks = [asyncio.ensure_future(_analyze_preview_async(pool, meta["preview_url"])) for _, meta in pending]
+        done, not_done = await asyncio.wait(tasks, timeout=EXTRACTION_TIMEOUT)
+
+        for task in not_done:
+            task.cancel()
+
+        for (tid, _), task in zip(pending, tasks):
+            audio_vec = None
+            if task in done:
+                if isinstance(task.exception(), ExtractionPoolBusy):
+                    raise task.exception()
+                if task.exception() is None:
+                    audio_vec = task.result()
+                else:
+                    print("preview 분석 실패:", repr(task.exception()))
+
+            if audio_vec is not None:
+                await asyncio.to_thread(feature_cache.set, tid, FEATURE_EXTRACTOR_VERSION, audio_vec)
+            audio_vecs[tid] = audio_vec
+
+    final_vectors = await asyncio.to_thread(combine_input_vectors, tracks, audio_vecs)
+    return final_vectors, metadatas
+
+
+async def run_recommendation_async(track_ids, top_k=10):
+
+    # 첫 호출의 인덱스 로드 / 캐시 조회(SQLite일 수 있음)는 thread에서
+    def lookup_cache():
+        recommender = get_recommender()
+        cache_key = result_cache_key(recommender, track_ids, top_k)
+        return recommender, cache_key, get_result_cache().get(cache_key)
+
+    recommender, cache_key, cached = await asyncio.to_thread(lookup_cache)
+    if cached is not None:
+        return cached["results"], cached["mood_keywords"]
+
+    final_vectors, metadatas = await analyze_input_tracks_async(track_ids)
+
+    if len(final_vectors) == 0:
+        raise ValueError("유효한 track 분석 실패: 모든 preview audio 벡터 추출 실패.")
+
+    # HNSW 검색 / rerank는 CPU 작업 → thread
+    rows, mood_keywords = await asyncio.to_thread(recommender.rank, final_vectors, metadatas, top_k)
+
+    rows = await enrich_apple_metadata_async(recommender, rows, ENRICH_DEADLINE)
+    results = recommender.format_results(rows)
+
+    await asyncio.to_thread(store_result, cache_key, track_ids, final_vectors, results, mood_keywords,
+                            recommender.enrichment_failed(rows))
+    return results, mood_keywords
@@ -0,0 +1,144 @@
+# spotify_app/services/result_cache.py
+import hashlib
+import json
+import os
+import threading
+
+from django.conf import settings
+
+from .ttl_cache import TTLCache, MISSING
+from .sqlite_store import SQLiteStore
+
+# ======================================
+# 추천 결과 캐시
+# key = (입력 track_id 집합, 기준곡, top_k, rerank 가중치, 인덱스 버전, feature 추출기 버전)
+#   → 인덱스를 다시 빌드하면 버전(manifest hash)이 바뀌어 예전 결과는 자동으로 안 쓰임
+#
+# backend는 settings.RECOMMEND_RESULT_CACHE["BACKEND"]로 선택
+#   "memory" : 프로세스 내 LRU + TTL
+#   "file"   : SQLite 파일 (재시작 / 다른 worker와 공유)
+#   "django" : Django cache framework (settings.CACHES의 ALIAS)
+#   "none"   : 캐시 사용 X
+# ======================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_RESULT_CACHE = {
+    "BACKEND": "memory",
+    "TTL": 3600,
+    "MAXSIZE": 2048,
+    "PATH": os.path.abspath(os.path.join(BASE_DIR, "..", "data", "cache", "result_cache.sqlite3")),
+    "ALIAS": "default",
+}
+
+
+class MemoryBackend:
+    def __init__(self, maxsize, ttl):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        value = self.cache.get(key)
+        return None if value is MISSING else value
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, value, ttl=ttl)
+
+
+class FileBackend:
+    def __init__(self, path):
+        self.store = SQLiteStore(path, table="recommend_results")
+
+    def get(self, key):
+        blob = self.store.get(key)
+        return None if blob is None else blob.decode("utf-8")
+
+    def set(self, key, value, ttl):
+        self.store.set(key, value.encode("utf-8"), ttl=ttl)
+
+
+class DjangoCacheBackend:
+    def __init__(self, alias):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, value, timeout=ttl)
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+
+class ResultCache:
+    """값은 JSON 문자열로 저장 (backend 공통, 꺼낼 때마다 새 객체 → 호출부에서 수정해도 안전)"""
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def make_key(track_ids, top_k, weights, index_version, feature_version):
+        ids = [int(tid) for tid in track_ids]
+        payload = json.dumps({
+            "ids": sorted(set(ids)),
+            "query": ids[0] if ids else None,   # 첫 곡 metadata로 필터링 → 순서 중 첫 곡은 구분
+            "top_k": top_k,
+            "weights": weights,
+            "index": index_version,
+            "features": feature_version,
+        }, sort_keys=True)
+        return "groovia:recommend:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print("result cache 조회 실패:", e)
+            return None
+
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, json.dumps(value, ensure_ascii=False), self.ttl)
+        except Exception as e:
+            print("result cache 저장 실패:", e)
+
+
+def create_result_cache(config=None):
+    config = {**DEFAULT_RESULT_CACHE, **(config or getattr(settings, "RECOMMEND_RESULT_CACHE", {}))}
+    backend_name = config["BACKEND"]
+
+    if backend_name == "memory":
+        backend = MemoryBackend(config["MAXSIZE"], config["TTL"])
+    elif backend_name == "file":
+        backend = FileBackend(config["PATH"])
+    elif backend_name == "django":
+        backend = DjangoCacheBackend(config["ALIAS"])
+    elif backend_name == "none":
+        backend = NullBackend()
+    else:
+        raise ValueError(f"unknown result cache backend: {backend_name}")
+
+    return ResultCache(backend, config["TTL"])
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _result_cache
+
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = create_result_cache()
+
+    return _result_cache
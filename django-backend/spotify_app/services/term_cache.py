@@ -0,0 +1,98 @@
+# spotify_app/services/term_cache.py
+import os
+import re
+import threading
+import unicodedata
+
+from .ttl_cache import TTLCache, MISSING
+from .sqlite_store import SQLiteStore
+
+# ======================================
+# 검색 term("아티스트 제목") → trackId 캐시
+#   1단계: 프로세스 내 LRU + TTL
+#   2단계: SQLite 파일 (선택, 재시작 / 다른 worker와 공유)
+# key = (국가, 정규화한 term)
+# 검색 결과가 없던 term도 짧은 TTL로 저장 (같은 term으로 search API 반복 호출 방지)
+# ======================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 빈 문자열이면 디스크 저장 X (메모리만)
+TERM_CACHE_PATH = os.getenv(
+    "GROOVIA_TERM_CACHE_PATH",
+    os.path.abspath(os.path.join(BASE_DIR, "..", "data", "cache", "term_cache.sqlite3"))
+)
+TERM_CACHE_MEMORY_SIZE = 10000
+TERM_CACHE_TTL = int(os.getenv("GROOVIA_TERM_CACHE_TTL", 7 * 24 * 3600))
+TERM_CACHE_NEGATIVE_TTL = int(os.getenv("GROOVIA_TERM_CACHE_NEGATIVE_TTL", 600))
+
+DEFAULT_COUNTRY = "US"   # iTunes Search API 기본 storefront
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_term(term):
+    """전각/반각, 대소문자, 공백 차이를 없앤 검색 term"""
+    term = unicodedata.normalize("NFKC", term or "")
+    return _SPACES.sub(" ", term).strip().casefold()
+
+
+class TermCache:
+    def __init__(self, path=TERM_CACHE_PATH, maxsize=TERM_CACHE_MEMORY_SIZE,
+                 ttl=TERM_CACHE_TTL, negative_ttl=TERM_CACHE_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk = SQLiteStore(path, table="term_track_ids") if path else None
+
+    @staticmethod
+    def make_key(term, country=None):
+        return f"{(country or DEFAULT_COUNTRY).upper()}:{normalize_term(term)}"
+
+    def get(self, term, country=None):
+        """캐시된 trackId (검색 결과 없음이면 None), 캐시에 없으면 MISSING"""
+        key = self.make_key(term, country)
+
+        track_id = self.memory.get(key)
+        if track_id is not MISSING or self.disk is None:
+            return track_id
+
+        try:
+            blob = self.disk.get(key)
+        except Exception as e:
+            print("term cache 조회 실패:", e)
+            return MISSING
+
+        if blob is None:
+            return MISSING
+
+        track_id = int(blob) if blob else None
+        self.memory.set(key, track_id, ttl=self.ttl if track_id else self.negative_ttl)
+        return track_id
+
+    def set(self, term, track_id, country=None):
+        key = self.make_key(term, country)
+        ttl = self.ttl if track_id else self.negative_ttl
+
+        self.memory.set(key, track_id, ttl=ttl)
+        if self.disk is None:
+            return
+
+        try:
+            self.disk.set(key, str(track_id).encode() if track_id else b"", ttl=ttl)
+        except Exception as e:
+            print("term cache 저장 실패:", e)
+
+
+_term_cache = None
+_term_cache_lock = threading.Lock()
+
+
+def get_term_cache():
+    global _term_cache
+
+    if _term_cache is None:
+        with _term_cache_lock:
+            if _term_cache is None:
+                _term_cache = TermCache()
+
+    return _term_cache
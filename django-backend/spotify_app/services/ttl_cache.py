@@ -0,0 +1,59 @@
+# spotify_app/services/ttl_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+# 캐시에 없는 경우 (None도 값으로 저장할 수 있도록 별도 sentinel)
+MISSING = object()
+
+
+class TTLCache:
+    """
+    thread-safe LRU + TTL 캐시
+    - maxsize 초과 시 가장 오래 안 쓴 항목부터 제거
+    - ttl(초)이 지난 항목은 조회 시 제거 (ttl=None 이면 만료 없음)
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=MISSING):
+        ttl = self.ttl if ttl is MISSING else ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
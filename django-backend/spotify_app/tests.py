@@ -1,3 +1,476 @@
-from django.test import TestCase
+import os
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from spotify_app.engines.catalog_store import CatalogStore, write_catalog, normalize_dedup_key, STRING_COLUMNS
+from spotify_app.engines.feature_space import to_unit_range
+from spotify_app.engines import HNSW_Engine
+from spotify_app.engines.HNSW_Engine import HNSWRecommender, VECTORS_FILE, STATS_FILE, CATALOG_DIRNAME
+from spotify_app.preprocess.catalog_dedup import find_duplicates, NEAR_DUP_DISTANCE, IDENTICAL_DISTANCE
+from spotify_app.preprocess.synthetic_catalog import generate_synthetic_catalog
+from spotify_app.services.apple_client import (
+    extract_features_librosa,
+    extract_features_single_stft,
+    SAMPLE_RATE,
+    SINGLE_STFT_RTOL,
+    SINGLE_STFT_ATOL,
+)
+from spotify_app.services import recommendation_service
+from spotify_app.services.itunes_client import ITunesError
+from spotify_app.services.job_queue import JobQueue, JobStore, QUEUED, RUNNING, FAILED, STALE_ERROR
+from spotify_app.services.ttl_cache import TTLCache
 
 # Create your tests here. Django API 동작을 자동으로 검증할 수 있는 테스트 코드 작성 위치
+
+
+# ------------------------------------------------------------
+# 백그라운드 추천 작업 (job_queue)
+# ------------------------------------------------------------
+class JobQueueStaleTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = JobStore(os.path.join(self.tmp.name, "jobs.sqlite3"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_job(self, status, age):
+        """age초 전에 마지막으로 갱신된 작업 (worker가 죽어서 남은 row 흉내)"""
+        job_id = self.store.create({"urls": []})
+        self.store.update(job_id, status)
+        self.store._execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - age, job_id))
+        return job_id
+
+    def test_orphaned_jobs_fail_on_poll(self):
+        queued = self.make_job(QUEUED, 120)
+        running = self.make_job(RUNNING, 120)
+        fresh = self.make_job(RUNNING, 1)
+
+        jobs = JobQueue(lambda payload: {}, store=self.store, stale_timeout=60)
+
+        for job_id in (queued, running):
+            job = jobs.get(job_id)
+            self.assertEqual(job["status"], FAILED)
+            self.assertEqual(job["error"], STALE_ERROR)
+
+        self.assertEqual(jobs.get(fresh)["status"], RUNNING)
+
+    def test_orphaned_jobs_fail_on_start(self):
+        orphan = self.make_job(RUNNING, 120)
+
+        jobs = JobQueue(lambda payload: {"ok": True}, store=self.store, workers=1, stale_timeout=60)
+        job_id = jobs.submit({"urls": []})
+        jobs._queue.join()
+
+        self.assertEqual(self.store.get(orphan)["status"], FAILED)
+        self.assertEqual(self.store.get(job_id)["result"], {"ok": True})
+
+
+# ------------------------------------------------------------
+# feature 추출기 (single_stft ↔ librosa 개별 호출)
+# ------------------------------------------------------------
+FEATURE_NAMES = (
+    ["tempo", "spectral_centroid", "spectral_bandwidth", "zcr", "rms"]
+    + [f"mfcc_{i}" for i in range(13)]
+    + [f"contrast_{i}" for i in range(7)]
+    + [f"chroma_{i}" for i in range(12)]
+)
+
+
+def synthetic_signal(seconds=10, bpm=120, seed=0):
+    """화음 + 박자마다 click + 약한 noise (tempo / spectral / chroma 전부 0이 아닌 값)"""
+    t = np.arange(SAMPLE_RATE * seconds) / SAMPLE_RATE
+    rng = np.random.default_rng(seed)
+
+    y = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.2 * np.sin(2 * np.pi * 330 * t) + 0.1 * np.sin(2 * np.pi * 440 * t)
+    y += 0.8 * (np.mod(t, 60 / bpm) < 0.02) * np.sin(2 * np.pi * 1000 * t)
+    y += 0.02 * rng.normal(size=t.shape[0])
+    return y.astype(np.float32)
+
+
+class FeatureExtractorParityTest(SimpleTestCase):
+
+    def test_single_stft_matches_librosa(self):
+        y = synthetic_signal()
+        expected = extract_features_librosa(y, SAMPLE_RATE)
+        actual = extract_features_single_stft(y, SAMPLE_RATE)
+
+        self.assertEqual(actual.shape, (37,))
+        self.assertGreater(expected[0], 0)      # tempo가 실제로 계산됐는지
+
+        for name, a, b in zip(FEATURE_NAMES, actual, expected):
+            self.assertTrue(
+                np.isclose(a, b, rtol=SINGLE_STFT_RTOL, atol=SINGLE_STFT_ATOL),
+                f"{name}: single_stft={a} librosa={b}"
+            )
+
+
+# ------------------------------------------------------------
+# 컬럼 카탈로그 (CatalogWriter → CatalogStore, delta overlay)
+# ------------------------------------------------------------
+CATALOG_METAS = [
+    {
+        "track_id": 1001, "title": "Dynamite", "artist": "BTS", "genre_name": "K-Pop",
+        "release_date": "2020-08-21T07:00:00Z", "preview_url": "https://example.com/1001.m4a",
+        "album_image": "https://example.com/1001.jpg", "apple_music_url": "https://music.apple.com/1001",
+    },
+    {
+        "track_id": 1002, "title": "Butter", "artist": "BTS", "genre_name": "K-Pop",
+        "release_date": None, "preview_url": "https://example.com/1002.m4a",
+    },
+    {
+        "track_id": 1003, "title": "좋은 날", "artist": "아이유", "genre_name": None,
+        "release_date": "2010-12-09T08:00:00Z", "preview_url": "https://example.com/1003.m4a",
+    },
+]
+
+
+class CatalogStoreTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.catalog_dir = os.path.join(self.tmp.name, "apple_catalog")
+        write_catalog(self.catalog_dir, CATALOG_METAS)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        store = CatalogStore(self.catalog_dir)
+        self.assertEqual(len(store), len(CATALOG_METAS))
+
+        for idx, meta in enumerate(CATALOG_METAS):
+            row = store.row(idx)
+            for name in STRING_COLUMNS:
+                self.assertEqual(row[name], meta.get(name), name)
+            self.assertEqual(row["track_id"], meta["track_id"])
+            self.assertEqual(row["genre_name"], meta["genre_name"])
+
+        self.assertEqual([store.value(i, "year") for i in range(3)], [2020, 0, 2010])
+        self.assertEqual(store.row(1).get("album_image", "fallback"), "fallback")
+
+        dedup = store.columns["dedup_key"]
+        self.assertEqual(len(set(int(code) for code in dedup)), 3)
+
+    def test_append_rows(self):
+        store = CatalogStore(self.catalog_dir)
+        store.append_rows([
+            {"track_id": 2001, "title": " dynamite ", "artist": "bts", "genre_name": "Jazz",
+             "release_date": "2021-01-01T00:00:00Z"},
+            {"track_id": 2002, "title": "New Song", "artist": "New Artist", "genre_name": "K-Pop"},
+        ])
+
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store.row(3)["title"], " dynamite ")
+        self.assertEqual(store.row(3)["genre_name"], "Jazz")
+        self.assertEqual(store.value(3, "year"), 2021)
+        self.assertEqual(store.genre_name(store.columns["genre"][4]), "K-Pop")
+
+        # 정규화 key가 같은 곡은 기존 row와 같은 dedup code, 새 곡은 새 code
+        dedup = np.asarray(store.columns["dedup_key"])
+        self.assertEqual(dedup[3], dedup[0])
+        self.assertNotIn(dedup[4], dedup[:4])
+
+        self.assertEqual(list(store.columns["track_id"][[0, 4]]), [1001, 2002])
+
+        # 기본 카탈로그 파일은 그대로
+        self.assertEqual(len(CatalogStore(self.catalog_dir)), 3)
+
+
+# ------------------------------------------------------------
+# 추천 엔진 (합성 카탈로그로 작은 인덱스 빌드)
+# ------------------------------------------------------------
+def build_synthetic_recommender(index_dir, count=3000):
+    generate_synthetic_catalog(
+        os.path.join(index_dir, VECTORS_FILE),
+        os.path.join(index_dir, STATS_FILE),
+        os.path.join(index_dir, CATALOG_DIRNAME),
+        count,
+    )
+    rec = HNSWRecommender(index_dir=index_dir)
+    rec.build_index()
+    return rec
+
+
+class RerankTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.rec = build_synthetic_recommender(cls.tmp.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def loop_scores(self, labels, query_vector, query_meta):
+        """벡터화 이전 rerank (후보마다 feature dict → calculate_weighted_distance)"""
+        rec = self.rec
+        q = to_unit_range(query_vector)
+        query_features = {"tempo": q[0], "spectral_centroid": q[1], "mfcc_mean": q[5], "energy": q[4]}
+        query_major = rec.infer_major_genre(query_meta)
+
+        scores = []
+        for label in labels:
+            v = to_unit_range(rec.vectors[label])
+            candidate_features = {"tempo": v[0], "spectral_centroid": v[1], "mfcc_mean": v[5], "energy": v[4]}
+
+            score = 1 / (1 + rec.calculate_weighted_distance(query_features, candidate_features))
+
+            item_major = rec.infer_major_genre(rec.catalog.row(label))
+            if item_major != query_major:
+                score *= 0.85
+            if query_features["tempo"] > 0.55 and candidate_features["tempo"] < 0.45:
+                score *= 0.8
+            if query_features["energy"] > 0.55 and candidate_features["energy"] < 0.45:
+                score *= 0.8
+            if query_features["spectral_centroid"] > 0.55 and candidate_features["spectral_centroid"] < 0.45:
+                score *= 0.85
+            if item_major in ["country", "hiphop"] and query_major in ["pop", "rnb"]:
+                score *= 0.7
+
+            scores.append(score)
+        return np.array(scores)
+
+    def test_vectorized_rerank_matches_loop(self):
+        rec = self.rec
+        for query_label in (0, 17, 1234):
+            query_vector = np.asarray(rec.vectors[query_label])
+            query_meta = rec.catalog.row(query_label)
+
+            labels = rec.search_hnsw(query_vector, k=200)
+            expected = self.loop_scores(labels, query_vector, query_meta)
+            scores = rec.rerank(labels, query_vector, query_meta)
+            np.testing.assert_allclose(scores, expected, rtol=1e-9)
+
+            top_labels, top_scores = rec.select_top_k(labels, scores, 10)
+            order = sorted(range(len(labels)), key=lambda i: expected[i], reverse=True)[:10]
+            self.assertEqual(list(top_labels), [int(labels[i]) for i in order])
+            np.testing.assert_allclose(top_scores, expected[order], rtol=1e-9)
+
+
+# ------------------------------------------------------------
+# 중복 제거 (빌드 시 find_duplicates / 추천 시 dedup_top_k)
+# ------------------------------------------------------------
+def cosine_distance(a, b):
+    return 1 - float(a @ b) / float(np.linalg.norm(a) * np.linalg.norm(b))
+
+
+class DedupTest(SimpleTestCase):
+
+    def test_find_duplicates(self):
+        rng = np.random.default_rng(7)
+        vectors = rng.normal(size=(40, 16)).astype(np.float32)
+        vectors[2] = vectors[0] + rng.normal(0, 0.04, 16)     # 같은 artist의 다른 버전 (가까운 벡터)
+        vectors[3] = vectors[0] + rng.normal(0, 0.08, 16)     # 다른 artist의 같은 제목 (가까운 벡터)
+
+        # 전제: 2 / 3 모두 near-duplicate 거리 안, identical 거리 밖
+        for row in (2, 3):
+            self.assertTrue(IDENTICAL_DISTANCE < cosine_distance(vectors[0], vectors[row]) < NEAR_DUP_DISTANCE)
+
+        titles = [("Love", "Artist A"), ("love ", "artist a"), ("Love (Remastered)", "Artist A"), ("Love", "Artist B")]
+        titles += [(f"Song {i}", f"Artist {i}") for i in range(4, 40)]
+
+        keys, artists = {}, {}
+        key_codes, artist_codes = [], []
+        for title, artist in titles:
+            key = normalize_dedup_key(title, artist)
+            key_codes.append(keys.setdefault(key, len(keys)))
+            artist_codes.append(artists.setdefault(key[1], len(artists)))
+
+        track_ids = list(range(100, 140))
+        scores = [1, 3, 2, 1] + [1] * 36     # row 1 (metadata가 가장 완전)을 남김
+
+        keep, merged, stats = find_duplicates(
+            track_ids, key_codes, artist_codes, scores, lambda: iter([vectors]), vectors.shape[1]
+        )
+
+        self.assertEqual(merged, {101: [100, 102]})
+        self.assertTrue(keep[1] and keep[3])
+        self.assertFalse(keep[0] or keep[2])
+        self.assertEqual(stats["exact_merged"], 1)
+        self.assertEqual(stats["near_merged"], 1)
+        self.assertEqual(stats["kept"], 38)
+
+    def test_dedup_top_k(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            catalog_dir = os.path.join(tmp, "apple_catalog")
+            write_catalog(catalog_dir, [
+                {"track_id": 1, "title": "Love", "artist": "Artist A"},
+                {"track_id": 2, "title": "LOVE", "artist": "artist a "},
+                {"track_id": 3, "title": "Love", "artist": "Artist B"},
+                {"track_id": 4, "title": "Other", "artist": "Artist A"},
+            ])
+
+            rec = HNSWRecommender(index_dir=tmp)
+            rec.catalog = CatalogStore(catalog_dir)
+
+            labels, scores = rec.dedup_top_k(np.arange(4), np.array([0.5, 0.9, 0.7, 0.6]), 10)
+            self.assertEqual(list(labels), [1, 2, 3])
+            np.testing.assert_allclose(scores, [0.9, 0.7, 0.6])
+
+            labels, _ = rec.dedup_top_k(np.arange(4), np.array([0.5, 0.9, 0.7, 0.6]), 2)
+            self.assertEqual(list(labels), [1, 2])
+
+
+# ------------------------------------------------------------
+# 증분 변경 (delta log replay)
+# ------------------------------------------------------------
+class DeltaReplayTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rec = build_synthetic_recommender(self.tmp.name, count=500)
+        self.rec.base_version = "test-base"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_records(self):
+        rec = self.rec
+        start = rec.catalog.count
+        rng = np.random.default_rng(3)
+
+        records = []
+        for i in range(2):
+            track_id = 9_000_000 + i
+            records.append({
+                "op": "add", "base": rec.base_version, "label": start + i, "track_id": track_id,
+                "vector": rng.normal(size=rec.dim).tolist(),
+                "meta": {"track_id": track_id, "title": f"Delta {i}", "artist": "Delta Artist", "genre_name": "Pop"},
+            })
+        records.append({"op": "delete", "base": rec.base_version, "label": 3,
+                        "track_id": int(rec.catalog.columns["track_id"][3])})
+        records.append({"op": "delete", "base": rec.base_version, "label": start, "track_id": 9_000_000})
+        records.append({"op": "delete", "base": "other-base", "label": 4, "track_id": 0})
+        return records
+
+    def state(self):
+        rec = self.rec
+        query = np.asarray(rec.vectors[rec.catalog.count - 1])
+        return {
+            "count": rec.catalog.count,
+            "vectors": rec.vectors.shape,
+            "graph": rec.index.get_current_count(),
+            "deleted": sorted(rec.deleted),
+            "version": rec.delta_applied,
+            "titles": [rec.catalog.value(label, "title") for label in range(rec.catalog.count)],
+            "search": list(rec.search_hnsw(query, k=10)),
+        }
+
+    def test_replay_is_idempotent(self):
+        records = self.make_records()
+
+        self.assertEqual(self.rec.apply_delta(records), 4)
+        once = self.state()
+        self.assertEqual(once["count"], 502)
+        self.assertEqual(once["deleted"], [3, 500])
+
+        # 같은 기록을 다시 읽어도 (전체 / 일부) 바뀌는 것 없음
+        self.assertEqual(self.rec.apply_delta(records), 0)
+        self.assertEqual(self.rec.apply_delta(records[1:3]), 0)
+        self.assertEqual(self.state(), once)
+
+    def test_partial_then_full_replay(self):
+        records = self.make_records()
+
+        self.rec.apply_delta(records[:1])
+        self.rec.apply_delta(records)
+        partial = self.state()
+
+        self.tearDown()
+        self.setUp()
+        self.rec.apply_delta(records)
+        self.assertEqual(partial, self.state())
+
+
+# ------------------------------------------------------------
+# 운영용 인덱스 reload API (admin token)
+# ------------------------------------------------------------
+@override_settings(INDEX_ADMIN_TOKEN="secret-token")
+class IndexReloadViewTest(SimpleTestCase):
+
+    def test_status_requires_token(self):
+        url = reverse("index_reload")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_X_ADMIN_TOKEN="wrong").status_code, 403)
+
+        response = self.client.get(url, HTTP_X_ADMIN_TOKEN="secret-token")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("loaded_version", response.json())
+
+    @override_settings(INDEX_ADMIN_TOKEN="")
+    def test_disabled_without_token(self):
+        self.assertEqual(self.client.get(reverse("index_reload"), HTTP_X_ADMIN_TOKEN="").status_code, 403)
+        self.assertEqual(self.client.post(reverse("index_reload"), HTTP_X_ADMIN_TOKEN="").status_code, 403)
+
+
+# ------------------------------------------------------------
+# 결과 링크 보완 (실패 ↔ 링크가 원래 없는 곡)
+# ------------------------------------------------------------
+class EnrichmentTest(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(HNSW_Engine, "_enrich_cache", TTLCache(maxsize=100))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.rec = HNSWRecommender(index_dir=tempfile.gettempdir())
+
+    def lookup(self, track_id, timeout=None, deadline=None):
+        if track_id == 3:
+            raise ITunesError("lookup HTTP 503")
+        return None, None     # Apple에 링크가 없는 곡
+
+    def test_missing_link_is_not_failure(self):
+        items = [
+            {"track_id": 1, "album_image": "https://example.com/1.jpg", "apple_music_url": "https://music.apple.com/1"},
+            {"track_id": 2, "album_image": None, "apple_music_url": None},
+        ]
+        with mock.patch.object(HNSW_Engine, "lookup_apple_links", self.lookup):
+            self.rec.enrich_apple_metadata_batch(items)
+
+        self.assertIsNone(items[1]["apple_music_url"])
+        self.assertFalse(self.rec.enrichment_failed(items))
+
+    def test_lookup_error_is_failure(self):
+        items = [{"track_id": 2}, {"track_id": 3}]
+        with mock.patch.object(HNSW_Engine, "lookup_apple_links", self.lookup):
+            self.rec.enrich_apple_metadata_batch(items)
+
+        self.assertFalse(items[0]["enrich_failed"])
+        self.assertTrue(items[1]["enrich_failed"])
+        self.assertTrue(self.rec.enrichment_failed(items))
+
+
+# ------------------------------------------------------------
+# batch 추천 입력 검증 (플레이리스트 단위 error)
+# ------------------------------------------------------------
+class RecommendPlaylistsTest(SimpleTestCase):
+
+    def test_invalid_items_fail_per_playlist(self):
+        playlists = [
+            {"id": "empty", "track_ids": []},
+            {"id": "bad", "track_ids": ["abc"]},
+            "not a dict",
+            {"id": "ok", "track_ids": [123, "456"]},
+        ]
+        batch = mock.Mock(return_value=[([{"track_id": 1}], ["#잔잔한"])])
+
+        with mock.patch.object(recommendation_service, "run_recommendation_batch", batch), \
+                mock.patch.object(recommendation_service, "save_recommended_songs"):
+            responses = recommendation_service.recommend_playlists(playlists)
+
+        self.assertEqual(responses[0]["error"], "track_ids가 비어있습니다.")
+        self.assertTrue(responses[1]["error"].startswith("track_ids 형식 오류"))
+        self.assertIn("error", responses[2])
+        self.assertNotIn("error", responses[3])
+        self.assertEqual(responses[3]["recommended"], [{"track_id": 1}])
+        batch.assert_called_once_with([[123, 456]], top_k=10)
@@ -1,10 +1,31 @@
 from django.urls import path
-from .views import AppleUrlProcessView, AppleRecommendView
+from .views import (
+    AppleUrlProcessView,
+    AsyncAppleUrlProcessView,
+    AppleBatchRecommendView,
+    AppleRecommendJobView,
+    AppleRecommendJobStatusView,
+    AppleRecommendView,
+    IndexReloadView,
+)
 
 urlpatterns = [
     # A 모드: Flutter URL → track_id → 추천
     path('itunes-process-urls/', AppleUrlProcessView.as_view(), name='itunes_process_urls'),
 
+    # A 모드 (비동기 / ASGI): 같은 입력, 같은 응답
+    path('itunes-process-urls-async/', AsyncAppleUrlProcessView.as_view(), name='itunes_process_urls_async'),
+
+    # A 모드 (batch): 여러 플레이리스트 → 플레이리스트별 추천
+    path('itunes-process-urls-batch/', AppleBatchRecommendView.as_view(), name='itunes_process_urls_batch'),
+
+    # A 모드 (백그라운드 작업): POST → job_id, GET → 상태 / 결과
+    path('itunes-jobs/', AppleRecommendJobView.as_view(), name='itunes_jobs'),
+    path('itunes-jobs/<str:job_id>/', AppleRecommendJobStatusView.as_view(), name='itunes_job_status'),
+
+    # 운영: 인덱스 버전 확인 / 새 버전으로 교체
+    path('admin/index-reload/', IndexReloadView.as_view(), name='index_reload'),
+
     # B 모드: 브라우저 GET 테스트용 (기본 3곡 자동 추천)
     path('apple-test/', AppleRecommendView.as_view(), name='apple_test'),
 ]
@@ -1,10 +1,33 @@
+import asyncio
+import hmac
+import json
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-
-from spotify_app.services.recommendation_service import run_recommendation
-from spotify_app.services.apple_client import get_track_id_by_name, parse_artist_title_list
-from csv_tools.csv_manager import save_song_to_csv
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from spotify_app.services.recommendation_service import (
+    run_recommendation,
+    run_recommendation_async,
+    resolve_track_ids,
+    resolve_track_ids_async,
+    save_recommended_songs,
+    get_recommend_job_queue,
+    recommend_playlists,
+    BATCH_MAX_PLAYLISTS,
+    BATCH_MAX_TOP_K,
+)
+from spotify_app.services.extraction_pool import ExtractionPoolBusy
+from spotify_app.services.job_queue import JobQueueFull
+from spotify_app.services.apple_client import parse_artist_title_list
+from spotify_app.services.apple_async_client import async_client_scope
+from spotify_app.services.itunes_client import get_itunes_client
+from spotify_app.engines.HNSW_Engine import reload_recommender, loaded_index_status
 
 from dotenv import load_dotenv
 from django.conf import settings
@@ -36,12 +59,7 @@ class AppleRecommendView(APIView):
         # ================================
         # 1. 곡명 + 아티스트명 → trackId 변환
         # ================================
-        track_ids = []
-        for artist, title in sample:
-            term = f"{artist} {title}"
-            tid = get_track_id_by_name(term)
-            if tid:
-                track_ids.append(tid)
+        track_ids = resolve_track_ids([f"{artist} {title}" for artist, title in sample])
 
         if not track_ids:
             return Response(
@@ -55,14 +73,7 @@ class AppleRecommendView(APIView):
         results, mood_keywords = run_recommendation(track_ids)
 
         # songs.csv에 저장
-        for song in results:
-            save_song_to_csv({
-                "title": song.get("title", ""),
-                "artist": song.get("artist", ""),
-                "genre": "Recommended",
-                "bpm": 0,
-                "mood": "Recommended"
-            })
+        save_recommended_songs(results)
 
         return Response({
             "message": "Apple 테스트 추천 실행 완료",
@@ -123,23 +134,8 @@ class AppleUrlProcessView(APIView):
         # ---------------------------------------------------
         # 3) TrackId 검색
         # ---------------------------------------------------
-        track_ids = []
         print("\ntrack_id 검색 시작")
-
-        for artist, title in parsed_track_info:
-            term = f"{artist} {title}"
-            print(f"  > 검색 term = '{term}'")
-
-            try:
-                tid = get_track_id_by_name(term)
-                print("검색 결과 tid =", tid)
-            except Exception as e:
-                print("get_track_id_by_name 실패:", e)
-                continue
-
-            if tid:
-                track_ids.append(tid)
-
+        track_ids = resolve_track_ids([f"{artist} {title}" for artist, title in parsed_track_info])
         print("최종 track_ids =", track_ids)
 
         if not track_ids:
@@ -154,6 +150,11 @@ class AppleUrlProcessView(APIView):
         print("\nApple 추천 실행 시작...")
         try:
             results, mood_keywords = run_recommendation(track_ids)
+        except ExtractionPoolBusy as e:
+            return Response(
+                {"error": f"요청이 많아 잠시 후 다시 시도해주세요: {str(e)}"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except Exception as e:
             return Response(
                 {"error": f"추천 실행 중 오류 발생: {str(e)}"},
@@ -168,18 +169,7 @@ class AppleUrlProcessView(APIView):
         # 5) songs.csv 저장
         # ---------------------------------------------------
         print("\nsongs.csv 저장 시작")
-        for song in results:
-            try:
-                save_song_to_csv({
-                    "title": song.get("title", ""),
-                    "artist": song.get("artist", ""),
-                    "genre": "Recommended",
-                    "bpm": 0,
-                    "mood": "Recommended"
-                })
-                print("저장 완료:", song.get("title"))
-            except Exception as e:
-                print("songs.csv 저장 실패:", e)
+        save_recommended_songs(results)
 
         # ---------------------------------------------------
         # 6) 응답 반환
@@ -195,6 +185,256 @@ class AppleUrlProcessView(APIView):
 
 
 
+# ============================================================
+# A 모드 (비동기): AppleUrlProcessView와 같은 입력/응답
+# - ASGI(uvicorn 등)로 띄우면 요청마다 thread를 잡지 않음
+#   → 검색 / Lookup / preview 다운로드를 await하는 동안 다른 요청 처리
+# - CPU 작업(디코딩, feature 추출, HNSW 검색)은 process pool / thread로 넘김
+# ============================================================
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAppleUrlProcessView(View):
+
+    async def get(self, request):
+        return JsonResponse({"msg": "GET received. 이 Endpoint는 POST용입니다."})
+
+    async def post(self, request):
+        # ASGI 서버가 아니면 요청마다 event loop가 새로 생김 → 끝날 때 HTTP client 정리
+        async with async_client_scope(shared=isinstance(request, ASGIRequest)):
+            return await self.recommend(request)
+
+    async def recommend(self, request):
+
+        # 0) 모드 체크
+        if ACTIVAE_MODE != "A":
+            return JsonResponse(
+                {"error": "현재 모드는 A(Flutter POST 모드)가 아닙니다."},
+                status=400
+            )
+
+        # 1) URL 리스트 추출
+        try:
+            input_info = json.loads(request.body or b"{}").get("urls", [])
+        except (ValueError, AttributeError):
+            return JsonResponse({"error": "잘못된 JSON 요청입니다."}, status=400)
+
+        if not input_info:
+            return JsonResponse(
+                {"error": "URL 리스트가 비어있습니다."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 2) Artist-Title parsing
+        try:
+            parsed_track_info = parse_artist_title_list(input_info)
+        except Exception as e:
+            return JsonResponse(
+                {"error": f"artist-title parsing 오류: {str(e)}"},
+                status=400
+            )
+
+        # 3) TrackId 검색 (동시)
+        track_ids = await resolve_track_ids_async([f"{artist} {title}" for artist, title in parsed_track_info])
+        print("최종 track_ids =", track_ids)
+
+        if not track_ids:
+            return JsonResponse(
+                {"error": "기본 테스트 곡들의 trackId 검색 실패"},
+                status=400
+            )
+
+        # 4) Apple 추천 실행
+        try:
+            results, mood_keywords = await run_recommendation_async(track_ids)
+        except ExtractionPoolBusy as e:
+            return JsonResponse(
+                {"error": f"요청이 많아 잠시 후 다시 시도해주세요: {str(e)}"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except Exception as e:
+            return JsonResponse(
+                {"error": f"추천 실행 중 오류 발생: {str(e)}"},
+                status=500
+            )
+
+        # 5) songs.csv 저장 (파일 I/O → thread)
+        await asyncio.to_thread(save_recommended_songs, results)
+
+        # 6) 응답 반환
+        return JsonResponse({
+            "message": "Apple 테스트 추천 실행 완료",
+            "input_ids": track_ids,
+            "mood_keywords": mood_keywords,
+            "recommended": results
+        })
+
+
+
+# ============================================================
+# A 모드 (batch): 여러 플레이리스트를 요청 1번으로 (파트너 연동용)
+# - playlists: [{"id": ..., "urls": ["아티스트, 제목", ...]} 또는 {"id": ..., "track_ids": [...]}]
+# - 입력곡 Lookup / 분석은 전체에서 중복 없이, 추천은 knn_query 1회로
+# - 일부 플레이리스트가 실패해도 나머지 결과는 반환 (항목별 error)
+# ============================================================
+class AppleBatchRecommendView(APIView):
+
+    def post(self, request):
+
+        if ACTIVAE_MODE != "A":
+            return Response(
+                {"error": "현재 모드는 A(Flutter POST 모드)가 아닙니다."},
+                status=400
+            )
+
+        playlists = request.data.get("playlists", [])
+        if not playlists or not isinstance(playlists, list):
+            return Response(
+                {"error": "playlists 리스트가 비어있습니다."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(playlists) > BATCH_MAX_PLAYLISTS:
+            return Response(
+                {"error": f"한 번에 요청할 수 있는 플레이리스트 수 초과 ({len(playlists)} > {BATCH_MAX_PLAYLISTS})"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            top_k = int(request.data.get("top_k", 10))
+        except (TypeError, ValueError):
+            top_k = 0
+        if not 1 <= top_k <= BATCH_MAX_TOP_K:
+            return Response(
+                {"error": f"top_k는 1~{BATCH_MAX_TOP_K} 사이 정수여야 합니다."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            results = recommend_playlists(playlists, top_k=top_k)
+        except ExtractionPoolBusy as e:
+            return Response(
+                {"error": f"요청이 많아 잠시 후 다시 시도해주세요: {str(e)}"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"추천 실행 중 오류 발생: {str(e)}"},
+                status=500
+            )
+
+        return Response({
+            "message": "Apple batch 추천 실행 완료",
+            "results": results
+        })
+
+
+# ============================================================
+# A 모드 (백그라운드 작업): POST → job_id 즉시 반환 (202), GET으로 상태 / 결과 조회
+# - 다운로드 / 분석 / 보완이 오래 걸려도 모바일 연결이 끊기지 않음
+# - 대기열이 가득 차면 503 (클라이언트는 잠시 후 재시도)
+# ============================================================
+class AppleRecommendJobView(APIView):
+
+    def post(self, request):
+
+        if ACTIVAE_MODE != "A":
+            return Response(
+                {"error": "현재 모드는 A(Flutter POST 모드)가 아닙니다."},
+                status=400
+            )
+
+        input_info = request.data.get("urls", [])
+        if not input_info:
+            return Response(
+                {"error": "URL 리스트가 비어있습니다."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 형식 오류는 작업을 만들기 전에 바로 알려줌
+        try:
+            parsed_track_info = parse_artist_title_list(input_info)
+        except Exception as e:
+            return Response(
+                {"error": f"artist-title parsing 오류: {str(e)}"},
+                status=400
+            )
+
+        if not parsed_track_info:
+            return Response(
+                {"error": "\"아티스트, 제목\" 형식의 항목이 없습니다."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            job_id = get_recommend_job_queue().submit({"urls": input_info})
+        except JobQueueFull as e:
+            return Response(
+                {"error": f"요청이 많아 잠시 후 다시 시도해주세요: {str(e)}"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        return Response({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": request.build_absolute_uri(f"{job_id}/")
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class AppleRecommendJobStatusView(APIView):
+
+    def get(self, request, job_id):
+        job = get_recommend_job_queue().get(job_id)
+
+        if job is None:
+            return Response(
+                {"error": "존재하지 않거나 만료된 작업입니다."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(job)
+
+
+
+# ============================================================
+# 인덱스 버전 교체 (운영용)
+# - GET  : 로드된 버전 / CURRENT가 가리키는 버전
+# - POST : CURRENT 버전을 백그라운드에서 로드 후 교체 (재시작 X)
+# 둘 다 header X-Admin-Token == settings.INDEX_ADMIN_TOKEN 일 때만 (비어있으면 사용 X, 경로 노출 방지)
+# 이 요청을 받은 worker 프로세스만 바로 교체, 나머지는 CURRENT poll로 교체
+# ============================================================
+class IndexReloadView(APIView):
+
+    def forbidden(self, request):
+        """token 불일치면 403 Response, 통과면 None (비교 시간으로 token을 추측하지 못하도록 compare_digest)"""
+        token = getattr(settings, "INDEX_ADMIN_TOKEN", "")
+        given = request.headers.get("X-Admin-Token") or ""
+        if token and hmac.compare_digest(given.encode("utf-8"), token.encode("utf-8")):
+            return None
+
+        return Response(
+            {"error": "권한이 없습니다."},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    def get(self, request):
+        denied = self.forbidden(request)
+        if denied:
+            return denied
+
+        return Response(loaded_index_status())
+
+    def post(self, request):
+        denied = self.forbidden(request)
+        if denied:
+            return denied
+
+        started = reload_recommender(wait=bool(request.data.get("wait", False)))
+
+        return Response({
+            "started": started,   # False = 이미 다른 reload 진행 중
+            **loaded_index_status()
+        }, status=status.HTTP_202_ACCEPTED)
+
+
 # ============================================================
 # PingView (기본 연결 확인용)
 # ============================================================
@@ -202,7 +442,8 @@ class PingView(APIView):
     def get(self, request):
         return Response({
             "message": "pong",
-            "mode": ACTIVAE_MODE  # 현재 모드 알려주기
+            "mode": ACTIVAE_MODE,  # 현재 모드 알려주기
+            "itunes": get_itunes_client().stats.snapshot()  # endpoint별 요청 수 / latency
         })
 # ========================================================= #
 
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -137,4 +138,14 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 ACTIVAE_MODE = "A"  # A → Flutter 요청 기반 (기본)
                     # B → 서버 시작 즉시 자동 실행
 
+# 추천 결과 캐시 (spotify_app/services/result_cache.py)
+# BACKEND: "memory" / "file" / "django" / "none"
+RECOMMEND_RESULT_CACHE = {
+    "BACKEND": "memory",
+    "TTL": 3600,   # 초
+}
+
+# 인덱스 교체 endpoint(/api/itunes/admin/index-reload/) 토큰. 비어있으면 POST 거부
+INDEX_ADMIN_TOKEN = os.getenv("GROOVIA_ADMIN_TOKEN", "")
+
 CSRF_TRUSTED_ORIGINS = ['https://*.ngrok-free.app']
\ No newline at end of file
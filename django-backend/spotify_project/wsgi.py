@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spotify_project.settings')
 
 application = get_wsgi_application()
+
+# prefork 서버(gunicorn preload_app, uwsgi 기본 설정)는 이 모듈을 master에서 import한 뒤 fork
+# → 여기서 인덱스를 로드하면 모든 worker가 같은 메모리를 공유 (gunicorn.conf.py 참고)
+if os.getenv("GROOVIA_PRELOAD_INDEX") == "1":
+    from spotify_app.engines.HNSW_Engine import preload_shared_recommender
+    preload_shared_recommender()